@@ -0,0 +1,206 @@
+import logging
+import math
+import time
+from typing import List, Dict, Any, Optional
+import numpy as np
+import faiss
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# Defaults for the approximate index types
+DEFAULT_NPROBE = 16  # IVF lists scanned per query
+DEFAULT_EF_SEARCH = 64  # HNSW candidate list size per query
+DEFAULT_HNSW_M = 32  # HNSW neighbours per node
+DEFAULT_PQ_BITS = 8  # Bits per PQ sub-quantizer code
+MAX_TRAINING_SAMPLE = 100000  # Vectors sampled for IVF/PQ training
+MIN_POINTS_PER_CENTROID = 39  # Below this FAISS k-means produces poor centroids
+
+def default_nlist(n_vectors: int) -> int:
+    """Pick the number of IVF lists for a corpus of n_vectors (about 4 * sqrt(n), trainable on the corpus)."""
+    nlist = int(4 * math.sqrt(max(n_vectors, 1)))
+    return max(1, min(nlist, n_vectors // MIN_POINTS_PER_CENTROID))
+
+def default_pq_m(dimension: int) -> int:
+    """Pick the number of PQ sub-quantizers: the largest divisor of dimension giving sub-vectors of at least 4 dims."""
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+        if dimension % m == 0 and dimension // m >= 4:
+            return m
+    return 1
+
+def index_description(index_type: str, dimension: int, n_vectors: int, nlist: Optional[int] = None,
+                      pq_m: Optional[int] = None, hnsw_m: int = DEFAULT_HNSW_M) -> str:
+    """Return the faiss.index_factory description string for an index type."""
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m},Flat"
+    nlist = nlist or default_nlist(n_vectors)
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{nlist},PQ{pq_m or default_pq_m(dimension)}x{DEFAULT_PQ_BITS}"
+    raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+
+def fit_index_type(index_type: str, n_vectors: int, nlist: Optional[int] = None):
+    """Return an index type and nlist that can be trained on n_vectors, falling back with a warning if needed.
+
+    PQ needs at least 2**DEFAULT_PQ_BITS training vectors per sub-quantizer
+    (otherwise IVF-flat is used instead), IVF needs MIN_POINTS_PER_CENTROID
+    vectors per list (otherwise nlist is lowered) and at least one full list
+    (otherwise a flat index is used).
+    """
+    if index_type == "ivf_pq" and n_vectors < 2 ** DEFAULT_PQ_BITS:
+        logger.warning(f"ivf_pq needs at least {2 ** DEFAULT_PQ_BITS} vectors to train, got {n_vectors}; using ivf_flat")
+        index_type = "ivf_flat"
+    if index_type in ("ivf_flat", "ivf_pq"):
+        if n_vectors < MIN_POINTS_PER_CENTROID:
+            logger.warning(f"{index_type} needs at least {MIN_POINTS_PER_CENTROID} vectors to train, got {n_vectors}; using flat")
+            return "flat", None
+        if nlist is not None and n_vectors < nlist * MIN_POINTS_PER_CENTROID:
+            logger.warning(f"nlist={nlist} is too many lists for {n_vectors} vectors; using nlist={default_nlist(n_vectors)}")
+            nlist = None
+    return index_type, nlist
+
+def training_sample(embeddings: np.ndarray, sample_size: int = MAX_TRAINING_SAMPLE, seed: int = 1234) -> np.ndarray:
+    """Return a random subset of the embeddings to train the coarse quantizer on."""
+    if len(embeddings) <= sample_size:
+        return embeddings
+    rng = np.random.default_rng(seed)
+    return embeddings[rng.choice(len(embeddings), size=sample_size, replace=False)]
+
+def create_index(index_type: str, dimension: int, n_vectors: int, nlist: Optional[int] = None,
+                 pq_m: Optional[int] = None, hnsw_m: int = DEFAULT_HNSW_M) -> faiss.Index:
+    """Create an empty (untrained) L2 index of the requested type."""
+    description = index_description(index_type, dimension, n_vectors, nlist=nlist, pq_m=pq_m, hnsw_m=hnsw_m)
+    logger.info(f"Creating FAISS index '{description}' for {n_vectors} vectors of dimension {dimension}")
+    return faiss.index_factory(dimension, description, faiss.METRIC_L2)
+
+def build_index(embeddings: np.ndarray, index_type: str = "flat", nlist: Optional[int] = None,
+                pq_m: Optional[int] = None, hnsw_m: int = DEFAULT_HNSW_M,
+                nprobe: int = DEFAULT_NPROBE, ef_search: int = DEFAULT_EF_SEARCH,
+                ids: Optional[np.ndarray] = None) -> faiss.Index:
+    """Build, train and fill an index of the requested type, then apply its search parameters.
+
+    When ids are given, searches return those ids and vectors can later be
+    removed by id. IVF indexes store the ids themselves; other types are wrapped
+    in an IndexIDMap2 (an ID map over IVF goes out of step with it on removal).
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+    n_vectors, dimension = embeddings.shape
+    index_type, nlist = fit_index_type(index_type, n_vectors, nlist)
+    index = create_index(index_type, dimension, n_vectors, nlist=nlist, pq_m=pq_m, hnsw_m=hnsw_m)
+    if not index.is_trained:
+        sample = training_sample(embeddings)
+        logger.info(f"Training index on {len(sample)} sampled vectors")
+        index.train(sample)
+    if ids is not None:
+        if not isinstance(faiss.downcast_index(index), faiss.IndexIVF):
+            index = faiss.IndexIDMap2(index)
+        index.add_with_ids(embeddings, np.ascontiguousarray(ids, dtype='int64'))
+    else:
+        index.add(embeddings)
+    set_search_params(index, nprobe=nprobe, ef_search=ef_search)
+    return index
+
+def is_id_mapped(index: faiss.Index) -> bool:
+    """Return True if searches on the index return external ids rather than row positions."""
+    return isinstance(faiss.downcast_index(index), (faiss.IndexIDMap, faiss.IndexIDMap2))
+
+def supports_removal(index: faiss.Index) -> bool:
+    """Return True if vectors can be removed from the index by id.
+
+    True for a bare IVF index and for an ID map over a flat index. HNSW graphs
+    cannot remove vectors, and an ID map wrapped around IVF (as older databases
+    were built) returns -1 for surviving vectors after remove_ids, so both need
+    a rebuild instead.
+    """
+    if isinstance(faiss.downcast_index(index), faiss.IndexIVF):
+        return True
+    return is_id_mapped(index) and isinstance(_base_index(index), faiss.IndexFlat)
+
+def _base_index(index: faiss.Index) -> faiss.Index:
+    """Unwrap ID maps and pre-transforms to reach the index that holds the search parameters."""
+    index = faiss.downcast_index(index)
+    while hasattr(index, "index") and not isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.index)
+    return index
+
+def set_search_params(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """Apply nprobe (IVF) or efSearch (HNSW) to an index; other index types are left untouched."""
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    if ivf is not None and nprobe is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+        logger.info(f"IVF nprobe set to {ivf.nprobe} (nlist={ivf.nlist})")
+        return
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexHNSW) and ef_search is not None:
+        base.hnsw.efSearch = ef_search
+        logger.info(f"HNSW efSearch set to {ef_search}")
+
+def evaluate_index(index: faiss.Index, ground_truth: np.ndarray, queries: np.ndarray, k: int = 5) -> Dict[str, float]:
+    """Measure recall@k against exact neighbours and the mean search latency per query."""
+    start = time.perf_counter()
+    _, indices = index.search(queries, k)
+    elapsed = time.perf_counter() - start
+    hits = sum(len(set(found[found != -1]) & set(expected[expected != -1]))
+               for found, expected in zip(indices, ground_truth))
+    expected_total = int((ground_truth != -1).sum())
+    return {
+        "recall": hits / expected_total if expected_total else 1.0,
+        "latency_ms": elapsed * 1000 / max(len(queries), 1),
+    }
+
+def recall_latency_report(index: faiss.Index, embeddings: np.ndarray, queries: Optional[np.ndarray] = None,
+                          k: int = 5, nprobe_values=(1, 4, 8, 16, 32, 64),
+                          ef_search_values=(16, 32, 64, 128, 256), n_queries: int = 200) -> List[Dict[str, Any]]:
+    """Compare an approximate index with the exact IndexFlatL2 baseline over a sweep of search parameters.
+
+    When no queries are given, a sample of the indexed embeddings is used. The
+    index's search parameters are restored to their original values afterwards.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+    if queries is None:
+        queries = training_sample(embeddings, sample_size=n_queries, seed=42)
+    queries = np.ascontiguousarray(queries, dtype='float32')
+
+    flat = faiss.IndexFlatL2(embeddings.shape[1])
+    flat.add(embeddings)
+    _, ground_truth = flat.search(queries, k)
+    rows = [{"index": "flat", "setting": "exact", **evaluate_index(flat, ground_truth, queries, k)}]
+
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    base = _base_index(index)
+    if ivf is not None:
+        original = ivf.nprobe
+        for nprobe in nprobe_values:
+            if nprobe > ivf.nlist:
+                break
+            ivf.nprobe = nprobe
+            rows.append({"index": "ivf", "setting": f"nprobe={nprobe}", **evaluate_index(index, ground_truth, queries, k)})
+        ivf.nprobe = original
+    elif isinstance(base, faiss.IndexHNSW):
+        original = base.hnsw.efSearch
+        for ef_search in ef_search_values:
+            base.hnsw.efSearch = ef_search
+            rows.append({"index": "hnsw", "setting": f"efSearch={ef_search}", **evaluate_index(index, ground_truth, queries, k)})
+        base.hnsw.efSearch = original
+    else:
+        rows.append({"index": "current", "setting": "default", **evaluate_index(index, ground_truth, queries, k)})
+    return rows
+
+def format_report(rows: List[Dict[str, Any]]) -> str:
+    """Render recall_latency_report rows as a text table."""
+    lines = [f"{'index':<8} {'setting':<14} {'recall@k':>9} {'ms/query':>9}"]
+    for row in rows:
+        lines.append(f"{row['index']:<8} {row['setting']:<14} {row['recall']:>9.3f} {row['latency_ms']:>9.4f}")
+    return "\n".join(lines)
@@ -1,12 +1,14 @@
-from flask import Flask, request, render_template, send_file, redirect, url_for, session
-import os
-from main import process_chunk, API_KEY, OUTPUT_JSON_PATH, OUTPUT_PDF_PATH, TEMP_EXTRACTED_PATH, TEMP_CLEANED_PATH
-from pdfconv import extract_pdf_to_text
-from cleantxt import clean_text_file
-from chunking import read_bmr_file, chunk_bmr
+from flask import Flask, request, render_template, send_file, redirect, url_for, session, jsonify, Response, stream_with_context
 import json
-import logging
+import os
 import time
+import uuid
+from pipeline import run_audit
+from jobs import JobStore, JobQueue, QUEUED, RUNNING, DONE, FAILED
+from workspace import Workspace, WorkspaceJanitor, ARTIFACTS
+from compliance_agent import api_call_counts, prompt_metrics, llm_client, llm_cache, query_embedding_cache
+from context_builder import context_metrics
+import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -14,12 +16,47 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'  # Required for session; replace with a secure key
-UPLOAD_FOLDER = 'uploads'
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-
-# Ensure upload folder exists
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+JOB_DB_PATH = 'jobs.sqlite'
+AUDIT_WORKERS = 4  # Audits run in parallel, each in its own workspace
+EVENT_POLL_SECONDS = 0.5  # How often an event stream checks the job's event log
+EVENT_KEEPALIVE_SECONDS = 15  # Comment lines sent while idle so proxies keep the stream open
+
+job_store = JobStore(JOB_DB_PATH)
+job_queue = JobQueue(job_store, lambda job_id, filepath, emit: run_audit(Workspace(job_id), emit), max_workers=AUDIT_WORKERS)
+# Expired workspaces are deleted in the background; those of unfinished jobs are always kept
+workspace_janitor = WorkspaceJanitor(active=job_store.unfinished)
+# Under the debug reloader the parent process only watches files; the serving process picks up unfinished jobs.
+# PDF extraction worker processes re-import this module as __mp_main__ and must not either.
+if __name__ != "__mp_main__" and not (__name__ == "__main__" and os.environ.get("WERKZEUG_RUN_MAIN") != "true"):
+    job_queue.recover()
+    workspace_janitor.start()
+
+def save_upload(file):
+    """Save an uploaded PDF into a new job workspace and return (job_id, filepath)."""
+    job_id = uuid.uuid4().hex
+    workspace = Workspace(job_id).create()
+    file.save(workspace.upload)
+    logger.info(f"File saved to {workspace.upload}")
+    return job_id, workspace.upload
+
+def job_status(job):
+    """Public JSON view of a job."""
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "filename": job["filename"],
+        "error": job["error"],
+        "status_url": url_for('get_job', job_id=job["id"]),
+        "events_url": url_for('job_events', job_id=job["id"]),
+        "result_url": url_for('get_job_result', job_id=job["id"]),
+        "artifacts": {name: url_for('download_artifact', job_id=job["id"], artifact=name)
+                      for name in ARTIFACTS if job["status"] == DONE and Workspace(job["id"]).artifact(name)},
+    }
+
+def current_job():
+    job_id = request.args.get('job_id') or request.form.get('job_id') or session.get('job_id')
+    return job_store.get(job_id) if job_id else None
 
 @app.route('/')
 def index():
@@ -30,20 +67,18 @@ def upload_file():
     try:
         if 'file' not in request.files:
             return render_template('index.html', error="No file part", processing=False)
-        
+
         file = request.files['file']
         if file.filename == '':
             return render_template('index.html', error="No file selected", processing=False)
-        
+
         if file and file.filename.endswith('.pdf'):
-            # Save the uploaded file
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-            file.save(filepath)
-            logger.info(f"File saved to {filepath}")
+            job_id, filepath = save_upload(file)
+            job_queue.submit(file.filename, filepath, job_id=job_id)
 
-            # Store file path in session for processing
-            session['filepath'] = filepath
-            return redirect(url_for('process_status'))
+            # Remember the job so the status page can follow it
+            session['job_id'] = job_id
+            return redirect(url_for('process_status', job_id=job_id))
 
     except Exception as e:
         logger.error(f"Error during upload: {e}")
@@ -51,97 +86,168 @@ def upload_file():
 
 @app.route('/process_status')
 def process_status():
-    if 'filepath' not in session:
+    job = current_job()
+    if job is None:
         return redirect(url_for('index'))
-
-    filepath = session['filepath']
-    if not hasattr(process_status, 'processing'):
-        process_status.processing = False
-        process_status.results = None
-        process_status.standard_params = None
-        process_status.error = None
-
-    if not process_status.processing:
-        process_status.processing = True
-        try:
-            logger.info(f"Starting PDF processing for {filepath}")
-            extract_pdf_to_text(filepath, TEMP_EXTRACTED_PATH)
-            logger.info(f"Text extracted to {TEMP_EXTRACTED_PATH}")
-
-            clean_text_file(TEMP_EXTRACTED_PATH, TEMP_CLEANED_PATH)
-            logger.info(f"Text cleaned and saved to: {TEMP_CLEANED_PATH}")
-
-            content = read_bmr_file(TEMP_CLEANED_PATH)
-            chunks = chunk_bmr(content, lines_per_chunk=300)
-            logger.info(f"Created {len(chunks)} chunks from cleaned text: {TEMP_CLEANED_PATH}")
-
-            results = []
-            all_standard_params = {}
-            for i, chunk in enumerate(chunks):
-                logger.info(f"\nProcessing chunk {i}")
-                result = process_chunk(chunk, API_KEY)
-                all_standard_params.update(result["standard_params"])
-                results.append({"chunk_index": i, "compliance": result["compliance"]})
-
-            with open(OUTPUT_JSON_PATH, 'w', encoding='utf-8') as f:
-                json.dump(results, f, indent=2)
-            logger.info(f"Results saved to {OUTPUT_JSON_PATH}")
-
-            from pdf_gen import generate_pdf
-            generate_pdf(OUTPUT_JSON_PATH, OUTPUT_PDF_PATH, standard_params=all_standard_params)
-
-            logger.info(f"Final PDF report generated: {OUTPUT_PDF_PATH}")
-
-            process_status.results = results
-            process_status.standard_params = all_standard_params
-            process_status.error = None
-        except Exception as e:
-            logger.error(f"Error processing file: {e}")
-            process_status.error = f"Error processing file: {str(e)}"
-        finally:
-            for temp_file in [filepath, TEMP_EXTRACTED_PATH, TEMP_CLEANED_PATH]:
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-            logger.info("Temporary files cleaned up.")
-            process_status.processing = False
-
-    return render_template('index.html', 
-                          processing=process_status.processing,
-                          results=process_status.results,
-                          standard_params=process_status.standard_params,
-                          error=process_status.error)
+    session['job_id'] = job["id"]
+
+    if job["status"] in (QUEUED, RUNNING):
+        return render_template('index.html', processing=True, job_id=job["id"], stage=job["stage"],
+                               results=None, standard_params=None, error=None)
+    if job["status"] == FAILED:
+        return render_template('index.html', processing=False, results=None, standard_params=None,
+                               error=f"Error processing file: {job['error']}")
+
+    result = job["result"]
+    return render_template('index.html',
+                          processing=False,
+                          job_id=job["id"],
+                          results=result["results"],
+                          standard_params=result["standard_params"],
+                          error=None)
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Submit a BMR PDF for auditing; returns the job id without waiting for the audit."""
+    file = request.files.get('file')
+    if file is None or not file.filename.endswith('.pdf'):
+        return jsonify({"error": "A PDF file is required in the 'file' field"}), 400
+    job_id, filepath = save_upload(file)
+    job_queue.submit(file.filename, filepath, job_id=job_id)
+    return jsonify(job_status(job_store.get(job_id))), 202
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job_status(job))
+
+@app.route('/jobs/<job_id>/result')
+def get_job_result(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if job["status"] != DONE:
+        return jsonify(job_status(job)), 409
+    return jsonify({"job_id": job_id, **job["result"]})
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Stream a job's progress as Server-Sent Events: stage timings, each chunk's
+    compliance rows as soon as it is analyzed, and a final done/failed event.
+
+    Clients that reconnect send Last-Event-ID and resume after the last event they saw.
+    """
+    if job_store.get(job_id) is None:
+        return jsonify({"error": "Unknown job"}), 404
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.args.get('after') or 0)
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID and 'after' must be integer event ids"}), 400
+
+    def stream(last_id):
+        idle_since = time.monotonic()
+        while True:
+            # Read the status first: once it is final, every progress event is already in the log
+            job = job_store.get(job_id)
+            if job is None:
+                # The job was deleted while the client was connected
+                yield f"event: {FAILED}\ndata: {json.dumps({'error': 'Unknown job'})}\n\n"
+                return
+            status = job["status"]
+            events = job_store.events(job_id, after_id=last_id)
+            for event_id, event, data in events:
+                last_id = event_id
+                yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+                if event in (DONE, FAILED):
+                    return
+            if status in (DONE, FAILED):
+                # Finished without a closing event yet (or before the event log existed)
+                yield f"event: {status}\ndata: {{}}\n\n"
+                return
+            if events:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since >= EVENT_KEEPALIVE_SECONDS:
+                idle_since = time.monotonic()
+                yield ": keepalive\n\n"
+            time.sleep(EVENT_POLL_SECONDS)
+
+    return Response(stream_with_context(stream(last_id)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/summarize', methods=['POST'])
 def summarize():
-    if 'filepath' not in session or not hasattr(process_status, 'results') or not process_status.results:
+    job = current_job()
+    if job is None or job["status"] != DONE:
         return redirect(url_for('index'))
+    result = job["result"]
+    workspace = Workspace(job["id"])
 
     try:
         from pdf_gen import generate_non_compliant_pdf
-        non_compliant_pdf_path = "non_compliance_report.pdf"
-        generate_non_compliant_pdf(OUTPUT_JSON_PATH, non_compliant_pdf_path, standard_params=process_status.standard_params)
-        logger.info(f"Non-compliant PDF generated: {non_compliant_pdf_path}")
-        return render_template('index.html', 
+        workspace.touch()
+        generate_non_compliant_pdf(workspace.results_json, workspace.non_compliant_pdf, product_name=result["product_name"],
+                                   standard_params=result["standard_params"])
+        logger.info(f"Non-compliant PDF generated: {workspace.non_compliant_pdf}")
+        return render_template('index.html',
                               processing=False,
-                              results=process_status.results,
-                              standard_params=process_status.standard_params,
+                              job_id=job["id"],
+                              results=result["results"],
+                              standard_params=result["standard_params"],
                               error=None,
-                              non_compliant_pdf=non_compliant_pdf_path)
+                              non_compliant_pdf=workspace.non_compliant_pdf)
     except Exception as e:
         logger.error(f"Error generating non-compliant PDF: {e}")
-        return render_template('index.html', 
+        return render_template('index.html',
                               processing=False,
-                              results=process_status.results,
-                              standard_params=process_status.standard_params,
+                              job_id=job["id"],
+                              results=result["results"],
+                              standard_params=result["standard_params"],
                               error=f"Error generating summary: {str(e)}")
 
+@app.route('/jobs/<job_id>/artifacts/<artifact>')
+def download_artifact(job_id, artifact):
+    """Download a finished job's report, results JSON or non-compliance report from its workspace."""
+    if artifact not in ARTIFACTS:
+        return jsonify({"error": f"Unknown artifact '{artifact}'"}), 404
+    if job_store.get(job_id) is None:
+        return jsonify({"error": "Unknown job"}), 404
+    workspace = Workspace(job_id)
+    path = workspace.artifact(artifact)
+    if path is None:
+        return jsonify({"error": f"'{artifact}' is not available for this job (not generated yet, or expired)"}), 404
+    workspace.touch()
+    return send_file(os.path.abspath(path), as_attachment=True)
+
 @app.route('/download_pdf')
 def download_pdf():
-    return send_file(OUTPUT_PDF_PATH, as_attachment=True)
+    job = current_job()
+    if job is None:
+        return redirect(url_for('index'))
+    return redirect(url_for('download_artifact', job_id=job["id"], artifact='report'))
 
 @app.route('/download_non_compliant_pdf')
 def download_non_compliant_pdf():
-    return send_file("non_compliance_report.pdf", as_attachment=True)
+    job = current_job()
+    if job is None:
+        return redirect(url_for('index'))
+    return redirect(url_for('download_artifact', job_id=job["id"], artifact='non_compliant_report'))
+
+@app.route('/metrics')
+def metrics():
+    """Model API calls, prompt sizes, retry and circuit-breaker state, result and embedding cache hits and
+    master-context savings of this process since startup."""
+    return jsonify({
+        "api_calls": api_call_counts(),
+        "prompts": prompt_metrics(),
+        "context": context_metrics(),
+        "client": llm_client.stats(),
+        "cache": {
+            "llm": llm_cache.stats(),
+            "query_embeddings": query_embedding_cache.stats(),
+        },
+    })
 
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import random
+import re
+import tempfile
+import time
+from cleantxt import iter_clean_lines, clean_text_file
+
+def synthetic_extraction(n_lines, seed=0):
+    """Build pdfconv-style extracted lines: page headers, matrix headers, numbered records and key-value bullets."""
+    rng = random.Random(seed)
+    keys = ["Ingredient", "Std Qty / batch", "Unit", "A.R. No.", "Actual Qty", "Checked By", "Temperature"]
+    lines = []
+    page = record = 0
+    while len(lines) < n_lines:
+        page += 1
+        lines.append(f"Page {page}:")
+        lines += [f"- {key}" for key in keys[:4]]
+        for _ in range(rng.randint(5, 20)):
+            record += 1
+            lines.append(f"- {record}:")
+            lines += [f"    • {key}: {rng.random() * 100:.2f}" for key in rng.sample(keys, 4)]
+        lines.append(f"- Product Name: Cefixime Tablets USP {rng.choice([200, 400])} mg")
+        lines.append("")
+    return lines[:n_lines]
+
+def legacy_clean_lines(lines):
+    """The record parser as it was before precompiling: up to four uncompiled re.match calls per line."""
+    cleaned_lines = []
+    current_record = {}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if re.match(r"^- \d+:$", line):
+            if current_record:
+                for key, val in current_record.items():
+                    cleaned_lines.append(f"{key}: {val}")
+                cleaned_lines.append("")
+                current_record = {}
+            continue
+        match = re.match(r"•\s*(.*?):\s*(.*)", line)
+        if match:
+            key, value = match.groups()
+            current_record[key.strip()] = value.strip()
+            continue
+        match = re.match(r"^- (.*)", line)
+        if match:
+            current_record[match.group(1).strip()] = ""
+            continue
+        if current_record and line.startswith("•"):
+            match = re.match(r"•\s*(.*?):\s*(.*)", line)
+            if match:
+                key, value = match.groups()
+                current_record[key.strip()] = value.strip()
+    if current_record:
+        for key, val in current_record.items():
+            cleaned_lines.append(f"{key}: {val}")
+        cleaned_lines.append("")
+    return cleaned_lines
+
+def _time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cleantxt record parser against the legacy implementation.")
+    parser.add_argument("--lines", type=int, default=1_000_000, help="Synthetic extraction size in lines")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    lines = synthetic_extraction(args.lines)
+    legacy_seconds, legacy = _time(lambda: legacy_clean_lines(lines), args.repeat)
+    new_seconds, new = _time(lambda: list(iter_clean_lines(lines)), args.repeat)
+    if legacy != new:
+        raise SystemExit("Output differs from the legacy parser")
+
+    print(f"{args.lines:,} lines -> {len(new):,} cleaned lines (outputs identical)")
+    print(f"  legacy parser:   {legacy_seconds:.3f}s  ({args.lines / legacy_seconds / 1e6:.2f}M lines/s)")
+    print(f"  compiled parser: {new_seconds:.3f}s  ({args.lines / new_seconds / 1e6:.2f}M lines/s)  "
+          f"{legacy_seconds / new_seconds:.2f}x")
+
+    # End to end through files, as the CLI runs it
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path, output_path = os.path.join(tmp, "extracted.txt"), os.path.join(tmp, "cleaned.txt")
+        with open(input_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        file_seconds, _ = _time(lambda: clean_text_file(input_path, output_path), args.repeat)
+        with open(output_path, encoding="utf-8") as f:
+            if f.read() != "\n".join(legacy):
+                raise SystemExit("clean_text_file output differs from the legacy parser")
+    print(f"  clean_text_file: {file_seconds:.3f}s  ({args.lines / file_seconds / 1e6:.2f}M lines/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import compliance_agent
+from compliance_agent import api_call_counts, prompt_metrics, reset_api_call_counts, llm_client
+from result_cache import ResultCache, TieredCache
+from rule_engine import normalize_key
+from pdfconv import iter_pdf_lines
+from cleantxt import iter_clean_lines
+from chunking import iter_token_chunks
+from main import process_chunks, API_KEY, PIPELINE_MODES
+
+def load_chunks(path, token_budget):
+    """Chunk a BMR PDF, or an already cleaned text file, as the audit pipeline does."""
+    if path.lower().endswith(".pdf"):
+        lines = iter_clean_lines(iter_pdf_lines(path))
+    else:
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    return list(iter_token_chunks(lines, token_budget=token_budget))
+
+def verdicts(results):
+    """Map each reported parameter (normalized name) to its compliance verdict, skipping failed-chunk placeholders."""
+    found = {}
+    for chunk in results:
+        for row in chunk["compliance"]:
+            if row["parameter"] == "non stated":
+                continue
+            found.setdefault(normalize_key(row["parameter"]), row["is_compliant"])
+    return found
+
+def agreement(found, reference):
+    """Share of reference parameters that were reported, the share of those with the same verdict, and their number."""
+    matched = [name for name in reference if name in found]
+    recall = len(matched) / len(reference) if reference else 1.0
+    same = sum(found[name] == reference[name] for name in matched) / len(matched) if matched else 0.0
+    return recall, same, len(matched)
+
+def run_mode(chunks, mode, cache_dir):
+    """Run one pipeline mode against empty caches so every model call is paid for."""
+    compliance_agent.llm_cache = ResultCache(os.path.join(cache_dir, f"{mode}_llm.sqlite"))
+    compliance_agent.query_embedding_cache = TieredCache(ResultCache(os.path.join(cache_dir, f"{mode}_emb.sqlite")))
+    reset_api_call_counts()
+    llm_client.reset_stats()
+    start = time.perf_counter()
+    results, standard_params, product_name = process_chunks(chunks, API_KEY, mode=mode)
+    seconds = time.perf_counter() - start
+    calls = api_call_counts()
+    calls["prompt_tokens"] = sum(prompt["prompt_tokens"] for prompt in prompt_metrics().values())
+    client = llm_client.stats()
+    calls["retries"], calls["hedges"] = client.get("retries", 0), client.get("hedges", 0)
+    return seconds, calls, results, standard_params
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the latency, API calls and verdicts of the staged and fused pipeline modes. "
+                                                 "Set GEMINI_API_ENDPOINT to run against fake_model_server.py.")
+    parser.add_argument("input", help="BMR PDF, or cleaned text as written by cleantxt.py")
+    parser.add_argument("--labels", help="JSON object mapping parameter names to the expected is_compliant verdict")
+    parser.add_argument("--token-budget", type=int, default=2000, help="Estimated tokens per chunk")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.input, args.token_budget)
+    labels = None
+    if args.labels:
+        with open(args.labels, encoding="utf-8") as f:
+            labels = {normalize_key(name): bool(value) for name, value in json.load(f).items()}
+    print(f"{args.input}: {len(chunks)} chunks")
+
+    runs = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for mode in PIPELINE_MODES:
+            seconds, calls, results, standard_params = run_mode(chunks, mode, cache_dir)
+            runs[mode] = verdicts(results)
+            print(f"  {mode:<6} {seconds:8.2f}s  {calls['generate']:4d} generate + {calls['embed']:3d} embed calls  "
+                  f"{calls['prompt_tokens']:7d} prompt tokens  {calls['retries']:3d} retries  {calls['hedges']:3d} hedges  "
+                  f"{len(runs[mode])} parameters checked, {len(standard_params)} standard")
+
+    reference, source = (labels, "labels") if labels is not None else (runs["staged"], "staged results")
+    empty = []
+    for mode in PIPELINE_MODES:
+        if labels is None and mode == "staged":
+            continue
+        recall, same, compared = agreement(runs[mode], reference)
+        print(f"  {mode:<6} vs {source}: {recall:.0%} of parameters found, {same:.0%} of their {compared} verdicts agree")
+        if not compared:
+            empty.append(mode)
+    if empty:
+        sys.exit(f"No parameters compared for {', '.join(empty)} against the {source}: the agreement figures are meaningless")
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+CHARS_PER_TOKEN = 4  # Rough characters-per-token ratio used to estimate chunk sizes
+DEFAULT_TOKEN_BUDGET = 2000  # Estimated tokens per chunk sent to the model
+
 def read_bmr_file(file_path):
     """Read the content of a BMR text file."""
     try:
@@ -14,4 +17,104 @@ def chunk_bmr(content, lines_per_chunk=500):
     """Chunk the BMR content into segments of specified line count."""
     lines = content.splitlines()
     chunks = [lines[i:i + lines_per_chunk] for i in range(0, len(lines), lines_per_chunk)]
-    return ['\n'.join(chunk) for chunk in chunks]
\ No newline at end of file
+    return ['\n'.join(chunk) for chunk in chunks]
+
+def iter_chunks(lines, lines_per_chunk=500):
+    """Group an iterable of lines into chunks as they arrive.
+
+    Gives the same chunks as chunk_bmr('\n'.join(lines)) for lines without line
+    breaks, including dropping a single trailing empty line, without building the
+    joined document first.
+    """
+    chunk = []
+    previous = None
+    for line in lines:
+        # Hold each line back by one so a trailing empty line can be dropped
+        if previous is not None:
+            chunk.append(previous)
+            if len(chunk) == lines_per_chunk:
+                yield '\n'.join(chunk)
+                chunk = []
+        previous = line
+    if previous:
+        chunk.append(previous)
+    if chunk:
+        yield '\n'.join(chunk)
+
+def estimate_tokens(text):
+    """Rough token count of text, at about CHARS_PER_TOKEN characters per token."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def iter_records(lines):
+    """Group cleaned lines into records, which cleantxt separates with blank lines."""
+    record = []
+    for line in lines:
+        if line.strip():
+            record.append(line)
+        elif record:
+            yield record
+            record = []
+    if record:
+        yield record
+
+def _split_record(record, token_budget):
+    """Split a record larger than the budget at line boundaries."""
+    piece, tokens = [], 0
+    for line in record:
+        line_tokens = estimate_tokens(line) + 1
+        if piece and tokens + line_tokens > token_budget:
+            yield piece
+            piece, tokens = [], 0
+        piece.append(line)
+        tokens += line_tokens
+    if piece:
+        yield piece
+
+def iter_token_chunks(lines, token_budget=DEFAULT_TOKEN_BUDGET):
+    """Pack whole records into chunks of at most token_budget estimated tokens, yielding each chunk as it fills.
+
+    Records stay intact and are separated by a blank line, as in the cleaned text.
+    Only a record that is larger than the budget on its own is split, at line
+    boundaries.
+    """
+    chunk, tokens = [], 0
+    for record in iter_records(lines):
+        text = '\n'.join(record)
+        record_tokens = estimate_tokens(text) + 1  # Plus the separating blank line
+        if chunk and tokens + record_tokens > token_budget:
+            yield '\n\n'.join(chunk)
+            chunk, tokens = [], 0
+        if record_tokens <= token_budget:
+            chunk.append(text)
+            tokens += record_tokens
+            continue
+        pieces = list(_split_record(record, token_budget))
+        for piece in pieces[:-1]:
+            yield '\n'.join(piece)
+        chunk = ['\n'.join(pieces[-1])]
+        tokens = estimate_tokens(chunk[0]) + 1
+    if chunk:
+        yield '\n\n'.join(chunk)
+
+def chunk_size_report(chunks, token_budget=DEFAULT_TOKEN_BUDGET):
+    """Summarize the estimated token sizes of chunks: count, min/median/p90/max, mean fill of the budget."""
+    sizes = sorted(estimate_tokens(chunk) for chunk in chunks)
+    if not sizes:
+        return {"chunks": 0, "total_tokens": 0}
+    return {
+        "chunks": len(sizes),
+        "total_tokens": sum(sizes),
+        "min": sizes[0],
+        "median": sizes[len(sizes) // 2],
+        "p90": sizes[min(len(sizes) - 1, int(len(sizes) * 0.9))],
+        "max": sizes[-1],
+        "mean_fill": round(sum(sizes) / len(sizes) / token_budget, 3),
+        "over_budget": sum(size > token_budget for size in sizes),
+    }
+
+def format_chunk_report(report):
+    if not report["chunks"]:
+        return "0 chunks"
+    return (f"{report['chunks']} chunks, {report['total_tokens']} tokens "
+            f"(min {report['min']}, median {report['median']}, p90 {report['p90']}, max {report['max']}; "
+            f"mean fill {report['mean_fill']:.0%}, {report['over_budget']} over budget)")
\ No newline at end of file
@@ -10,64 +10,55 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def clean_text_file(input_path, output_path):
-    """Clean text file by extracting key-value pairs and reformatting."""
-    try:
-        cleaned_lines = []
-        current_record = {}
-
-        with open(input_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+# One pattern classifies each line. The alternatives are tried in order:
+#   record start, e.g. "- 16:"                     -> flush the current record
+#   key-value, e.g. "• Ingredient: Hypromellose"   -> key and value
+#   inline key, e.g. "- Ingredient"                -> key awaiting a value
+LINE_PATTERN = re.compile(r"(?P<start>- \d+:$)|•\s*(?P<key>.*?):\s*(?P<value>.*)|- (?P<name>.*)")
 
-        for line in lines:
-            line = line.strip()
-            
-            if not line:
-                continue
+def iter_clean_lines(lines):
+    """Reformat extracted lines into "key: value" records, yielding cleaned lines as each record completes.
 
-            # Detect record start: e.g. "- 16:" or "- 4:"
-            if re.match(r"^- \d+:$", line):
-                if current_record:
-                    # Flush previous record
-                    for key, val in current_record.items():
-                        cleaned_lines.append(f"{key}: {val}")
-                    cleaned_lines.append("")  # Blank line between records
-                    current_record = {}
-                continue  # Skip the index line
+    Records are separated by a blank line, as in the files written by clean_text_file.
+    Each line is stripped and matched once against LINE_PATTERN; lines matching
+    none of its forms are dropped.
+    """
+    match_line = LINE_PATTERN.match
+    current_record = {}
 
-            # Key-Value pattern: e.g. "• Ingredient: Hypromellose"
-            match = re.match(r"•\s*(.*?):\s*(.*)", line)
-            if match:
-                key, value = match.groups()
-                key = key.strip()
-                value = value.strip()
-                current_record[key] = value
-                continue
+    for line in lines:
+        match = match_line(line.strip())
+        if match is None:
+            continue
 
-            # Inline key-value e.g. "- Ingredient"
-            match = re.match(r"^- (.*)", line)
-            if match:
-                key = match.group(1).strip()
-                current_record[key] = ""  # Mark as key awaiting value (if needed)
-                continue
+        start, key, value, name = match.groups()
+        if start is not None:
+            if current_record:
+                for record_key, record_value in current_record.items():
+                    yield f"{record_key}: {record_value}"
+                yield ""  # Blank line between records
+                current_record = {}
+        elif key is not None:
+            current_record[key.strip()] = value.strip()
+        else:
+            current_record[name.strip()] = ""  # Mark as key awaiting value (if needed)
 
-            # Handle possible continuation lines
-            if current_record and line.startswith("•"):
-                # Example: "• Std Qty / batch: 0.30"
-                match = re.match(r"•\s*(.*?):\s*(.*)", line)
-                if match:
-                    key, value = match.groups()
-                    current_record[key.strip()] = value.strip()
-        
-        # Flush last record
-        if current_record:
-            for key, val in current_record.items():
-                cleaned_lines.append(f"{key}: {val}")
-            cleaned_lines.append("")
+    # Flush last record
+    if current_record:
+        for record_key, record_value in current_record.items():
+            yield f"{record_key}: {record_value}"
+        yield ""
 
-        # Write output
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(cleaned_lines))
+def clean_text_file(input_path, output_path):
+    """Clean text file by extracting key-value pairs and reformatting."""
+    try:
+        with open(input_path, 'r', encoding='utf-8') as f_in, open(output_path, 'w', encoding='utf-8') as f_out:
+            # Write the lines '\n'-joined, as they were when the whole file was built in memory
+            cleaned = iter_clean_lines(f_in)
+            first = next(cleaned, None)
+            if first is not None:
+                f_out.write(first)
+                f_out.writelines(f"\n{line}" for line in cleaned)
 
         logger.info(f"Cleaned file written to: {output_path}")
     
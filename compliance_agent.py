@@ -1,11 +1,22 @@
+import asyncio
 import threading
-import time
+import weakref
 import numpy as np
 import google.generativeai as genai
 import json
 import logging
-from typing import List, Dict, Any
-import re
+import os
+from collections import Counter
+from typing import List, Dict, Any, Tuple
+from rate_limiter import TokenBucket
+from result_cache import ResultCache, TieredCache, make_key
+from master_registry import MasterIndex, MAX_L2_DISTANCE
+from rule_engine import evaluate as evaluate_rules, normalize_key
+from param_classifier import classify_standard_params
+from chunking import estimate_tokens
+from context_builder import build_context, assemble_context, CONTEXT_TOKEN_BUDGET
+from tolerant_json import parse_json_array, parse_json_object, damaged, describe
+from llm_client import LLMClient, LLMUnavailableError
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -14,25 +25,63 @@ logger = logging.getLogger(__name__)
 # Global variables for FAISS index and metadata
 index = None
 metadata = None
-api_semaphore = threading.Semaphore(1)
+default_master = None  # MasterIndex searched when no per-product master is given
 
-def set_index_and_metadata(idx, meta):
-    """Set the global FAISS index and metadata."""
-    global index, metadata
-    index = idx
-    metadata = meta
-    logger.info("FAISS index and metadata set successfully.")
+# Gemini models
+GENERATION_MODEL = 'gemini-2.0-flash'
+EMBEDDING_MODEL = "models/text-embedding-004"
+# Send requests to another Gemini-compatible REST endpoint, e.g. http://localhost:8089 for fake_model_server.py
+API_ENDPOINT = os.environ.get("GEMINI_API_ENDPOINT")
 
-def extract_parameters_to_verify(chunk: str, api_key: str) -> List[Dict[str, Any]]:
-    """Extract parameters that need to be verified from the content."""
-    logger.info(f"\n=== Extracting Parameters to Verify ===")
-    logger.info(f"Input content length: {len(chunk)} characters")
-    
-    with api_semaphore:
-        try:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-2.0-flash')
-            system_prompt = """You are a BMR compliance expert. Extract parameters that need to be verified for compliance.
+# Persistent cache of extraction and compliance results.
+# Bump PROMPT_VERSION whenever a prompt or its parsing changes so stale entries stop matching.
+PROMPT_VERSION = "3"
+LLM_CACHE_PATH = "cache/llm_cache.sqlite"
+LLM_CACHE_MAX_ENTRIES = 100000
+LLM_CACHE_MAX_AGE_SECONDS = 90 * 24 * 3600
+llm_cache = ResultCache(LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, max_age_seconds=LLM_CACHE_MAX_AGE_SECONDS)
+
+# Query embeddings: in-process LRU in front of an on-disk cache, filled by batched embedding calls
+EMBED_BATCH_SIZE = 100  # Gemini API has a limit of 100 texts per batch
+QUERY_EMBEDDING_CACHE_PATH = "cache/query_embeddings.sqlite"
+QUERY_EMBEDDING_LRU_SIZE = 4096
+query_embedding_cache = TieredCache(
+    ResultCache(QUERY_EMBEDDING_CACHE_PATH, max_entries=200000, max_age_seconds=None),
+    max_items=QUERY_EMBEDDING_LRU_SIZE
+)
+
+# Concurrency and rate limiting for Gemini API calls
+MAX_CONCURRENT_REQUESTS = 4  # Maximum number of blocking API calls in flight at once
+MAX_CONCURRENT_ASYNC_REQUESTS = 200  # Maximum number of API calls in flight per event loop
+REQUESTS_PER_SECOND = 1.0  # Sustained request rate allowed by the backend
+RATE_LIMIT_BURST = 4  # Number of requests that may be sent back-to-back
+
+# Compliance checks of small chunks are packed into shared requests up to this many prompt tokens
+COMPLIANCE_PACK_TOKEN_BUDGET = 8000
+MAX_CHUNKS_PER_PACK = 8  # Also bounds the size of a packed response
+REPAIR_MAX_CHARS = 8000  # Malformed output beyond this is not sent back for repair
+
+api_semaphore = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+rate_limiter = TokenBucket(rate=REQUESTS_PER_SECOND, capacity=RATE_LIMIT_BURST)
+# Retries with backoff, deadlines, optional hedging and the circuit breaker for every generation and embedding call.
+# Requests take their rate-limit token inside llm_client, before the attempt's timeout starts running.
+# LLMUnavailableError is re-raised rather than logged away, so an outage shows up as failed chunks, not clean ones.
+llm_client = LLMClient(rate_limiter=rate_limiter)
+
+# Shared Gemini client state: configured once per API key, one model object per model name
+_client_lock = threading.Lock()
+_configured_api_key = None
+_models = {}
+_async_semaphores = weakref.WeakKeyDictionary()
+
+# API calls made by this process, by kind ("generate", "embed"), for benchmarks and logs
+_api_calls = Counter()
+_api_calls_lock = threading.Lock()
+# Generation requests and their estimated prompt tokens, by prompt
+_prompt_requests = Counter()
+_prompt_tokens = Counter()
+
+EXTRACTION_SYSTEM_PROMPT = """You are a BMR compliance expert. Extract parameters that need to be verified for compliance.
             Look for parameters in these categories:
             1. Product Information (name, label claims, batch details)
             2. Manufacturing Details (batch size, location, signatures)
@@ -43,12 +92,12 @@ def extract_parameters_to_verify(chunk: str, api_key: str) -> List[Dict[str, Any
             7. Equipment Parameters (settings, conditions)
             8. Packaging Parameters (specifications, requirements)
             DO NOT EXTRACT PARAMETERS LIKE "Prepared By QA" OR "Reviewed By Production" OR "Approved By QA"
-            
+
             For each parameter, extract:
             - name: parameter name
             - value: parameter value
             - context: section or category it belongs to
-            
+
             Return a JSON array of parameter objects with this structure:
             [
                 {
@@ -57,180 +106,61 @@ def extract_parameters_to_verify(chunk: str, api_key: str) -> List[Dict[str, Any
                     "context": string
                 }
             ]
-            
+
             Do not include any other text or explanation outside the JSON array."""
-            
-            prompt = (
-                f"Extract parameters from this content that need compliance verification:\n"
-                f"{chunk}\n\n"
-                f"Return ONLY a valid JSON array of parameter objects. Do not include any other text."
-            )
-            
-            response = model.generate_content([system_prompt, prompt])
-            text = response.text.strip()
-            logger.debug(f"Raw Gemini response: {text}")
-            
-            # Extract JSON array
-            start = text.find('[')
-            end = text.rfind(']') + 1
-            if start >= 0 and end > start:
-                json_text = text[start:end]
-            else:
-                raise ValueError("No JSON array found in response")
-            
-            parameters = json.loads(json_text)
-            
-            # Validate structure
-            if not isinstance(parameters, list):
-                raise ValueError("Response is not a JSON array")
-            for param in parameters:
-                if not isinstance(param, dict):
-                    raise ValueError("Parameter is not a JSON object")
-                if not all(key in param for key in ["name", "value", "context"]):
-                    raise ValueError("Parameter missing required fields")
-                if not all(isinstance(param[key], str) for key in ["name", "value", "context"]):
-                    raise ValueError("Parameter fields must be strings")
-            
-            logger.info(f"Successfully extracted {len(parameters)} parameters")
-            for param in parameters:
-                logger.info(f"Parameter: {param['name']} = {param['value']} (Context: {param['context']})")
-            
-            time.sleep(2)  #Delay
-            return parameters
-            
-        except Exception as e:
-            logger.error(f"Error extracting parameters: {e}")
-            return []
 
-def retrieve_from_knowledge_base(query: str, api_key: str, k: int = 5) -> List[Dict[str, Any]]:
-    """Retrieve relevant chunks from the knowledge base using FAISS."""
-    with api_semaphore:
-        try:
-            genai.configure(api_key=api_key)
-            embedding = genai.embed_content(
-                model="models/text-embedding-004",
-                content=query,
-                task_type="RETRIEVAL_QUERY"
-            )["embedding"]
-            query_vector = np.array([embedding]).astype('float32')
-            
-            # Search the index
-            distances, indices = index.search(query_vector, k)
-            
-            # Get the chunks
-            chunks = []
-            for distance, idx in zip(distances[0], indices[0]):
-                if idx != -1:
-                    chunk = metadata[idx].copy()
-                    chunk['similarity_score'] = float(distance)
-                    chunks.append(chunk)
-            
-            # Log the number of chunks found
-            logger.info(f"Found {len(chunks)} relevant chunks for query: {query[:100]}...")
-            
-            # Log each chunk with its score and preview
-            for i, chunk in enumerate(chunks, 1):
-                preview = chunk.get('text', '')[:100] + '...'
-                logger.info(f"Chunk {i}: Score: {chunk['similarity_score']:.4f}, Text preview: {preview}")
-            
-            # Filter chunks with high L2 distance
-            filtered_chunks = [chunk for chunk in chunks if chunk['similarity_score'] < 0.8]
-            
-            if not filtered_chunks:
-                logger.warning(f"No sufficiently relevant chunks found for query: {query[:100]}...")
-                return []
-            
-            time.sleep(2)  #Delay 
-            return filtered_chunks
-        
-        except Exception as e:
-            logger.error(f"Error retrieving from knowledge base: {e}")
-            return []
+COMPLIANCE_SYSTEM_PROMPT = """You are a compliance analysis expert. Your task is to analyze each parameter's compliance with the master BMR requirements.
+            For each parameter:
+            1. Compare the actual value against the expected value from master BMR
+            2. Determine if the parameter is compliant
+            3. Provide a clear explanation for the compliance decision
+            4. If non-compliant, explain what needs to be changed to achieve compliance
 
-def analyze_compliance(parameters: List[Dict[str, Any]], master_chunks: List[Dict[str, Any]], api_key: str) -> List[Dict[str, Any]]:
-    """Analyze compliance of parameters against master BMR requirements."""
-    with api_semaphore:
-        try:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-2.0-flash')
-            
-            # Prepare master BMR content
-            master_content = "\n".join([chunk.get("text", "") for chunk in master_chunks])
-            
-            system_prompt = """You are a compliance analysis expert. Your task is to analyze each parameter's compliance with the master BMR requirements.
+            Format your response as a JSON array of parameter analyses, where each analysis contains:
+            {
+                "parameter": string,
+                "actual_value": string,
+                "expected_value": string,
+                "is_compliant": boolean,
+                "explanation": string
+            }
+
+            IMPORTANT:
+            - Return ONLY the JSON array, no other text
+            - Use true/false for is_compliant (not strings)
+            - If any values are missing, set them to "non stated"
+            - Ensure all JSON is properly formatted with correct delimiters
+            """
+
+COMPLIANCE_BATCH_SYSTEM_PROMPT = """You are a compliance analysis expert. Your task is to analyze each parameter's compliance with the master BMR requirements.
+            The parameters come from several chunks of a BMR and are all checked against the same master BMR content.
             For each parameter:
             1. Compare the actual value against the expected value from master BMR
             2. Determine if the parameter is compliant
             3. Provide a clear explanation for the compliance decision
             4. If non-compliant, explain what needs to be changed to achieve compliance
-            
+
             Format your response as a JSON array of parameter analyses, where each analysis contains:
             {
+                "chunk_index": integer (the index of the chunk the parameter came from),
                 "parameter": string,
                 "actual_value": string,
                 "expected_value": string,
                 "is_compliant": boolean,
                 "explanation": string
             }
-            
-            IMPORTANT: 
+
+            IMPORTANT:
             - Return ONLY the JSON array, no other text
+            - Analyze every parameter of every chunk
             - Use true/false for is_compliant (not strings)
             - If any values are missing, set them to "non stated"
             - Ensure all JSON is properly formatted with correct delimiters
             """
-            
-            prompt = (
-                f"Analyze the compliance of these parameters with the master BMR requirements:\n\n"
-                f"Parameters to analyze:\n{json.dumps(parameters, indent=2)}\n\n"
-                f"Master BMR content for reference:\n{master_content}\n\n"
-                f"Return a JSON array of parameter analyses. Each analysis must include parameter, actual_value, "
-                f"expected_value, is_compliant, and explanation fields."
-            )
-            
-            response = model.generate_content([system_prompt, prompt])
-            text = response.text.strip()
-            logger.debug(f"Raw Gemini response: {text}")
-            
-            # Extract JSON array
-            start = text.find('[')
-            end = text.rfind(']') + 1
-            if start >= 0 and end > start:
-                json_text = text[start:end]
-            else:
-                raise ValueError("No JSON array found in response")
-                
-            # Clean JSON
-            json_text = json_text.replace('\n', ' ').replace('\r', '')
-            json_text = re.sub(r',\s*}', '}', json_text)
-            json_text = re.sub(r',\s*]', ']', json_text)
-            
-            result = json.loads(json_text)
-            
-            # Validate and clean results
-            if not isinstance(result, list):
-                raise ValueError("Response is not a JSON array")
-            
-            cleaned_result = []
-            for param in result:
-                cleaned_param = {
-                    "parameter": param.get("parameter", "non stated"),
-                    "actual_value": param.get("actual_value", "non stated"),
-                    "expected_value": param.get("expected_value", "non stated"),
-                    "is_compliant": param.get("is_compliant", False),
-                    "explanation": param.get("explanation", "No explanation provided")
-                }
-                if not isinstance(cleaned_param["is_compliant"], bool):
-                    cleaned_param["is_compliant"] = cleaned_param["is_compliant"].lower() == "true"
-                cleaned_result.append(cleaned_param)
-            
-            logger.info(f"Compliance analysis completed: {len(cleaned_result)} parameters analyzed")
-            time.sleep(2)
-
-            # Identify standard parameters
-            system_prompt2 = """Parse and analyze this JSON response to identify standard parameters 
+
+STANDARD_PARAMS_SYSTEM_PROMPT = """Parse and analyze this JSON response to identify standard parameters
             (for example: 'MFR Reference No', 'BMR Reference No', 'Batch Number', all kinds of Dates, etc).
-            
+
             Standard parameters include:
             - Any parameter containing "Reference No" in the name (e.g., 'MFR Reference No', 'BMR Reference No')
             - Any parameter named "Batch Number" or "Batch No."
@@ -242,53 +172,933 @@ def analyze_compliance(parameters: List[Dict[str, Any]], master_chunks: List[Dic
                 "parameter_name": "actual_value",
                 ...
             }
-            
+
             Return ONLY the JSON object, no other text."""
-            
-            prompt2 = (
-                f"Identify standard parameters in the following JSON response:\n\n"
-                f"Compliance analysis results:\n{json.dumps(cleaned_result, indent=2)}\n\n"
-                f"Return a JSON object mapping standard parameter names to their actual values."
-            )
-            
-            response2 = model.generate_content([system_prompt2, prompt2])
-            text2 = response2.text.strip()
-            logger.debug(f"Raw Gemini response for standard parameters: {text2}")
-            
-            # Extract JSON object
-            start2 = text2.find('{')
-            end2 = text2.rfind('}') + 1
-            if start2 >= 0 and end2 > start2:
-                json_text2 = text2[start2:end2]
+
+FUSED_SYSTEM_PROMPT = """You are a BMR compliance expert. Extract the parameters of a BMR section that need to be verified
+            and analyze each one's compliance with the master BMR requirements, in a single response.
+            Look for parameters in these categories:
+            1. Product Information (name, label claims, batch details)
+            2. Manufacturing Details (batch size, location, signatures)
+            3. General Specifications (dosage form, shelf life, storage)
+            4. Process Parameters (temperatures, pressures, speeds)
+            5. Quality Parameters (yields, weights, dimensions)
+            6. Material Specifications (ingredients, quantities)
+            7. Equipment Parameters (settings, conditions)
+            8. Packaging Parameters (specifications, requirements)
+            DO NOT EXTRACT PARAMETERS LIKE "Prepared By QA" OR "Reviewed By Production" OR "Approved By QA"
+
+            List every extracted parameter under "parameters" (name, value, context) and give one entry per
+            parameter under "analyses":
+            1. Compare the actual value against the expected value from master BMR
+            2. Determine if the parameter is compliant
+            3. Provide a clear explanation for the compliance decision
+            4. If non-compliant, explain what needs to be changed to achieve compliance
+            5. Set is_standard_parameter to true for reference numbers (e.g. 'MFR Reference No'), batch numbers,
+               the product name and dates; never for measurable data such as temperature or weight
+
+            If any values are missing, set them to "non stated"."""
+
+REPAIR_SYSTEM_PROMPT = """You repair malformed JSON. Each fragment below was meant to be one parameter object
+            with the string fields name, value and context, but is malformed or cut off.
+            Rewrite every fragment that still identifies a parameter as a valid object, keeping its text as written.
+            Drop fragments that do not identify a parameter.
+
+            Return ONLY a JSON array of the repaired parameter objects."""
+
+PROMPT_NAMES = {
+    EXTRACTION_SYSTEM_PROMPT: "extraction",
+    COMPLIANCE_SYSTEM_PROMPT: "compliance",
+    COMPLIANCE_BATCH_SYSTEM_PROMPT: "compliance_batch",
+    STANDARD_PARAMS_SYSTEM_PROMPT: "standard_params",
+    FUSED_SYSTEM_PROMPT: "fused",
+    REPAIR_SYSTEM_PROMPT: "repair",
+}
+
+# Response schemas: the API constrains generation to them, so responses parse as the expected JSON
+def _object_schema(**properties) -> Dict[str, Any]:
+    return {"type": "object", "properties": properties, "required": list(properties)}
+
+_STRING = {"type": "string"}
+_BOOLEAN = {"type": "boolean"}
+_ANALYSIS_PROPERTIES = dict(parameter=_STRING, actual_value=_STRING, expected_value=_STRING,
+                            is_compliant=_BOOLEAN, explanation=_STRING)
+EXTRACTION_RESPONSE_SCHEMA = {"type": "array", "items": _object_schema(name=_STRING, value=_STRING, context=_STRING)}
+COMPLIANCE_RESPONSE_SCHEMA = {"type": "array", "items": _object_schema(**_ANALYSIS_PROPERTIES)}
+COMPLIANCE_BATCH_RESPONSE_SCHEMA = {"type": "array",
+                                    "items": _object_schema(chunk_index={"type": "integer"}, **_ANALYSIS_PROPERTIES)}
+FUSED_RESPONSE_SCHEMA = _object_schema(
+    parameters=EXTRACTION_RESPONSE_SCHEMA,
+    analyses={"type": "array", "items": _object_schema(**_ANALYSIS_PROPERTIES, is_standard_parameter=_BOOLEAN)},
+)
+
+def configure_concurrency(max_concurrent: int = None, requests_per_second: float = None, burst: int = None):
+    """Adjust the API concurrency limit and the token-bucket rate limit."""
+    global api_semaphore
+    if max_concurrent is not None:
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        api_semaphore = threading.BoundedSemaphore(max_concurrent)
+    rate_limiter.configure(rate=requests_per_second, capacity=burst)
+    logger.info(f"API concurrency configured: max_concurrent={max_concurrent}, "
+                f"requests_per_second={requests_per_second}, burst={burst}")
+
+def set_index_and_metadata(idx, meta):
+    """Set the global FAISS index and metadata."""
+    global index, metadata, default_master
+    index = idx
+    metadata = meta
+    default_master = MasterIndex(idx, meta, product="default")
+    logger.info("FAISS index and metadata set successfully.")
+
+def get_model(api_key: str, model_name: str = GENERATION_MODEL):
+    """Return the shared GenerativeModel, configuring the Gemini client only when the API key changes."""
+    global _configured_api_key
+    with _client_lock:
+        if api_key != _configured_api_key:
+            if API_ENDPOINT:
+                genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": API_ENDPOINT})
             else:
-                raise ValueError("No JSON object found in response for standard parameters")
-            
-            # Clean JSON
-            json_text2 = json_text2.replace('\n', ' ').replace('\r', '')
-            json_text2 = re.sub(r',\s*}', '}', json_text2)
-            json_text2 = re.sub(r',\s*]', ']', json_text2)
-            
-            standard_params = json.loads(json_text2)
-            
-            # Validate standard_params
-            if not isinstance(standard_params, dict):
-                raise ValueError("standard_params is not a JSON object")
-            for key, value in standard_params.items():
-                if not isinstance(key, str) or not isinstance(value, str):
-                    raise ValueError("standard_params keys and values must be strings")
-            
-            # Filter out standard parameters from cleaned_result
-            filtered_results = [
-                param for param in cleaned_result
-                if param["parameter"] not in standard_params
-            ]
-            
-            logger.info(f"Standard parameters identified: {len(standard_params)}")
-            logger.info(f"Non-standard parameters remaining: {len(filtered_results)}")
-            time.sleep(2)
-            
+                genai.configure(api_key=api_key)
+            _configured_api_key = api_key
+            _models.clear()
+        model = _models.get(model_name)
+        if model is None:
+            model = genai.GenerativeModel(model_name)
+            _models[model_name] = model
+        return model
+
+def _count_call(kind: str, contents: List[str] = None):
+    """Count an API call and, for generation calls given their contents, the estimated prompt tokens."""
+    with _api_calls_lock:
+        _api_calls[kind] += 1
+        if contents is not None:
+            name = PROMPT_NAMES.get(contents[0], "other")
+            _prompt_requests[name] += 1
+            _prompt_tokens[name] += sum(estimate_tokens(part) for part in contents)
+
+def api_call_counts() -> Dict[str, int]:
+    """Return the number of generation and embedding API calls made so far."""
+    with _api_calls_lock:
+        return {"generate": _api_calls["generate"], "embed": _api_calls["embed"]}
+
+def prompt_metrics() -> Dict[str, Dict[str, float]]:
+    """Return the number of generation requests and their estimated prompt tokens, by prompt."""
+    with _api_calls_lock:
+        return {name: {"requests": requests, "prompt_tokens": _prompt_tokens[name],
+                       "avg_prompt_tokens": round(_prompt_tokens[name] / requests, 1)}
+                for name, requests in _prompt_requests.items()}
+
+def reset_api_call_counts():
+    with _api_calls_lock:
+        _api_calls.clear()
+        _prompt_requests.clear()
+        _prompt_tokens.clear()
+
+def _configure_client(api_key: str):
+    """Configure the shared Gemini client for embedding calls."""
+    get_model(api_key)
+
+def _get_async_semaphore() -> asyncio.Semaphore:
+    """Return the semaphore bounding in-flight API calls on the running event loop."""
+    loop = asyncio.get_running_loop()
+    semaphore = _async_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_ASYNC_REQUESTS)
+        _async_semaphores[loop] = semaphore
+    return semaphore
+
+def _extraction_cache_key(chunk: str) -> str:
+    return make_key("extract", PROMPT_VERSION, GENERATION_MODEL, chunk)
+
+def _compliance_cache_key(parameters: List[Dict[str, Any]], master_chunks: List[Dict[str, Any]]) -> str:
+    master_texts = [chunk.get("text", "") for chunk in master_chunks]
+    return make_key("compliance", PROMPT_VERSION, GENERATION_MODEL, parameters, master_texts)
+
+def _cached_extraction(key: str):
+    parameters = llm_cache.get(key)
+    if parameters is not None:
+        logger.info(f"Cache hit: reusing {len(parameters)} extracted parameters")
+    return parameters
+
+def _cached_compliance(key: str):
+    cached = llm_cache.get(key)
+    if cached is None:
+        return None
+    logger.info(f"Cache hit: reusing compliance analysis of {len(cached['results'])} parameters")
+    return cached["results"], cached["standard_params"]
+
+def _store_compliance(key: str, filtered_results: List[Dict[str, Any]], standard_params: Dict[str, str],
+                      incomplete: bool = False):
+    if incomplete:  # A still-damaged analysis is retried in full next time
+        logger.warning("Not caching a compliance analysis still incomplete after its retry")
+        return
+    llm_cache.set(key, {"results": filtered_results, "standard_params": standard_params})
+
+def _build_extraction_prompt(chunk: str) -> str:
+    return (
+        f"Extract parameters from this content that need compliance verification:\n"
+        f"{chunk}\n\n"
+        f"Return ONLY a valid JSON array of parameter objects. Do not include any other text."
+    )
+
+def _is_parameter(param: Any) -> bool:
+    """True for an object with string name, value and context fields."""
+    return isinstance(param, dict) and all(isinstance(param.get(key), str) for key in ["name", "value", "context"])
+
+def _split_parameters(items: List[Any], broken: List[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Keep the valid parameters; invalid objects join the malformed fragments to repair."""
+    parameters = [param for param in items if _is_parameter(param)]
+    broken = broken + [json.dumps(param) for param in items if not _is_parameter(param)]
+    logger.info(f"Successfully extracted {len(parameters)} parameters")
+    for param in parameters:
+        logger.info(f"Parameter: {param['name']} = {param['value']} (Context: {param['context']})")
+    return parameters, broken
+
+def _parse_parameters(text: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Parse the parameter array returned by the extraction prompt.
+
+    Returns the valid parameters and the raw text of the malformed ones, which
+    can be repaired without repeating the extraction.
+    """
+    logger.debug(f"Raw Gemini response: {text}")
+    parsed = parse_json_array(text)
+    if damaged(parsed):
+        logger.warning(f"Malformed extraction response: {describe(parsed)}")
+    return _split_parameters(parsed.items, parsed.broken)
+
+def search_knowledge_base(query_vectors: np.ndarray, k: int = 5, max_distance: float = MAX_L2_DISTANCE,
+                          master: MasterIndex = None) -> List[List[Dict[str, Any]]]:
+    """Search a master index (the default one unless given) for all query vectors with one FAISS call."""
+    master = master or default_master
+    if master is None:
+        raise RuntimeError("No master index loaded")
+    return master.search(query_vectors, k, max_distance)
+
+def _log_retrieval(query: str, chunks: List[Dict[str, Any]]):
+    """Log the retrieved chunks for one query."""
+    if not chunks:
+        logger.warning(f"No sufficiently relevant chunks found for query: {query[:100]}...")
+        return
+    logger.info(f"Found {len(chunks)} relevant chunks for query: {query[:100]}...")
+    for i, chunk in enumerate(chunks, 1):
+        preview = (chunk.get('text') or '')[:100] + '...'
+        logger.debug(f"Chunk {i}: Score: {chunk['similarity_score']:.4f}, Text preview: {preview}")
+
+def _build_compliance_prompt(parameters: List[Dict[str, Any]], master_chunks: List[Dict[str, Any]]) -> str:
+    # Prepare master BMR content: overlapping chunks merged, duplicates dropped, capped by token budget
+    master_content = build_context(master_chunks)
+    return (
+        f"Analyze the compliance of these parameters with the master BMR requirements:\n\n"
+        f"Parameters to analyze:\n{json.dumps(parameters, indent=2)}\n\n"
+        f"Master BMR content for reference:\n{master_content}\n\n"
+        f"Return a JSON array of parameter analyses. Each analysis must include parameter, actual_value, "
+        f"expected_value, is_compliant, and explanation fields."
+    )
+
+def _parse_compliance(text: str) -> Tuple[List[Dict[str, Any]], bool]:
+    """Parse the compliance analysis array and fill in missing fields.
+
+    Returns the analyses recovered and whether the response was damaged, in which
+    case the parameters left without a verdict can be checked again.
+    """
+    logger.debug(f"Raw Gemini response: {text}")
+    parsed = parse_json_array(text)
+    cleaned_result = [_clean_analysis(param) for param in parsed.items if isinstance(param, dict)]
+    is_damaged = damaged(parsed) or len(cleaned_result) < len(parsed.items)
+    if is_damaged:
+        logger.warning(f"Malformed compliance response: {describe(parsed)}")
+
+    logger.info(f"Compliance analysis completed: {len(cleaned_result)} parameters analyzed")
+    return cleaned_result, is_damaged
+
+def _missing_parameters(parameters: List[Dict[str, Any]], results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Parameters that have no verdict among results."""
+    analyzed = {normalize_key(result["parameter"]) for result in results}
+    return [param for param in parameters if normalize_key(param["name"]) not in analyzed]
+
+def _clean_analysis(param: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill in the missing fields of one parameter analysis."""
+    cleaned_param = {
+        "parameter": param.get("parameter", "non stated"),
+        "actual_value": param.get("actual_value", "non stated"),
+        "expected_value": param.get("expected_value", "non stated"),
+        "is_compliant": param.get("is_compliant", False),
+        "explanation": param.get("explanation", "No explanation provided")
+    }
+    if not isinstance(cleaned_param["is_compliant"], bool):
+        cleaned_param["is_compliant"] = str(cleaned_param["is_compliant"]).lower() == "true"
+    return cleaned_param
+
+def _build_compliance_section(chunk_index: int, parameters: List[Dict[str, Any]]) -> str:
+    return f"=== Chunk {chunk_index} ===\nParameters to analyze:\n{json.dumps(parameters, indent=2)}\n"
+
+def _build_batch_compliance_prompt(pending: List[Dict[str, Any]]) -> str:
+    items = [item for item in pending if item["remaining"]]
+    sections = "\n".join(_build_compliance_section(item["chunk_index"], item["remaining"]) for item in items)
+    # Master chunks retrieved for several chunks of the pack are sent once
+    master_content = build_context([chunk for item in items for chunk in item["master_chunks"]],
+                                   token_budget=CONTEXT_TOKEN_BUDGET * len(items))
+    return (
+        f"Analyze the compliance of each chunk's parameters with the master BMR requirements:\n\n"
+        f"{sections}\n"
+        f"Master BMR content for reference:\n{master_content}\n\n"
+        f"Return a JSON array of parameter analyses. Each analysis must include chunk_index, parameter, actual_value, "
+        f"expected_value, is_compliant, and explanation fields."
+    )
+
+def _parse_batch_compliance(text: str) -> Tuple[Dict[int, List[Dict[str, Any]]], bool]:
+    """Parse a packed compliance analysis array into cleaned analyses by chunk index, and whether it was damaged."""
+    logger.debug(f"Raw Gemini response: {text}")
+    parsed = parse_json_array(text)
+    is_damaged = damaged(parsed)
+    if is_damaged:
+        logger.warning(f"Malformed packed compliance response: {describe(parsed)}")
+
+    by_chunk = {}
+    for param in parsed.items:
+        try:
+            chunk_index = int(param.get("chunk_index"))
+        except (AttributeError, TypeError, ValueError):
+            logger.warning(f"Dropping analysis without a valid chunk_index: {param}")
+            is_damaged = True
+            continue
+        by_chunk.setdefault(chunk_index, []).append(_clean_analysis(param))
+    logger.info(f"Packed compliance analysis completed: {sum(map(len, by_chunk.values()))} parameters "
+                f"of {len(by_chunk)} chunks analyzed")
+    return by_chunk, is_damaged
+
+def pack_compliance_requests(all_parameters: List[List[Dict[str, Any]]], all_retrieved: List[List[Dict[str, Any]]],
+                             token_budget: int = COMPLIANCE_PACK_TOKEN_BUDGET,
+                             max_chunks: int = MAX_CHUNKS_PER_PACK) -> List[List[int]]:
+    """Group chunk indexes, in order, into packs whose compliance prompts fit within token_budget.
+
+    A chunk larger than the budget gets a pack of its own. Chunks without
+    parameters need no compliance check and are left out.
+    """
+    packs, current, used = [], [], 0
+    for i, (parameters, retrieved) in enumerate(zip(all_parameters, all_retrieved)):
+        if not parameters:
+            continue
+        context, _ = assemble_context(retrieved or [])
+        tokens = estimate_tokens(_build_compliance_section(i, parameters)) + estimate_tokens(context)
+        if current and (used + tokens > token_budget or len(current) >= max_chunks):
+            packs.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+def _merge_rule_results(parameters: List[Dict[str, Any]], rule_results: List[Dict[str, Any]],
+                        model_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Combine rule-engine and model verdicts in the order the parameters were extracted."""
+    order = {}
+    for i, param in enumerate(parameters):
+        order.setdefault(param["name"], i)
+    return sorted(rule_results + model_results, key=lambda result: order.get(result["parameter"], len(parameters)))
+
+def _build_standard_params_prompt(cleaned_result: List[Dict[str, Any]]) -> str:
+    return (
+        f"Identify standard parameters in the following JSON response:\n\n"
+        f"Compliance analysis results:\n{json.dumps(cleaned_result, indent=2)}\n\n"
+        f"Return a JSON object mapping standard parameter names to their actual values."
+    )
+
+def _parse_standard_params(text: str) -> Dict[str, str]:
+    """Parse the standard-parameter object returned by the classification prompt."""
+    logger.debug(f"Raw Gemini response for standard parameters: {text}")
+    standard_params = parse_json_object(text)
+
+    # Validate standard_params
+    if not isinstance(standard_params, dict):
+        raise ValueError("standard_params is not a JSON object")
+    for key, value in standard_params.items():
+        if not isinstance(key, str) or not isinstance(value, str):
+            raise ValueError("standard_params keys and values must be strings")
+    return standard_params
+
+def _split_standard_params(cleaned_result: List[Dict[str, Any]], standard_params: Dict[str, str]):
+    """Filter out standard parameters from the compliance results."""
+    filtered_results = [
+        param for param in cleaned_result
+        if param["parameter"] not in standard_params
+    ]
+
+    logger.info(f"Standard parameters identified: {len(standard_params)}")
+    logger.info(f"Non-standard parameters remaining: {len(filtered_results)}")
+    return filtered_results, standard_params
+
+def _fused_cache_key(chunk: str, master_chunks: List[Dict[str, Any]]) -> str:
+    master_texts = [chunk.get("text", "") for chunk in master_chunks]
+    return make_key("fused", PROMPT_VERSION, GENERATION_MODEL, chunk, master_texts)
+
+def _build_fused_prompt(chunk: str, master_chunks: List[Dict[str, Any]]) -> str:
+    master_content = build_context(master_chunks)
+    return (
+        f"Extract the parameters of this BMR content that need compliance verification and analyze their "
+        f"compliance with the master BMR requirements:\n\n"
+        f"BMR content:\n{chunk}\n\n"
+        f"Master BMR content for reference:\n{master_content}"
+    )
+
+def _parse_fused(text: str):
+    """Parse the fused response into the extracted parameters, their analyses and the model's standard-parameter flags.
+
+    A malformed response is recovered array by array; the last value returned
+    is the set of arrays that were damaged, so that parameters left without a
+    verdict can be checked again.
+    """
+    logger.debug(f"Raw Gemini response: {text}")
+    arrays, damaged_arrays = {}, set()
+    for key in ("parameters", "analyses"):
+        position = text.find(f'"{key}"')
+        parsed = parse_json_array(text, position) if position >= 0 else None
+        if parsed is None or damaged(parsed):
+            logger.warning(f"Malformed fused response: '{key}' {describe(parsed) if parsed else 'missing'}")
+            damaged_arrays.add(key)
+        arrays[key] = [item for item in parsed.items if isinstance(item, dict)] if parsed else []
+
+    parameters, _ = _split_parameters(arrays["parameters"], [])
+    analyses = [_clean_analysis(param) for param in arrays["analyses"]]
+    flags = {param.get("parameter", "non stated"): bool(param.get("is_standard_parameter", False))
+             for param in arrays["analyses"]}
+    return parameters, analyses, flags, damaged_arrays
+
+def _fused_incomplete(damaged_arrays: set, parameters: List[Dict[str, Any]], analyses: List[Dict[str, Any]]) -> bool:
+    """Whether a repaired fused response may have lost parameters or still leaves some without a verdict."""
+    return "parameters" in damaged_arrays or bool(damaged_arrays and _missing_parameters(parameters, analyses))
+
+def _store_fused(key: str, parameters: List[Dict[str, Any]], filtered_results: List[Dict[str, Any]],
+                 standard_params: Dict[str, str], incomplete: bool):
+    if incomplete:  # A still-damaged analysis is retried in full next time
+        logger.warning("Not caching a fused analysis still incomplete after its retry")
+        return
+    llm_cache.set(key, {"parameters": parameters, "results": filtered_results, "standard_params": standard_params})
+
+def _finish_fused(parameters: List[Dict[str, Any]], analyses: List[Dict[str, Any]], flags: Dict[str, bool],
+                  master_chunks: List[Dict[str, Any]]):
+    """Apply the rule engine and the standard-parameter classifier to a fused response.
+
+    Rule-decidable verdicts replace the model's, and the model's own
+    is_standard_parameter flags settle the results the classifier is unsure about,
+    so no further call is needed.
+    """
+    rule_results, _ = evaluate_rules(parameters, master_chunks)
+    decided = {result["parameter"] for result in rule_results}
+    model_results = [analysis for analysis in analyses if analysis["parameter"] not in decided]
+    cleaned_result = _merge_rule_results(parameters, rule_results, model_results)
+
+    standard_params, uncertain = classify_standard_params(cleaned_result)
+    for result in uncertain:
+        if flags.get(result["parameter"]):
+            standard_params[result["parameter"]] = str(result["actual_value"])
+    return _split_standard_params(cleaned_result, standard_params)
+
+def analyze_chunk_fused(chunk: str, master_chunks: List[Dict[str, Any]], api_key: str):
+    """Extract and check a chunk's parameters against master chunks with a single schema-constrained call.
+
+    Returns the extracted parameters, the compliance results without standard
+    parameters, and the standard parameters; ([], [], {}) on failure.
+    """
+    cache_key = _fused_cache_key(chunk, master_chunks)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Cache hit: reusing fused analysis of {len(cached['results'])} parameters")
+        return cached["parameters"], cached["results"], cached["standard_params"]
+
+    with api_semaphore:
+        try:
+            model = get_model(api_key)
+            parameters, analyses, flags, damaged_arrays = _parse_fused(
+                _generate(model, [FUSED_SYSTEM_PROMPT, _build_fused_prompt(chunk, master_chunks)], FUSED_RESPONSE_SCHEMA))
+            if damaged_arrays:
+                analyses += _check_missing(model, parameters, analyses, master_chunks)
+            filtered_results, standard_params = _finish_fused(parameters, analyses, flags, master_chunks)
+            _store_fused(cache_key, parameters, filtered_results, standard_params,
+                         _fused_incomplete(damaged_arrays, parameters, analyses))
+            return parameters, filtered_results, standard_params
+
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in analyze_chunk_fused: {e}")
+            return [], [], {}
+
+def _generation_kwargs(schema: Dict[str, Any] = None) -> Dict[str, Any]:
+    if schema is None:
+        return {}
+    return {"generation_config": genai.GenerationConfig(response_mime_type="application/json", response_schema=schema)}
+
+def _request_options(timeout: float) -> Dict[str, Any]:
+    # Retries are left to llm_client rather than the Google client library
+    return {"timeout": timeout, "retry": None}
+
+def _generate(model, contents: List[str], schema: Dict[str, Any] = None) -> str:
+    """Send a rate-limited generation request through llm_client, constrained to the JSON schema if given, and return its text."""
+    kwargs = _generation_kwargs(schema)
+
+    def attempt(timeout: float) -> str:
+        _count_call("generate", contents)
+        return model.generate_content(contents, request_options=_request_options(timeout), **kwargs).text.strip()
+
+    return llm_client.call(attempt)
+
+async def _generate_async(model, contents: List[str], schema: Dict[str, Any] = None) -> str:
+    """Async counterpart of _generate."""
+    kwargs = _generation_kwargs(schema)
+
+    async def attempt(timeout: float) -> str:
+        _count_call("generate", contents)
+        if API_ENDPOINT:  # The library's async clients do not support the REST transport
+            response = await asyncio.to_thread(model.generate_content, contents,
+                                               request_options=_request_options(timeout), **kwargs)
+        else:
+            response = await model.generate_content_async(contents, request_options=_request_options(timeout), **kwargs)
+        return response.text.strip()
+
+    return await llm_client.call_async(attempt)
+
+def _embed(batch: List[str]) -> List[List[float]]:
+    """Embed one batch of retrieval queries with a rate-limited request through llm_client."""
+    def attempt(timeout: float):
+        _count_call("embed")
+        return genai.embed_content(model=EMBEDDING_MODEL, content=batch, task_type="RETRIEVAL_QUERY",
+                                   request_options=_request_options(timeout))
+
+    return llm_client.call(attempt)["embedding"]
+
+async def _embed_async(batch: List[str]) -> List[List[float]]:
+    """Async counterpart of _embed."""
+    async def attempt(timeout: float):
+        _count_call("embed")
+        embed = genai.embed_content_async
+        if API_ENDPOINT:
+            embed = lambda **kwargs: asyncio.to_thread(genai.embed_content, **kwargs)
+        return await embed(model=EMBEDDING_MODEL, content=batch, task_type="RETRIEVAL_QUERY",
+                           request_options=_request_options(timeout))
+
+    return (await llm_client.call_async(attempt))["embedding"]
+
+def _repair_contents(broken: List[str]):
+    """The repair request for malformed parameter fragments, or None if there is too much to repair."""
+    if sum(map(len, broken)) > REPAIR_MAX_CHARS:
+        logger.warning(f"Not repairing {len(broken)} malformed fragments: over {REPAIR_MAX_CHARS} characters")
+        return None
+    logger.info(f"Repairing {len(broken)} malformed parameter fragments")
+    fragments = "\n\n".join(f"Fragment {i}:\n{fragment}" for i, fragment in enumerate(broken, 1))
+    return [REPAIR_SYSTEM_PROMPT, f"Repair these malformed parameter objects:\n\n{fragments}"]
+
+def _repair_parameters(model, broken: List[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Have only the malformed part of an extraction response rewritten. Returns the repaired parameters and what is still broken."""
+    contents = _repair_contents(broken)
+    if contents is None:
+        return [], broken
+    return _parse_parameters(_generate(model, contents, EXTRACTION_RESPONSE_SCHEMA))
+
+async def _repair_parameters_async(model, broken: List[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Async counterpart of _repair_parameters."""
+    contents = _repair_contents(broken)
+    if contents is None:
+        return [], broken
+    return _parse_parameters(await _generate_async(model, contents, EXTRACTION_RESPONSE_SCHEMA))
+
+def _check_missing(model, parameters: List[Dict[str, Any]], results: List[Dict[str, Any]],
+                   master_chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Check again only the parameters a damaged response left without a verdict."""
+    missing = _missing_parameters(parameters, results)
+    if not missing:
+        return []
+    logger.info(f"Retrying the compliance check of {len(missing)} parameters missing from a damaged response")
+    contents = [COMPLIANCE_SYSTEM_PROMPT, _build_compliance_prompt(missing, master_chunks)]
+    return _parse_compliance(_generate(model, contents, COMPLIANCE_RESPONSE_SCHEMA))[0]
+
+async def _check_missing_async(model, parameters: List[Dict[str, Any]], results: List[Dict[str, Any]],
+                               master_chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Async counterpart of _check_missing."""
+    missing = _missing_parameters(parameters, results)
+    if not missing:
+        return []
+    logger.info(f"Retrying the compliance check of {len(missing)} parameters missing from a damaged response")
+    contents = [COMPLIANCE_SYSTEM_PROMPT, _build_compliance_prompt(missing, master_chunks)]
+    return _parse_compliance(await _generate_async(model, contents, COMPLIANCE_RESPONSE_SCHEMA))[0]
+
+def _call_model(api_key: str, contents: List[str], schema: Dict[str, Any] = None) -> str:
+    with api_semaphore:
+        return _generate(get_model(api_key), contents, schema)
+
+async def _call_model_async(api_key: str, contents: List[str], schema: Dict[str, Any] = None) -> str:
+    async with _get_async_semaphore():
+        return await _generate_async(get_model(api_key), contents, schema)
+
+def _retry_batch_items(pending: List[Dict[str, Any]], model_results: Dict[int, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """The pending chunks with parameters a damaged packed response left without verdicts, narrowed to those parameters."""
+    retry = []
+    for item in pending:
+        missing = _missing_parameters(item["remaining"], model_results.get(item["chunk_index"], []))
+        if missing:
+            retry.append({**item, "remaining": missing})
+    return retry
+
+def _add_batch_results(model_results: Dict[int, List[Dict[str, Any]]], retried: Dict[int, List[Dict[str, Any]]]):
+    for chunk_index, results in retried.items():
+        model_results.setdefault(chunk_index, []).extend(results)
+
+def _start_batch(items: List[Tuple[int, List[Dict[str, Any]], List[Dict[str, Any]]]]):
+    """Serve cached chunks of a pack and run the rule engine on the rest.
+
+    Returns the finished results by chunk index and the chunks still pending.
+    """
+    done, pending = {}, []
+    for chunk_index, parameters, master_chunks in items:
+        cache_key = _compliance_cache_key(parameters, master_chunks)
+        cached = _cached_compliance(cache_key)
+        if cached is not None:
+            done[chunk_index] = cached
+            continue
+        rule_results, remaining = evaluate_rules(parameters, master_chunks)
+        pending.append({"chunk_index": chunk_index, "parameters": parameters, "master_chunks": master_chunks,
+                        "cache_key": cache_key, "rule_results": rule_results, "remaining": remaining})
+    return done, pending
+
+def _classify_batch(pending: List[Dict[str, Any]], model_results: Dict[int, List[Dict[str, Any]]]):
+    """Split out the chunks the packed response left unanswered, and classify the standard parameters of the rest."""
+    answered, unanswered = [], []
+    for item in pending:
+        if item["remaining"] and not model_results.get(item["chunk_index"]):
+            unanswered.append(item)
+            continue
+        item["results"] = _merge_rule_results(item["parameters"], item["rule_results"],
+                                              model_results.get(item["chunk_index"], []))
+        item["standard_params"], item["uncertain"] = classify_standard_params(item["results"])
+        answered.append(item)
+    return answered, unanswered
+
+def _finish_batch(answered: List[Dict[str, Any]], model_standard_params: Dict[str, str], done: Dict[int, Any],
+                  incomplete: set = frozenset()):
+    """Settle the standard parameters of the answered chunks and cache the results of those a damaged response left complete."""
+    for item in answered:
+        standard_params = item["standard_params"]
+        # Names are shared across the pack, so each chunk keeps its own value for them
+        for result in item["uncertain"]:
+            if result["parameter"] in model_standard_params:
+                standard_params[result["parameter"]] = str(result["actual_value"])
+        filtered_results, standard_params = _split_standard_params(item["results"], standard_params)
+        _store_compliance(item["cache_key"], filtered_results, standard_params, item["chunk_index"] in incomplete)
+        done[item["chunk_index"]] = (filtered_results, standard_params)
+
+def analyze_compliance_batch(items: List[Tuple[int, List[Dict[str, Any]], List[Dict[str, Any]]]], api_key: str) -> Dict[int, Tuple[List[Dict[str, Any]], Dict[str, str]]]:
+    """Analyze the compliance of several chunks with one packed request.
+
+    items are (chunk_index, parameters, master_chunks) triples, as grouped by
+    pack_compliance_requests. The remaining parameters of every chunk go to the
+    model in one request and the verdicts are split back out by chunk index;
+    uncertain standard parameters of the whole pack share one more request.
+    Chunks the packed response leaves out, or all of them if it fails, fall back
+    to analyze_compliance. Returns (filtered_results, standard_params) by chunk index.
+    """
+    done, pending = _start_batch(items)
+    if len(pending) <= 1:
+        unanswered = pending
+    else:
+        try:
+            model_results, incomplete = {}, set()
+            if any(item["remaining"] for item in pending):
+                model_results, is_damaged = _parse_batch_compliance(_call_model(
+                    api_key, [COMPLIANCE_BATCH_SYSTEM_PROMPT, _build_batch_compliance_prompt(pending)], COMPLIANCE_BATCH_RESPONSE_SCHEMA))
+                retry = _retry_batch_items(pending, model_results) if is_damaged else []
+                if retry:
+                    logger.info(f"Retrying {sum(len(item['remaining']) for item in retry)} parameters missing from a damaged packed response")
+                    _add_batch_results(model_results, _parse_batch_compliance(_call_model(
+                        api_key, [COMPLIANCE_BATCH_SYSTEM_PROMPT, _build_batch_compliance_prompt(retry)], COMPLIANCE_BATCH_RESPONSE_SCHEMA))[0])
+                    incomplete = {item["chunk_index"] for item in _retry_batch_items(retry, model_results)}
+            answered, unanswered = _classify_batch(pending, model_results)
+            uncertain = [result for item in answered for result in item["uncertain"]]
+            model_standard_params = {}
+            if uncertain:
+                model_standard_params = _parse_standard_params(
+                    _call_model(api_key, [STANDARD_PARAMS_SYSTEM_PROMPT, _build_standard_params_prompt(uncertain)]))
+            _finish_batch(answered, model_standard_params, done, incomplete)
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in analyze_compliance_batch: {e}")
+            unanswered = [item for item in pending if item["chunk_index"] not in done]
+
+    if unanswered:
+        logger.info(f"Analyzing {len(unanswered)} chunks of the pack individually")
+    for item in unanswered:
+        done[item["chunk_index"]] = analyze_compliance(item["parameters"], item["master_chunks"], api_key)
+    return done
+
+def extract_parameters_to_verify(chunk: str, api_key: str) -> List[Dict[str, Any]]:
+    """Extract parameters that need to be verified from the content."""
+    logger.info(f"\n=== Extracting Parameters to Verify ===")
+    logger.info(f"Input content length: {len(chunk)} characters")
+
+    cache_key = _extraction_cache_key(chunk)
+    parameters = _cached_extraction(cache_key)
+    if parameters is not None:
+        return parameters
+
+    with api_semaphore:
+        try:
+            model = get_model(api_key)
+            contents = [EXTRACTION_SYSTEM_PROMPT, _build_extraction_prompt(chunk)]
+            parameters, broken = _parse_parameters(_generate(model, contents, EXTRACTION_RESPONSE_SCHEMA))
+            if broken:
+                repaired, broken = _repair_parameters(model, broken)
+                parameters += repaired
+            if not broken:  # A still-damaged extraction is retried in full next time
+                llm_cache.set(cache_key, parameters)
+            return parameters
+
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            logger.error(f"Error extracting parameters: {e}")
+            return []
+
+def _query_embedding_key(query: str) -> str:
+    return make_key("query_embedding", EMBEDDING_MODEL, "RETRIEVAL_QUERY", query)
+
+def _lookup_query_embeddings(queries: List[str]):
+    """Return cached embeddings (None for misses) and the distinct queries that still need embedding."""
+    embeddings = [query_embedding_cache.get(_query_embedding_key(query)) for query in queries]
+    missing = list(dict.fromkeys(query for query, embedding in zip(queries, embeddings) if embedding is None))
+    return embeddings, missing
+
+def _fill_query_embeddings(queries: List[str], embeddings: List[Any], missing: List[str], new_embeddings: List[List[float]]):
+    """Cache freshly computed embeddings and slot them into the result list."""
+    computed = dict(zip(missing, new_embeddings))
+    for query, embedding in computed.items():
+        query_embedding_cache.set(_query_embedding_key(query), embedding)
+    return [embedding if embedding is not None else computed[query] for query, embedding in zip(queries, embeddings)]
+
+def embed_queries(queries: List[str], api_key: str) -> List[List[float]]:
+    """Embed retrieval queries, serving repeats from cache and sending the rest in batched requests."""
+    embeddings, missing = _lookup_query_embeddings(queries)
+    logger.info(f"Query embeddings: {len(queries) - len(missing)} cached, {len(missing)} to embed")
+    new_embeddings = []
+    for i in range(0, len(missing), EMBED_BATCH_SIZE):
+        batch = missing[i:i + EMBED_BATCH_SIZE]
+        with api_semaphore:
+            _configure_client(api_key)
+            new_embeddings.extend(_embed(batch))
+    return _fill_query_embeddings(queries, embeddings, missing, new_embeddings)
+
+async def embed_queries_async(queries: List[str], api_key: str) -> List[List[float]]:
+    """Async counterpart of embed_queries."""
+    embeddings, missing = _lookup_query_embeddings(queries)
+    logger.info(f"Query embeddings: {len(queries) - len(missing)} cached, {len(missing)} to embed")
+    new_embeddings = []
+    for i in range(0, len(missing), EMBED_BATCH_SIZE):
+        batch = missing[i:i + EMBED_BATCH_SIZE]
+        async with _get_async_semaphore():
+            _configure_client(api_key)
+            new_embeddings.extend(await _embed_async(batch))
+    return _fill_query_embeddings(queries, embeddings, missing, new_embeddings)
+
+def retrieve_batch_from_knowledge_base(queries: List[str], api_key: str, k: int = 5,
+                                       master: MasterIndex = None) -> List[List[Dict[str, Any]]]:
+    """Retrieve relevant chunks for every query of a document with one batched embedding pass."""
+    if not queries:
+        return []
+    try:
+        embeddings = embed_queries(queries, api_key)
+        results = search_knowledge_base(np.array(embeddings, dtype='float32'), k, master=master)
+        for query, chunks in zip(queries, results):
+            _log_retrieval(query, chunks)
+        return results
+    except LLMUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving from knowledge base: {e}")
+        return [[] for _ in queries]
+
+async def retrieve_batch_from_knowledge_base_async(queries: List[str], api_key: str, k: int = 5,
+                                                   master: MasterIndex = None) -> List[List[Dict[str, Any]]]:
+    """Async counterpart of retrieve_batch_from_knowledge_base."""
+    if not queries:
+        return []
+    try:
+        embeddings = await embed_queries_async(queries, api_key)
+        results = search_knowledge_base(np.array(embeddings, dtype='float32'), k, master=master)
+        for query, chunks in zip(queries, results):
+            _log_retrieval(query, chunks)
+        return results
+    except LLMUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving from knowledge base: {e}")
+        return [[] for _ in queries]
+
+def retrieve_from_knowledge_base(query: str, api_key: str, k: int = 5, master: MasterIndex = None) -> List[Dict[str, Any]]:
+    """Retrieve relevant chunks from the knowledge base using FAISS."""
+    return retrieve_batch_from_knowledge_base([query], api_key, k, master=master)[0]
+
+def analyze_compliance(parameters: List[Dict[str, Any]], master_chunks: List[Dict[str, Any]], api_key: str) -> List[Dict[str, Any]]:
+    """Analyze compliance of parameters against master BMR requirements."""
+    cache_key = _compliance_cache_key(parameters, master_chunks)
+    cached = _cached_compliance(cache_key)
+    if cached is not None:
+        return cached
+
+    with api_semaphore:
+        try:
+            model = get_model(api_key)
+            # Numeric and range checks the rule engine can decide never reach the model
+            rule_results, remaining = evaluate_rules(parameters, master_chunks)
+            model_results, incomplete = [], False
+            if remaining:
+                contents = [COMPLIANCE_SYSTEM_PROMPT, _build_compliance_prompt(remaining, master_chunks)]
+                model_results, is_damaged = _parse_compliance(_generate(model, contents, COMPLIANCE_RESPONSE_SCHEMA))
+                if is_damaged:
+                    model_results += _check_missing(model, remaining, model_results, master_chunks)
+                    incomplete = bool(_missing_parameters(remaining, model_results))
+            cleaned_result = _merge_rule_results(parameters, rule_results, model_results)
+
+            # Identify standard parameters locally; only low-confidence results go to the model
+            standard_params, uncertain = classify_standard_params(cleaned_result)
+            if uncertain:
+                contents = [STANDARD_PARAMS_SYSTEM_PROMPT, _build_standard_params_prompt(uncertain)]
+                standard_params.update(_parse_standard_params(_generate(model, contents)))
+            filtered_results, standard_params = _split_standard_params(cleaned_result, standard_params)
+            _store_compliance(cache_key, filtered_results, standard_params, incomplete)
             return filtered_results, standard_params
-            
+
+        except LLMUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"Error in analyze_compliance: {e}")
-            return [], {}
\ No newline at end of file
+            return [], {}
+
+async def extract_parameters_to_verify_async(chunk: str, api_key: str) -> List[Dict[str, Any]]:
+    """Async counterpart of extract_parameters_to_verify using the shared client."""
+    logger.info(f"Extracting parameters (async), input content length: {len(chunk)} characters")
+    cache_key = _extraction_cache_key(chunk)
+    parameters = _cached_extraction(cache_key)
+    if parameters is not None:
+        return parameters
+
+    async with _get_async_semaphore():
+        try:
+            model = get_model(api_key)
+            contents = [EXTRACTION_SYSTEM_PROMPT, _build_extraction_prompt(chunk)]
+            parameters, broken = _parse_parameters(await _generate_async(model, contents, EXTRACTION_RESPONSE_SCHEMA))
+            if broken:
+                repaired, broken = await _repair_parameters_async(model, broken)
+                parameters += repaired
+            if not broken:  # A still-damaged extraction is retried in full next time
+                llm_cache.set(cache_key, parameters)
+            return parameters
+
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            logger.error(f"Error extracting parameters: {e}")
+            return []
+
+async def analyze_compliance_batch_async(items: List[Tuple[int, List[Dict[str, Any]], List[Dict[str, Any]]]], api_key: str) -> Dict[int, Tuple[List[Dict[str, Any]], Dict[str, str]]]:
+    """Async counterpart of analyze_compliance_batch."""
+    done, pending = _start_batch(items)
+    if len(pending) <= 1:
+        unanswered = pending
+    else:
+        try:
+            model_results, incomplete = {}, set()
+            if any(item["remaining"] for item in pending):
+                model_results, is_damaged = _parse_batch_compliance(await _call_model_async(
+                    api_key, [COMPLIANCE_BATCH_SYSTEM_PROMPT, _build_batch_compliance_prompt(pending)], COMPLIANCE_BATCH_RESPONSE_SCHEMA))
+                retry = _retry_batch_items(pending, model_results) if is_damaged else []
+                if retry:
+                    logger.info(f"Retrying {sum(len(item['remaining']) for item in retry)} parameters missing from a damaged packed response")
+                    _add_batch_results(model_results, _parse_batch_compliance(await _call_model_async(
+                        api_key, [COMPLIANCE_BATCH_SYSTEM_PROMPT, _build_batch_compliance_prompt(retry)], COMPLIANCE_BATCH_RESPONSE_SCHEMA))[0])
+                    incomplete = {item["chunk_index"] for item in _retry_batch_items(retry, model_results)}
+            answered, unanswered = _classify_batch(pending, model_results)
+            uncertain = [result for item in answered for result in item["uncertain"]]
+            model_standard_params = {}
+            if uncertain:
+                model_standard_params = _parse_standard_params(
+                    await _call_model_async(api_key, [STANDARD_PARAMS_SYSTEM_PROMPT, _build_standard_params_prompt(uncertain)]))
+            _finish_batch(answered, model_standard_params, done, incomplete)
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in analyze_compliance_batch: {e}")
+            unanswered = [item for item in pending if item["chunk_index"] not in done]
+
+    if unanswered:
+        logger.info(f"Analyzing {len(unanswered)} chunks of the pack individually")
+    results = await asyncio.gather(*(analyze_compliance_async(item["parameters"], item["master_chunks"], api_key)
+                                     for item in unanswered))
+    done.update((item["chunk_index"], result) for item, result in zip(unanswered, results))
+    return done
+
+async def retrieve_from_knowledge_base_async(query: str, api_key: str, k: int = 5, master: MasterIndex = None) -> List[Dict[str, Any]]:
+    """Async counterpart of retrieve_from_knowledge_base using the shared client."""
+    return (await retrieve_batch_from_knowledge_base_async([query], api_key, k, master=master))[0]
+
+async def analyze_compliance_async(parameters: List[Dict[str, Any]], master_chunks: List[Dict[str, Any]], api_key: str):
+    """Async counterpart of analyze_compliance using the shared client."""
+    cache_key = _compliance_cache_key(parameters, master_chunks)
+    cached = _cached_compliance(cache_key)
+    if cached is not None:
+        return cached
+
+    async with _get_async_semaphore():
+        try:
+            model = get_model(api_key)
+            # Numeric and range checks the rule engine can decide never reach the model
+            rule_results, remaining = evaluate_rules(parameters, master_chunks)
+            model_results, incomplete = [], False
+            if remaining:
+                contents = [COMPLIANCE_SYSTEM_PROMPT, _build_compliance_prompt(remaining, master_chunks)]
+                model_results, is_damaged = _parse_compliance(await _generate_async(model, contents, COMPLIANCE_RESPONSE_SCHEMA))
+                if is_damaged:
+                    model_results += await _check_missing_async(model, remaining, model_results, master_chunks)
+                    incomplete = bool(_missing_parameters(remaining, model_results))
+            cleaned_result = _merge_rule_results(parameters, rule_results, model_results)
+
+            # Identify standard parameters locally; only low-confidence results go to the model
+            standard_params, uncertain = classify_standard_params(cleaned_result)
+            if uncertain:
+                contents = [STANDARD_PARAMS_SYSTEM_PROMPT, _build_standard_params_prompt(uncertain)]
+                standard_params.update(_parse_standard_params(await _generate_async(model, contents)))
+            filtered_results, standard_params = _split_standard_params(cleaned_result, standard_params)
+            _store_compliance(cache_key, filtered_results, standard_params, incomplete)
+            return filtered_results, standard_params
+
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in analyze_compliance: {e}")
+            return [], {}
+
+async def analyze_chunk_fused_async(chunk: str, master_chunks: List[Dict[str, Any]], api_key: str):
+    """Async counterpart of analyze_chunk_fused using the shared client."""
+    cache_key = _fused_cache_key(chunk, master_chunks)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Cache hit: reusing fused analysis of {len(cached['results'])} parameters")
+        return cached["parameters"], cached["results"], cached["standard_params"]
+
+    async with _get_async_semaphore():
+        try:
+            model = get_model(api_key)
+            parameters, analyses, flags, damaged_arrays = _parse_fused(await _generate_async(
+                model, [FUSED_SYSTEM_PROMPT, _build_fused_prompt(chunk, master_chunks)], FUSED_RESPONSE_SCHEMA))
+            if damaged_arrays:
+                analyses += await _check_missing_async(model, parameters, analyses, master_chunks)
+            filtered_results, standard_params = _finish_fused(parameters, analyses, flags, master_chunks)
+            _store_fused(cache_key, parameters, filtered_results, standard_params,
+                         _fused_incomplete(damaged_arrays, parameters, analyses))
+            return parameters, filtered_results, standard_params
+
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in analyze_chunk_fused: {e}")
+            return [], [], {}
\ No newline at end of file
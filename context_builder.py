@@ -0,0 +1,111 @@
+import logging
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Tuple
+from chunking import estimate_tokens
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CONTEXT_TOKEN_BUDGET = 1500  # Estimated tokens of master content sent with one chunk's parameters
+MIN_OVERLAP_CHARS = 20  # Shorter suffix/prefix matches between neighbouring chunks are not treated as overlap
+
+# Context building totals since startup (or the last reset), for the /metrics endpoint
+_metrics = Counter()
+_metrics_lock = threading.Lock()
+
+def _distance(chunk: Dict[str, Any]) -> float:
+    score = chunk.get("similarity_score")
+    return float("inf") if score is None else score
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is also a prefix of right, or 0 if shorter than MIN_OVERLAP_CHARS."""
+    probe = right[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    pos = left.find(probe, max(0, len(left) - len(right)))
+    while pos != -1:
+        if right.startswith(left[pos:]):
+            return len(left) - pos
+        pos = left.find(probe, pos + 1)
+    return 0
+
+def _merge(chunks: List[Dict[str, Any]], stats: Counter) -> str:
+    """Join chunks in document order, merging the overlap of neighbours and dropping spans already included."""
+    segments = []  # [source, text]
+    ordered = sorted(chunks, key=lambda chunk: (chunk.get("source", ""), chunk.get("chunk_index", 0)))
+    for chunk in ordered:
+        text = chunk["text"]
+        if segments and segments[-1][0] == chunk.get("source", ""):
+            previous = segments[-1][1]
+            if text in previous:
+                stats["spans_removed"] += 1
+                continue
+            overlap = _overlap(previous, text)
+            if overlap:
+                segments[-1][1] = previous + text[overlap:]
+                stats["overlaps_merged"] += 1
+                stats["overlap_chars_removed"] += overlap
+                continue
+        segments.append([chunk.get("source", ""), text])
+    return "\n".join(text for _, text in segments)
+
+def assemble_context(master_chunks: List[Dict[str, Any]], token_budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, Counter]:
+    """Build the master content for a prompt from retrieved chunks, without recording metrics.
+
+    Duplicate chunks are dropped, then chunks are taken in order of distance for
+    as long as the merged context stays within token_budget (the closest chunk is
+    always kept). The kept chunks are merged in document order: neighbouring
+    chunks (by chunk_index) lose the overlap they repeat and chunks contained in
+    a neighbour are removed. Returns the context and its building statistics.
+    """
+    stats = Counter(builds=1, chunks_retrieved=len(master_chunks))
+    stats["raw_tokens"] = estimate_tokens("\n".join(chunk.get("text") or "" for chunk in master_chunks))
+
+    distinct, seen = [], set()
+    for chunk in master_chunks:
+        text = chunk.get("text") or ""
+        key = chunk.get("chunk_id") or text
+        if not text or key in seen:
+            stats["duplicate_chunks"] += 1
+            continue
+        seen.add(key)
+        distinct.append(chunk)
+
+    selected, context = [], ""
+    for chunk in sorted(distinct, key=_distance):
+        merge_stats = Counter()
+        candidate = _merge(selected + [chunk], merge_stats)
+        if selected and estimate_tokens(candidate) > token_budget:
+            stats["chunks_over_budget"] += 1
+            continue
+        selected.append(chunk)
+        context, kept_stats = candidate, merge_stats
+
+    if selected:
+        stats.update(kept_stats)
+    stats["chunks_kept"] = len(selected)
+    stats["context_tokens"] = estimate_tokens(context)
+    return context, stats
+
+def build_context(master_chunks: List[Dict[str, Any]], token_budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """Return the deduplicated, budget-capped master content for a prompt (see assemble_context)."""
+    context, stats = assemble_context(master_chunks, token_budget)
+    with _metrics_lock:
+        _metrics.update(stats)
+    logger.debug(f"Context: {stats['chunks_kept']} of {stats['chunks_retrieved']} chunks, "
+                 f"{stats['raw_tokens']} -> {stats['context_tokens']} tokens")
+    return context
+
+def context_metrics() -> Dict[str, Any]:
+    """Return the context building totals and the share of master tokens they saved."""
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    raw_tokens = metrics.get("raw_tokens", 0)
+    metrics["token_reduction"] = round(1 - metrics.get("context_tokens", 0) / raw_tokens, 3) if raw_tokens else 0.0
+    return metrics
+
+def reset_context_metrics():
+    with _metrics_lock:
+        _metrics.clear()
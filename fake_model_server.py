@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIMENSIONS = 768  # As text-embedding-004
+KEY_VALUE_LINE = re.compile(r"^[ \t]*(?P<key>[^:\n]{1,80}?)[ \t]*:[ \t]*(?P<value>[^\n]+?)[ \t]*$", re.MULTILINE)
+PARAMETERS_SECTION = re.compile(r"^(?:=== Chunk (?P<chunk>\d+) ===\n)?Parameters to analyze:\n", re.MULTILINE)
+# Schema types arrive as Type enum numbers from the REST transport
+SCHEMA_TYPES = {1: "string", 2: "number", 3: "integer", 4: "boolean", 5: "array", 6: "object"}
+
+
+def fake_embedding(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> List[float]:
+    """Deterministic unit vector for a text, so equal queries retrieve the same master chunks."""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0, 1) for _ in range(dimensions)]
+    norm = sum(x * x for x in vector) ** 0.5
+    return [x / norm for x in vector]
+
+
+def _key_value_parameters(prompt: str) -> List[Dict[str, Any]]:
+    """The "key: value" lines of a prompt's BMR content, as parameters."""
+    content = prompt.split("Master BMR content")[0]
+    return [{"name": match.group("key"), "value": match.group("value"), "chunk_index": 0}
+            for match in KEY_VALUE_LINE.finditer(content)]
+
+
+def _prompt_parameters(prompt: str) -> List[Dict[str, Any]]:
+    """The parameters a compliance prompt asks about, with the index of the packed chunk they belong to.
+
+    Each "Parameters to analyze:" section holds a JSON array, decoded whatever the
+    order of its keys. A fused prompt has none: its BMR content lines are used.
+    """
+    decoder = json.JSONDecoder()
+    parameters = []
+    sections = list(PARAMETERS_SECTION.finditer(prompt))
+    for section in sections:
+        try:
+            items, _ = decoder.raw_decode(prompt, section.end())
+        except ValueError:
+            logger.warning("Unreadable parameter list in prompt")
+            continue
+        chunk_index = int(section.group("chunk") or 0)
+        parameters.extend({"name": str(item.get("name", "")), "value": str(item.get("value", "")),
+                           "chunk_index": chunk_index} for item in items if isinstance(item, dict))
+    return parameters if sections else _key_value_parameters(prompt)
+
+
+def _fake_item(properties: Dict[str, Any], name: str, value: str, chunk_index: int = 0) -> Dict[str, Any]:
+    fields = {"name": name, "value": value, "context": "", "parameter": name, "actual_value": value,
+              "expected_value": value, "is_compliant": True, "explanation": "Fake model: always compliant.",
+              "is_standard_parameter": False, "chunk_index": chunk_index}
+    return {key: fields.get(key, "") for key in properties}
+
+
+def fake_response(schema: Dict[str, Any], prompt: str) -> Any:
+    """A plausible value of the requested response schema for a prompt.
+
+    Parameter arrays are filled from the "key: value" lines of the BMR content and
+    analysis arrays from the parameters it asks about (or, for a fused prompt, the
+    same lines); everything else is empty.
+    """
+    schema_type = schema.get("type", "")
+    schema_type = SCHEMA_TYPES.get(schema_type, str(schema_type).lower())
+    if schema_type == "object":
+        return {key: fake_response(value, prompt) for key, value in schema.get("properties", {}).items()}
+    if schema_type != "array":
+        return "" if schema_type == "string" else False
+    properties = schema.get("items", {}).get("properties", {})
+    if "parameter" in properties:
+        return [_fake_item(properties, p["name"], p["value"], p["chunk_index"]) for p in _prompt_parameters(prompt)]
+    if "name" in properties:
+        return [_fake_item(properties, p["name"], p["value"]) for p in _key_value_parameters(prompt)]
+    return []
+
+
+class FakeModelServer(ThreadingHTTPServer):
+    """Gemini-compatible REST endpoint answering generateContent and embedding requests locally.
+
+    Failures can be injected to exercise retries, deadlines, hedging and the
+    circuit breaker of llm_client: a share of requests is answered with
+    fail_status (and a Retry-After header if retry_after is set), a share is
+    slowed down by slow_seconds, and a share gets truncated JSON.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, fail_rate: float = 0.0, fail_status: int = 503, retry_after: float = None,
+                 latency: float = 0.0, slow_rate: float = 0.0, slow_seconds: float = 0.0,
+                 malformed_rate: float = 0.0, seed: int = None, embedding_dimensions: int = EMBEDDING_DIMENSIONS):
+        super().__init__(address, FakeModelHandler)
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.latency = latency
+        self.slow_rate = slow_rate
+        self.slow_seconds = slow_seconds
+        self.malformed_rate = malformed_rate
+        self.embedding_dimensions = embedding_dimensions
+        self.random = random.Random(seed)
+        self.requests = Counter()
+        self.lock = threading.Lock()
+
+    def roll(self, rate: float) -> bool:
+        with self.lock:
+            return self.random.random() < rate
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class FakeModelHandler(BaseHTTPRequestHandler):
+    server: FakeModelServer
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, status: int, body: Any, headers: Dict[str, str] = None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        try:
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            logger.debug("Client went away before the response (timed out or hedged)")
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        method = self.path.split("?")[0].rsplit(":", 1)[-1]
+        with server.lock:
+            server.requests[method] += 1
+
+        time.sleep(server.latency + (server.slow_seconds if server.roll(server.slow_rate) else 0))
+        if server.roll(server.fail_rate):
+            with server.lock:
+                server.requests["failed"] += 1
+            status = "RESOURCE_EXHAUSTED" if server.fail_status == 429 else "UNAVAILABLE"
+            headers = {"Retry-After": str(server.retry_after)} if server.retry_after is not None else None
+            self._send_json(server.fail_status, {"error": {"code": server.fail_status, "message": "Injected failure",
+                                                           "status": status}}, headers)
+            return
+
+        if method == "generateContent":
+            self._generate(body)
+        elif method == "embedContent":
+            embedding = fake_embedding(self._text(body.get("content", {})), server.embedding_dimensions)
+            self._send_json(200, {"embedding": {"values": embedding}})
+        elif method == "batchEmbedContents":
+            embeddings = [{"values": fake_embedding(self._text(request.get("content", {})), server.embedding_dimensions)}
+                          for request in body.get("requests", [])]
+            self._send_json(200, {"embeddings": embeddings})
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": f"Unknown method {self.path}", "status": "NOT_FOUND"}})
+
+    @staticmethod
+    def _text(content: Dict[str, Any]) -> str:
+        return "\n".join(part.get("text", "") for part in content.get("parts", []))
+
+    def _generate(self, body: Dict[str, Any]):
+        # The last part is the request itself; the ones before it are the system prompt
+        parts = [part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", [])]
+        prompt = parts[-1] if parts else ""
+        schema = body.get("generationConfig", {}).get("responseSchema")
+        text = json.dumps(fake_response(schema, prompt) if schema else {})
+        if self.server.roll(self.server.malformed_rate):
+            text = text[:len(text) // 2]
+        self._send_json(200, {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"},
+                                              "finishReason": "STOP", "index": 0}],
+                              "usageMetadata": {"promptTokenCount": len(prompt) // 4}})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local fake of the Gemini REST API for testing the model client. "
+                                                 "Point the pipeline at it with GEMINI_API_ENDPOINT=http://HOST:PORT.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with an error")
+    parser.add_argument("--fail-status", type=int, default=503, choices=[429, 500, 503], help="HTTP status of injected errors")
+    parser.add_argument("--retry-after", type=float, help="Retry-After seconds sent with injected errors")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every request")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of requests delayed by --slow-ms more")
+    parser.add_argument("--slow-ms", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of generations cut off mid-JSON")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--embedding-dimensions", type=int, default=EMBEDDING_DIMENSIONS,
+                        help="Size of the returned embeddings; must match the master index searched")
+    args = parser.parse_args()
+
+    server = FakeModelServer((args.host, args.port), fail_rate=args.fail_rate, fail_status=args.fail_status,
+                             retry_after=args.retry_after, latency=args.latency_ms / 1000, slow_rate=args.slow_rate,
+                             slow_seconds=args.slow_ms / 1000, malformed_rate=args.malformed_rate, seed=args.seed,
+                             embedding_dimensions=args.embedding_dimensions)
+    logger.info(f"Fake model server listening on {server.endpoint}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info(f"Requests served: {dict(server.requests)}")
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
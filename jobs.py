@@ -0,0 +1,153 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class JobStore:
+    """Persistent SQLite store of audit jobs and their results."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT, filepath TEXT, "
+            "stage TEXT, result TEXT, error TEXT, created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        # Append-only log of progress events, read by the streaming endpoint
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT NOT NULL, event TEXT NOT NULL, "
+            "data TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, id)")
+        self._conn.commit()
+
+    def create(self, filename: str, filepath: str, job_id: str = None) -> str:
+        """Record a new queued job and return its id."""
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, filename, filepath, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, filename, filepath, now, now)
+            )
+            self._conn.commit()
+        return job_id
+
+    def update(self, job_id: str, **fields):
+        """Update columns of a job; the result is stored as JSON."""
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"])
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Return a job as a dict, or None if it does not exist."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def add_event(self, job_id: str, event: str, data: dict) -> int:
+        """Append a progress event for a job and return its sequence id."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO job_events (job_id, event, data, created) VALUES (?, ?, ?, ?)",
+                (job_id, event, json.dumps(data), time.time())
+            )
+            self._conn.commit()
+        return cursor.lastrowid
+
+    def events(self, job_id: str, after_id: int = 0) -> list:
+        """Return a job's events with sequence id greater than after_id, as (id, event, data) tuples."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, event, data FROM job_events WHERE job_id = ? AND id > ? ORDER BY id",
+                (job_id, after_id)).fetchall()
+        return [(row["id"], row["event"], json.loads(row["data"])) for row in rows]
+
+    def clear_events(self, job_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+            self._conn.commit()
+
+    def unfinished(self) -> list:
+        """Return the ids of jobs that were queued or running, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created", (QUEUED, RUNNING)).fetchall()
+        return [row["id"] for row in rows]
+
+class JobQueue:
+    """Runs audit jobs on a bounded worker pool, recording their progress in a JobStore.
+
+    runner is called as runner(job_id, filepath, emit) and returns the
+    JSON-serializable result; emit(event, data) appends a progress event to the
+    job's event log, and "stage" events also record the job's current stage.
+    A final "done" or "failed" event closes the log.
+    """
+
+    def __init__(self, store: JobStore, runner: Callable, max_workers: int = 2):
+        self.store = store
+        self.runner = runner
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="audit")
+
+    def submit(self, filename: str, filepath: str, job_id: str = None) -> str:
+        """Queue a new audit and return its job id immediately."""
+        job_id = self.store.create(filename, filepath, job_id=job_id)
+        self.executor.submit(self._run, job_id)
+        logger.info(f"Queued job {job_id} for {filename}")
+        return job_id
+
+    def recover(self):
+        """Re-queue jobs left unfinished by a previous process."""
+        for job_id in self.store.unfinished():
+            logger.info(f"Re-queuing unfinished job {job_id}")
+            self.store.update(job_id, status=QUEUED, stage=None)
+            self.store.clear_events(job_id)
+            self.executor.submit(self._run, job_id)
+
+    def _emit(self, job_id: str, event: str, data: dict):
+        if event == "stage":
+            self.store.update(job_id, stage=data["stage"])
+        self.store.add_event(job_id, event, data)
+
+    def _run(self, job_id: str):
+        job = self.store.get(job_id)
+        self.store.update(job_id, status=RUNNING)
+        try:
+            result = self.runner(job_id, job["filepath"], lambda event, data: self._emit(job_id, event, data))
+            self.store.update(job_id, status=DONE, stage=None, result=result)
+            self.store.add_event(job_id, DONE, {})
+            logger.info(f"Job {job_id} finished")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self.store.update(job_id, status=FAILED, error=str(e))
+            self.store.add_event(job_id, FAILED, {"error": str(e)})
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
@@ -1,11 +1,14 @@
 import os
+import argparse
 import hashlib
 import time
-import pickle
 import numpy as np
 import faiss
 import google.generativeai as genai
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from metadata_store import MetadataStore, write_metadata_store
+from ann_index import (INDEX_TYPES, DEFAULT_NPROBE, DEFAULT_EF_SEARCH, build_index, supports_removal,
+                       recall_latency_report, format_report)
 
 # Chunking Configuration
 CHUNK_SIZE = 300
@@ -15,6 +18,9 @@ CHUNK_OVERLAP = 50
 GEMINI_MODEL = 'models/text-embedding-004'  # Using the latest, high-performance model
 BATCH_SIZE = 100  # Gemini API has a limit of 100 texts per batch
 
+# FAISS Index Configuration
+INDEX_TYPE = "flat"  # One of: flat, ivf_flat, ivf_pq, hnsw (see ann_index.py)
+
 # --- 2. Setup Gemini API ---
 api_key_str = "GEMINI-API-KEY"
 
@@ -58,48 +64,48 @@ def embed_with_retry(model, content, task_type, max_retries=3):
                 print("API call failed after multiple retries. Exiting.")
                 raise
 
-# --- 5. Main Creation Logic ---
-
-def create_database():
-    """Main function to create the FAISS database from the input text file."""
-    input_filepath = INPUT_FILE_PATH
-    print(f"\nProcessing file: {input_filepath}")
+def vector_id_for(chunk_id):
+    """Derives a stable, non-negative int64 FAISS id from a chunk's MD5 chunk_id."""
+    return int(chunk_id[:15], 16)
 
-    # Step 1: Load and Chunk the Document
-    raw_text = read_text_from_file(input_filepath)
-    if raw_text is None:
-        return  # Exit if file could not be read
-
-    print("Text loaded successfully.")
+def output_paths(input_filepath):
+    """Returns the index filename and metadata store directory derived from the input filename."""
+    base_filename = os.path.splitext(os.path.basename(input_filepath))[0]
+    return f"{base_filename}_faiss.index", f"{base_filename}_metadata"
 
+def split_into_chunks(raw_text):
+    """Splits the document into word-count based chunks."""
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=CHUNK_SIZE,
         chunk_overlap=CHUNK_OVERLAP,
         length_function=lambda x: len(x.split())  # Splits based on word count
     )
-    chunks_text = text_splitter.split_text(raw_text)
-    
-    if not chunks_text:
-        print("No text chunks were generated. The input file might be empty or too short.")
-        return
-        
-    print(f"Split document into {len(chunks_text)} chunks.")
+    return text_splitter.split_text(raw_text)
 
-    # Step 2: Prepare Chunks and Metadata
+def build_metadata(chunks_text, input_filepath):
+    """Builds one metadata entry per distinct chunk, dropping chunks whose text repeats an earlier one."""
     all_metadata = []
-    for i, chunk in enumerate(chunks_text):
-        meta = {
+    seen = set()
+    for chunk in chunks_text:
+        chunk_id = generate_chunk_id(chunk)
+        if chunk_id in seen:
+            continue
+        seen.add(chunk_id)
+        all_metadata.append({
             "source": os.path.basename(input_filepath),
-            "chunk_id": generate_chunk_id(chunk),
-            "chunk_index": i,
+            "chunk_id": chunk_id,
+            "vector_id": vector_id_for(chunk_id),
+            "chunk_index": len(all_metadata),
             "text": chunk  # Store the actual text in metadata for later retrieval
-        }
-        all_metadata.append(meta)
+        })
+    duplicates = len(chunks_text) - len(all_metadata)
+    if duplicates:
+        print(f"Skipped {duplicates} duplicate chunks.")
+    return all_metadata
 
-    # Step 3: Generate Embeddings using Gemini API (with batching)
-    print(f"\nGenerating embeddings for {len(chunks_text)} chunks...")
+def embed_chunks(chunks_text):
+    """Generates embeddings for the given chunks using the Gemini API (with batching)."""
     all_embeddings = []
-    
     for i in range(0, len(chunks_text), BATCH_SIZE):
         batch_chunks = chunks_text[i:i + BATCH_SIZE]
         response = embed_with_retry(
@@ -109,30 +115,146 @@ def create_database():
         )
         all_embeddings.extend(response['embedding'])
         print(f"  ... Embedded {len(all_embeddings)}/{len(chunks_text)} chunks")
+    return np.array(all_embeddings).astype('float32')
 
-    embeddings_np = np.array(all_embeddings).astype('float32')
-    print("Embeddings generated successfully.")
+def write_database(index, metadata, index_file, metadata_dir):
+    """Writes the index and metadata store via temporary files and atomic renames.
 
-    # Step 4: Create and Save FAISS Index
-    dimension = embeddings_np.shape[1]
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings_np)
+    Readers never see a partially written file. The index is replaced first, so
+    a crash in between leaves new vectors with old metadata; rerunning the
+    incremental update repairs it, since update_database replaces vectors whose
+    ids are already in the index instead of adding duplicates.
+    """
+    tmp_index_file = f"{index_file}.tmp"
+    faiss.write_index(index, tmp_index_file)
+    os.replace(tmp_index_file, index_file)
+    print(f"Index saved to: {index_file}")
+    write_metadata_store(metadata, metadata_dir)
+    print(f"Metadata saved to: {metadata_dir}")
 
-    # Generate output filenames
-    base_filename = os.path.splitext(os.path.basename(input_filepath))[0]
-    index_file = f"{base_filename}_faiss.index"
-    metadata_file = f"{base_filename}_metadata.pkl"
+def load_database(index_file, metadata_dir):
+    """Loads an existing index and metadata store, or returns (None, None) if either is missing."""
+    if not (os.path.exists(index_file) and os.path.exists(metadata_dir)):
+        return None, None
+    return faiss.read_index(index_file), MetadataStore(metadata_dir)
+
+# --- 5. Main Creation Logic ---
+
+def create_database(index_type=INDEX_TYPE, nlist=None, nprobe=DEFAULT_NPROBE, ef_search=DEFAULT_EF_SEARCH, report=False):
+    """Main function to create the FAISS database from the input text file.
+
+    index_type selects brute-force search ("flat") or an approximate index
+    ("ivf_flat", "ivf_pq", "hnsw"); with report=True a recall-vs-latency sweep
+    against the flat baseline is printed before the index is saved.
+    """
+    input_filepath = INPUT_FILE_PATH
+    print(f"\nProcessing file: {input_filepath}")
+
+    # Step 1: Load and Chunk the Document
+    raw_text = read_text_from_file(input_filepath)
+    if raw_text is None:
+        return  # Exit if file could not be read
+
+    print("Text loaded successfully.")
+
+    chunks_text = split_into_chunks(raw_text)
     
-    faiss.write_index(index, index_file)
-    print(f"\nFAISS index created with {index.ntotal} vectors of dimension {dimension}.")
-    print(f"Index saved to: {index_file}")
+    if not chunks_text:
+        print("No text chunks were generated. The input file might be empty or too short.")
+        return
+        
+    print(f"Split document into {len(chunks_text)} chunks.")
+
+    # Step 2: Prepare Chunks and Metadata
+    all_metadata = build_metadata(chunks_text, input_filepath)
 
-    # Step 5: Save Metadata
-    with open(metadata_file, 'wb') as f:
-        pickle.dump(all_metadata, f)
-    print(f"Metadata saved to: {metadata_file}")
+    # Step 3: Generate Embeddings using Gemini API (with batching)
+    print(f"\nGenerating embeddings for {len(all_metadata)} chunks...")
+    embeddings_np = embed_chunks([meta["text"] for meta in all_metadata])
+    print("Embeddings generated successfully.")
+
+    # Step 4: Create and Save FAISS Index (ID-mapped so later updates can remove vectors)
+    dimension = embeddings_np.shape[1]
+    vector_ids = np.array([meta["vector_id"] for meta in all_metadata], dtype='int64')
+    index = build_index(embeddings_np, index_type=index_type, nlist=nlist, nprobe=nprobe, ef_search=ef_search,
+                        ids=vector_ids)
+    if report:
+        print(f"\nRecall vs latency for '{index_type}' index:")
+        print(format_report(recall_latency_report(index, embeddings_np)))
+
+    # Step 5: Save Index and Metadata
+    index_file, metadata_dir = output_paths(input_filepath)
+    print(f"\nFAISS {index_type} index created with {index.ntotal} vectors of dimension {dimension}.")
+    write_database(index, all_metadata, index_file, metadata_dir)
 
     print("\nDatabase creation process complete!")
 
+def update_database(index_type=INDEX_TYPE, nlist=None, nprobe=DEFAULT_NPROBE, ef_search=DEFAULT_EF_SEARCH):
+    """Incrementally updates the FAISS database after the input text file changed.
+
+    Chunk IDs of the re-split document are diffed against the stored metadata:
+    only new or changed chunks are embedded and added, vectors of chunks that no
+    longer exist are removed by id, and everything is written atomically. Falls
+    back to a full rebuild when there is no existing database or its index
+    cannot remove vectors (legacy non-ID-mapped, HNSW or ID-mapped IVF indexes).
+    """
+    input_filepath = INPUT_FILE_PATH
+    index_file, metadata_dir = output_paths(input_filepath)
+    index, old_metadata = load_database(index_file, metadata_dir)
+    if index is None:
+        print("No existing database found; creating it from scratch.")
+        return create_database(index_type=index_type, nlist=nlist, nprobe=nprobe, ef_search=ef_search)
+    if not supports_removal(index):
+        print("Existing index does not support removing vectors by id; rebuilding it.")
+        return create_database(index_type=index_type, nlist=nlist, nprobe=nprobe, ef_search=ef_search)
+
+    print(f"\nUpdating database from file: {input_filepath}")
+    raw_text = read_text_from_file(input_filepath)
+    if raw_text is None:
+        return
+    chunks_text = split_into_chunks(raw_text)
+    if not chunks_text:
+        print("No text chunks were generated. The input file might be empty or too short.")
+        return
+
+    new_metadata = build_metadata(chunks_text, input_filepath)
+    old_chunk_ids = [chunk_id.decode('ascii') for chunk_id in old_metadata.chunk_ids]
+    old_ids = set(old_chunk_ids)
+    new_ids = {meta["chunk_id"] for meta in new_metadata}
+    added = [meta for meta in new_metadata if meta["chunk_id"] not in old_ids]
+    stale_rows = [row for row, chunk_id in enumerate(old_chunk_ids) if chunk_id not in new_ids]
+    print(f"{len(new_metadata) - len(added)} chunks unchanged, {len(added)} new or changed, {len(stale_rows)} stale.")
+
+    if stale_rows:
+        stale_ids = np.asarray(old_metadata.vector_ids, dtype='int64')[stale_rows]
+        removed = index.remove_ids(stale_ids)
+        print(f"Removed {removed} stale vectors.")
+    if added:
+        print(f"\nGenerating embeddings for {len(added)} chunks...")
+        embeddings_np = embed_chunks([meta["text"] for meta in added])
+        added_ids = np.array([meta["vector_id"] for meta in added], dtype='int64')
+        # Vectors an interrupted update already added are replaced; the index would otherwise keep both copies
+        index.remove_ids(added_ids)
+        index.add_with_ids(embeddings_np, added_ids)
+
+    if not added and not stale_rows:
+        print("Database is already up to date.")
+        return
+    write_database(index, new_metadata, index_file, metadata_dir)
+    print(f"\nDatabase update complete: {index.ntotal} vectors.")
+
 if __name__ == "__main__":
-    create_database()
+    parser = argparse.ArgumentParser(description="Create the FAISS knowledge base from the master BMR text.")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=INDEX_TYPE)
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default: about 4 * sqrt(n))")
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE, help="IVF lists scanned per query")
+    parser.add_argument("--ef-search", type=int, default=DEFAULT_EF_SEARCH, help="HNSW candidate list size")
+    parser.add_argument("--report", action="store_true", help="Print a recall-vs-latency report against the flat baseline")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Embed only new or changed chunks and update the existing database in place")
+    args = parser.parse_args()
+    if args.incremental:
+        update_database(index_type=args.index_type, nlist=args.nlist, nprobe=args.nprobe, ef_search=args.ef_search)
+    else:
+        create_database(index_type=args.index_type, nlist=args.nlist, nprobe=args.nprobe,
+                        ef_search=args.ef_search, report=args.report)
@@ -0,0 +1,406 @@
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Awaitable, Callable, Dict, Optional
+import requests
+from google.api_core import exceptions as api_exceptions
+from rate_limiter import TokenBucket
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BASE_DELAY_SECONDS = 1.0  # Backoff before the first retry; doubles with every attempt
+MAX_DELAY_SECONDS = 30.0
+MAX_RETRY_AFTER_SECONDS = 60.0  # A longer server-requested wait is not honoured: the call fails instead
+ATTEMPT_TIMEOUT_SECONDS = 60.0  # Timeout of a single request
+DEADLINE_SECONDS = 180.0  # Time allowed for a call, all of its attempts and backoff included
+HEDGE_AFTER_SECONDS = None  # Send a second, identical request when the first is this slow (None: no hedging)
+FAILURE_THRESHOLD = 5  # Consecutive failed attempts that open the circuit (throttling does not count)
+RESET_TIMEOUT_SECONDS = 30.0  # How long an open circuit rejects calls before letting a probe through
+PROBE_WAIT_SECONDS = 1.0  # How often a retry waiting on a half-open circuit checks whether the probe has finished
+
+# Throttling, overload and transient server or network failures; anything else is not retried
+RETRYABLE_ERRORS = (
+    api_exceptions.TooManyRequests,
+    api_exceptions.ResourceExhausted,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.InternalServerError,
+    api_exceptions.GatewayTimeout,
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.RetryError,
+    requests.exceptions.ConnectionError,  # Raised as is by the REST transport, timeouts included
+    requests.exceptions.Timeout,
+    ConnectionError,
+    TimeoutError,
+    asyncio.TimeoutError,
+)
+# Rate limiting: the backend is up but wants fewer requests, so these are backed off but never open the circuit
+THROTTLING_ERRORS = (api_exceptions.TooManyRequests, api_exceptions.ResourceExhausted)
+# A 4xx answer to a bad request: proof the backend is up, so it closes the circuit though the call fails
+REJECTED_REQUEST_ERRORS = (api_exceptions.ClientError,)
+_RETRY_IN_MESSAGE = re.compile(r"retry (?:in|after) (\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class LLMUnavailableError(Exception):
+    """A model call failed after exhausting its retries or its deadline."""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """A model call was rejected without being sent because the backend keeps failing."""
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Return the wait in seconds the server asked for with a failed request, if it said.
+
+    Looks at a retry_after attribute, the Retry-After header of an HTTP response,
+    a RetryInfo entry in the error details (gRPC) and "retry in Ns" in the message.
+    """
+    value = getattr(exc, "retry_after", None)
+    if value is not None:
+        return float(value)
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        header = headers.get("Retry-After") or headers.get("retry-after")
+        if header is not None:
+            try:
+                return float(header)
+            except ValueError:
+                pass  # An HTTP date: fall back to the computed backoff
+    for detail in getattr(exc, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return delay.seconds + delay.nanos / 1e9
+    match = _RETRY_IN_MESSAGE.search(str(exc))
+    return float(match.group(1)) if match else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    return isinstance(exc, RETRYABLE_ERRORS)
+
+
+def is_throttled(exc: BaseException) -> bool:
+    return isinstance(exc, THROTTLING_ERRORS)
+
+
+def is_rejected_request(exc: BaseException) -> bool:
+    return isinstance(exc, REJECTED_REQUEST_ERRORS) and not is_retryable(exc)
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker over consecutive request failures.
+
+    After failure_threshold failures in a row the circuit opens and every call is
+    rejected for reset_timeout seconds. Then a single probe is let through
+    (half-open): its success closes the circuit, its failure opens it again.
+    Throttled requests and local errors neither count as failures nor close the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT_SECONDS):
+        if failure_threshold < 1 or reset_timeout <= 0:
+            raise ValueError("failure_threshold must be at least 1 and reset_timeout positive")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = float(reset_timeout)
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def acquire(self) -> float:
+        """Return 0 if a request may be sent now (taking the probe slot when half-open),
+        else roughly how long to wait before asking again."""
+        with self._lock:
+            if self._state == CLOSED:
+                return 0.0
+            if self._state == OPEN:
+                remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+                if remaining > 0:
+                    return remaining
+                self._state = HALF_OPEN
+                self._probing = False
+            if self._probing:
+                return PROBE_WAIT_SECONDS
+            self._probing = True
+            return 0.0
+
+    def allow(self) -> bool:
+        """Return True if a request may be sent now."""
+        return self.acquire() == 0
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info("Model backend recovered: circuit closed")
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                logger.warning(f"Model backend failing ({self._failures} consecutive errors): "
+                               f"circuit open for {self.reset_timeout:g}s")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """Release the probe slot of a request that says nothing about the backend's health, without changing the state."""
+        with self._lock:
+            self._probing = False
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+
+class LLMClient:
+    """Retries, deadlines, hedging and circuit breaking shared by all model calls.
+
+    A call is given as a function of one argument, the timeout in seconds its
+    request must use, that sends one request and returns its result. call (or
+    call_async for a coroutine function) runs it until it succeeds, retrying
+    throttled and transient failures with full-jitter exponential backoff, or
+    the server's Retry-After when it gives one, within deadline seconds overall.
+    With a rate_limiter, every request waits for a token before its attempt is
+    timed: queueing for the rate limit counts against neither the attempt
+    timeout nor the deadline, and never as a backend failure. With hedge_after
+    set, an attempt still running after that many seconds gets a duplicate
+    request, if a token is free, and the first response wins. New calls fail fast with
+    CircuitOpenError while the circuit breaker is open, but a call already
+    retrying waits for the circuit to half-open if its deadline allows. Any
+    other exhausted call raises LLMUnavailableError, and errors that are not
+    retryable propagate as is.
+    """
+
+    def __init__(self, max_attempts: int = MAX_ATTEMPTS, base_delay: float = BASE_DELAY_SECONDS,
+                 max_delay: float = MAX_DELAY_SECONDS, attempt_timeout: float = ATTEMPT_TIMEOUT_SECONDS,
+                 deadline: float = DEADLINE_SECONDS, hedge_after: Optional[float] = HEDGE_AFTER_SECONDS,
+                 breaker: CircuitBreaker = None, rate_limiter: TokenBucket = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self.rate_limiter = rate_limiter
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+
+    def configure(self, max_attempts: int = None, attempt_timeout: float = None, deadline: float = None,
+                  hedge_after: float = None, failure_threshold: int = None, reset_timeout: float = None):
+        """Change retry, deadline, hedging and circuit-breaker settings at runtime (hedge_after=0 turns hedging off)."""
+        if max_attempts is not None:
+            if max_attempts < 1:
+                raise ValueError("max_attempts must be at least 1")
+            self.max_attempts = max_attempts
+        if attempt_timeout is not None:
+            self.attempt_timeout = attempt_timeout
+        if deadline is not None:
+            self.deadline = deadline
+        if hedge_after is not None:
+            self.hedge_after = hedge_after or None
+        if failure_threshold is not None:
+            self.breaker.failure_threshold = failure_threshold
+        if reset_timeout is not None:
+            self.breaker.reset_timeout = float(reset_timeout)
+
+    def _count(self, name: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[name] += n
+
+    def stats(self) -> Dict[str, Any]:
+        """Return call, attempt, retry, hedge and failure totals and the circuit state."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["circuit"] = self.breaker.state
+        return stats
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats.clear()
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        """Wait before the next attempt: the server's Retry-After if given, else full-jitter exponential backoff."""
+        requested = retry_after(exc)
+        if requested is not None:
+            if requested > MAX_RETRY_AFTER_SECONDS:
+                return float("inf")  # Not worth waiting for: give up now
+            return requested + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _admit(self, attempt: int, started: float) -> float:
+        """Return 0 if the circuit lets the next attempt through, else how long a retry should wait for it.
+
+        Raises CircuitOpenError for a first attempt, or when the wait would overrun the deadline.
+        """
+        wait = self.breaker.acquire()
+        if wait == 0:
+            return 0.0
+        if attempt == 0 or wait >= self.deadline - (time.monotonic() - started):
+            self._count("circuit_rejections")
+            raise CircuitOpenError("Model backend unavailable: circuit open after repeated failures")
+        self._count("circuit_waits")
+        return wait
+
+    def _queue(self) -> float:
+        """Take a rate-limit token for the next request and return how long the caller must wait for it."""
+        if self.rate_limiter is None:
+            return 0.0
+        wait = self.rate_limiter.reserve()
+        if wait > 0:
+            self._count("rate_limit_waits")
+        return wait
+
+    def _hedge_allowed(self) -> bool:
+        """A hedge is an extra request: send it only if the rate limit has a token free right now."""
+        if self.rate_limiter is None or self.rate_limiter.try_acquire():
+            self._count("hedges")
+            return True
+        return False
+
+    def _before_attempt(self, attempt: int, started: float):
+        """Count the attempt and return its timeout."""
+        self._count("attempts")
+        if attempt:
+            self._count("retries")
+        return max(0.001, min(self.attempt_timeout, self.deadline - (time.monotonic() - started)))
+
+    def _after_failure(self, attempt: int, started: float, exc: BaseException) -> float:
+        """Record a failed attempt and return the backoff before the next one, or raise if there is none."""
+        if not is_retryable(exc):
+            if is_rejected_request(exc):
+                self.breaker.record_success()  # The backend answered; the request itself was bad
+            else:
+                self.breaker.release()  # A local error, e.g. in parsing the response: no news about the backend
+            self._count("failures")
+            raise exc
+        if is_throttled(exc):
+            self._count("throttled")
+            self.breaker.release()
+        else:
+            self.breaker.record_failure()
+        delay = self._backoff(attempt, exc)
+        remaining = self.deadline - (time.monotonic() - started)
+        if attempt + 1 >= self.max_attempts or delay >= remaining:
+            self._count("failures")
+            reason = "attempts" if attempt + 1 >= self.max_attempts else "deadline"
+            raise LLMUnavailableError(f"Model call failed after {attempt + 1} attempt{'s' if attempt else ''} "
+                                      f"(out of {reason}): {type(exc).__name__}: {exc}") from exc
+        logger.warning(f"Model call failed ({type(exc).__name__}: {exc}); retry {attempt + 1} in {delay:.1f}s")
+        return delay
+
+    def _hedged(self, fn: Callable[[float], Any], timeout: float) -> Any:
+        """Run one attempt, sending a duplicate request if the first is slower than hedge_after."""
+        first = self._hedge_pool.submit(fn, timeout)
+        done, _ = wait([first], timeout=self.hedge_after)
+        if done or not self._hedge_allowed():
+            return first.result()
+        second = self._hedge_pool.submit(fn, max(0.001, timeout - self.hedge_after))
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(self, fn: Callable[[float], Any]) -> Any:
+        """Run fn(timeout) with retries, the call deadline, hedging and the circuit breaker."""
+        self._count("calls")
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            wait_for_circuit = self._admit(attempt, started)
+            if wait_for_circuit:
+                time.sleep(wait_for_circuit)
+                continue
+            queued = self._queue()
+            if queued:
+                time.sleep(queued)
+                started += queued  # Local queueing is not charged to the deadline
+            timeout = self._before_attempt(attempt, started)
+            try:
+                result = self._hedged(fn, timeout) if self.hedge_after else fn(timeout)
+            except Exception as e:
+                time.sleep(self._after_failure(attempt, started, e))
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def _hedged_async(self, fn: Callable[[float], Awaitable[Any]], timeout: float) -> Any:
+        first = asyncio.ensure_future(asyncio.wait_for(fn(timeout), timeout))
+        done, _ = await asyncio.wait([first], timeout=self.hedge_after)
+        if done or not self._hedge_allowed():
+            return await first
+        hedge_timeout = max(0.001, timeout - self.hedge_after)
+        second = asyncio.ensure_future(asyncio.wait_for(fn(hedge_timeout), hedge_timeout))
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call_async(self, fn: Callable[[float], Awaitable[Any]]) -> Any:
+        """Async counterpart of call, for a coroutine function fn(timeout)."""
+        self._count("calls")
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            wait_for_circuit = self._admit(attempt, started)
+            if wait_for_circuit:
+                await asyncio.sleep(wait_for_circuit)
+                continue
+            queued = self._queue()
+            if queued:
+                await asyncio.sleep(queued)
+                started += queued  # Local queueing is not charged to the deadline
+            timeout = self._before_attempt(attempt, started)
+            try:
+                if self.hedge_after:
+                    result = await self._hedged_async(fn, timeout)
+                else:
+                    result = await asyncio.wait_for(fn(timeout), timeout)
+            except Exception as e:
+                await asyncio.sleep(self._after_failure(attempt, started, e))
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
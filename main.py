@@ -1,38 +1,77 @@
-import faiss
-import pickle
-import google.generativeai as genai
+import asyncio
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Tuple, Optional, Callable
 from chunking import read_bmr_file, chunk_bmr
-from compliance_agent import set_index_and_metadata, extract_parameters_to_verify, retrieve_from_knowledge_base, analyze_compliance
+from master_registry import MasterRegistry, MasterIndex, detect_product_name
+from compliance_agent import (get_model, extract_parameters_to_verify, retrieve_from_knowledge_base,
+                              retrieve_batch_from_knowledge_base, analyze_compliance, extract_parameters_to_verify_async,
+                              retrieve_from_knowledge_base_async, retrieve_batch_from_knowledge_base_async,
+                              analyze_compliance_async, analyze_chunk_fused, analyze_chunk_fused_async,
+                              pack_compliance_requests, analyze_compliance_batch, analyze_compliance_batch_async)
+from rule_engine import KEY_VALUE_LINE
+from llm_client import LLMUnavailableError
 
 # Constants
 MASTER_INDEX_FILE = r"Path to Master_BMR_2_faiss.index"
-MASTER_METADATA_FILE = r"Path to Master_BMR_2_metadata.pkl"
+MASTER_METADATA_FILE = r"Path to Master_BMR_2_metadata"  # Metadata store directory (see metadata_store.py)
+MASTER_REGISTRY_FILE = "masters.json"  # Maps product names to their master index and metadata files
+DEFAULT_PRODUCT = "Cefixime Tablets USP 400 mg"  # Master used when a BMR's product cannot be matched
+MASTER_MEMORY_BUDGET_BYTES = 2 * 1024 ** 3  # Loaded master indexes beyond this are evicted (LRU)
 API_KEY = "GEMINI-API-KEY"
+# File names of an audit's outputs, created inside each job's workspace (see workspace.py)
 OUTPUT_JSON_PATH = "compliance_results.json"
 OUTPUT_PDF_PATH = "compliance_report.pdf"
-TEMP_EXTRACTED_PATH = "temp_extracted.txt"
-TEMP_CLEANED_PATH = "temp_cleaned.txt"
+NON_COMPLIANT_PDF_PATH = "non_compliance_report.pdf"
+MAX_WORKERS = 4  # Number of chunks processed concurrently
+# "staged": extract parameters, retrieve with them, then check compliance (up to three model calls per chunk).
+# "fused": retrieve with the chunk text, then extract and check in one schema-constrained call per chunk.
+PIPELINE_MODES = ("staged", "fused")
+PIPELINE_MODE = "staged"
+FUSED_QUERY_MAX_CHARS = 8000  # Chunk text embedded as the retrieval query in fused mode
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Load FAISS index and metadata once at startup
-try:
-    index = faiss.read_index(MASTER_INDEX_FILE)
-    with open(MASTER_METADATA_FILE, 'rb') as file:
-        metadata = pickle.load(file)
-    set_index_and_metadata(index, metadata)
-    logger.info("Loaded FAISS index and metadata successfully.")
-except Exception as e:
-    logger.error(f"Error loading FAISS index or metadata: {e}")
-    raise
+# Master indexes are loaded lazily per product; the default master is always registered
+registry = MasterRegistry(MASTER_REGISTRY_FILE, memory_budget_bytes=MASTER_MEMORY_BUDGET_BYTES, default_product=DEFAULT_PRODUCT)
+if DEFAULT_PRODUCT not in registry.products():
+    registry.register(DEFAULT_PRODUCT, MASTER_INDEX_FILE, MASTER_METADATA_FILE)
 
-genai.configure(api_key=API_KEY)
+get_model(API_KEY)  # Configure the shared Gemini client once at startup
 
-def process_chunk(chunk: str, api_key: str) -> dict:
+def _failed_compliance(explanation: str) -> List[Dict[str, Any]]:
+    """Placeholder compliance row used when a chunk cannot be analyzed."""
+    return [{
+        "parameter": "non stated",
+        "actual_value": "non stated",
+        "expected_value": "non stated",
+        "is_compliant": False,
+        "explanation": explanation
+    }]
+
+def _build_query(parameters: List[Dict[str, Any]]) -> str:
+    """Create the knowledge base query from extracted parameters."""
+    return ", ".join([f"{p['name']}: {p['value']}" for p in parameters])
+
+def _check_retrieved(retrieved_chunks: List[Dict[str, Any]]):
+    """Log when retrieval produced no usable master chunks."""
+    if not retrieved_chunks:
+        logger.warning("Failed to retrieve standard parameters")
+        return
+    standard_params = retrieved_chunks[0].get('parameters', [])
+    if not standard_params or not isinstance(standard_params, list):
+        logger.warning("No valid parameters found in retrieved chunk")
+
+def _finalize(compliance_result: List[Dict[str, Any]], standard_params: Dict[str, str]) -> dict:
+    if not compliance_result:
+        logger.warning("Compliance check failed, using default compliance result")
+        compliance_result = _failed_compliance("No compliance data available due to analysis failure")
+    return {"compliance": compliance_result, "standard_params": standard_params}
+
+def process_chunk(chunk: str, api_key: str, master: MasterIndex = None) -> dict:
     """Process a single chunk through extraction, retrieval, and compliance check."""
     try:
         logger.info("=== Processing Chunk ===")
@@ -41,46 +80,310 @@ def process_chunk(chunk: str, api_key: str) -> dict:
         parameters = extract_parameters_to_verify(chunk, api_key)
         if not parameters:
             logger.warning("Failed to extract parameters")
-            return {"compliance": [{
-                "parameter": "non stated",
-                "actual_value": "non stated",
-                "expected_value": "non stated",
-                "is_compliant": False,
-                "explanation": "No parameters extracted from input chunk"
-            }], "standard_params": {}}
+            return {"compliance": _failed_compliance("No parameters extracted from input chunk"), "standard_params": {}}
        
         # Create query from parameters
-        query = ", ".join([f"{p['name']}: {p['value']}" for p in parameters])
-        retrieved_chunks = retrieve_from_knowledge_base(query, api_key, k=5)
-        if not retrieved_chunks:
-            logger.warning("Failed to retrieve standard parameters")
-            standard_params = [{"name": "non stated", "value": "non stated", "context": "non stated"}]
-        else:
-            standard_params = retrieved_chunks[0].get('parameters', [])
-            if not standard_params or not isinstance(standard_params, list):
-                logger.warning("No valid parameters found in retrieved chunk")
-                standard_params = [{"name": "non stated", "value": "non stated", "context": "non stated"}]
+        master = master or registry.route(detect_product_name([parameters]))
+        retrieved_chunks = retrieve_from_knowledge_base(_build_query(parameters), api_key, k=5, master=master)
         
         # Compliance check
-        compliance_result, standard_params = analyze_compliance(parameters, retrieved_chunks or [{}], api_key)
-        if not compliance_result:
-            logger.warning("Compliance check failed, using default compliance result")
-            compliance_result = [{
-                "parameter": "non stated",
-                "actual_value": "non stated",
-                "expected_value": "non stated",
-                "is_compliant": False,
-                "explanation": "No compliance data available due to analysis failure"
-            }]
-        
-        return {"compliance": compliance_result, "standard_params": standard_params}
+        return _analyze_chunk(parameters, retrieved_chunks, api_key)
     
     except Exception as e:
         logger.error(f"Error processing chunk: {e}")
-        return {"compliance": [{
-            "parameter": "non stated",
-            "actual_value": "non stated",
-            "expected_value": "non stated",
-            "is_compliant": False,
-            "explanation": f"Error processing chunk: {str(e)}"
-        }], "standard_params": {}}
+        return {"compliance": _failed_compliance(f"Error processing chunk: {str(e)}"), "standard_params": {}}
+
+async def process_chunk_async(chunk: str, api_key: str, master: MasterIndex = None) -> dict:
+    """Async counterpart of process_chunk; many of these can share one event loop."""
+    try:
+        parameters = await extract_parameters_to_verify_async(chunk, api_key)
+        if not parameters:
+            logger.warning("Failed to extract parameters")
+            return {"compliance": _failed_compliance("No parameters extracted from input chunk"), "standard_params": {}}
+
+        master = master or registry.route(detect_product_name([parameters]))
+        retrieved_chunks = await retrieve_from_knowledge_base_async(_build_query(parameters), api_key, k=5, master=master)
+        return await _analyze_chunk_async(parameters, retrieved_chunks, api_key)
+
+    except Exception as e:
+        logger.error(f"Error processing chunk: {e}")
+        return {"compliance": _failed_compliance(f"Error processing chunk: {str(e)}"), "standard_params": {}}
+
+def _failed_chunk(e: Exception) -> dict:
+    logger.error(f"Error processing chunk: {e}")
+    return {"compliance": _failed_compliance(f"Error processing chunk: {str(e)}"), "standard_params": {}}
+
+def _extract_for_chunk(chunk: str, api_key: str) -> Tuple[List[Dict[str, Any]], Optional[dict]]:
+    """Extract a chunk's parameters. If the model is unavailable, there are none and the chunk's failed result is returned too."""
+    try:
+        return extract_parameters_to_verify(chunk, api_key), None
+    except LLMUnavailableError as e:
+        return [], _failed_chunk(e)
+
+async def _extract_for_chunk_async(chunk: str, api_key: str) -> Tuple[List[Dict[str, Any]], Optional[dict]]:
+    """Async counterpart of _extract_for_chunk."""
+    try:
+        return await extract_parameters_to_verify_async(chunk, api_key), None
+    except LLMUnavailableError as e:
+        return [], _failed_chunk(e)
+
+def _split_extracted(extracted: List[Tuple[List[Dict[str, Any]], Optional[dict]]]) -> Tuple[List[List[Dict[str, Any]]], Dict[int, dict]]:
+    """Split extraction outcomes into every chunk's parameters and the failed results of chunks the model could not be reached for."""
+    return [parameters for parameters, _ in extracted], {i: failed for i, (_, failed) in enumerate(extracted) if failed}
+
+def _fail_all(all_parameters: List[List[Dict[str, Any]]], failed: Dict[int, dict], e: Exception) -> List[List[Dict[str, Any]]]:
+    """Mark every chunk that has parameters as failed after the document's retrieval failed, and return no master chunks for any."""
+    failed.update({i: _failed_chunk(e) for i, parameters in enumerate(all_parameters) if parameters})
+    return [[] for _ in all_parameters]
+
+def _retrieve_for_chunks(all_parameters: List[List[Dict[str, Any]]], api_key: str, master: MasterIndex) -> List[List[Dict[str, Any]]]:
+    """Retrieve master chunks for every chunk that has parameters with one batched embedding pass."""
+    queries = [_build_query(parameters) for parameters in all_parameters if parameters]
+    retrieved = iter(retrieve_batch_from_knowledge_base(queries, api_key, k=5, master=master))
+    return [next(retrieved) if parameters else [] for parameters in all_parameters]
+
+async def _retrieve_for_chunks_async(all_parameters: List[List[Dict[str, Any]]], api_key: str, master: MasterIndex) -> List[List[Dict[str, Any]]]:
+    """Async counterpart of _retrieve_for_chunks."""
+    queries = [_build_query(parameters) for parameters in all_parameters if parameters]
+    retrieved = iter(await retrieve_batch_from_knowledge_base_async(queries, api_key, k=5, master=master))
+    return [next(retrieved) if parameters else [] for parameters in all_parameters]
+
+def _analyze_chunk(parameters: List[Dict[str, Any]], retrieved_chunks: List[Dict[str, Any]], api_key: str) -> dict:
+    """Run the compliance check for one chunk whose parameters and master chunks are already known."""
+    try:
+        if not parameters:
+            logger.warning("Failed to extract parameters")
+            return {"compliance": _failed_compliance("No parameters extracted from input chunk"), "standard_params": {}}
+        _check_retrieved(retrieved_chunks)
+        compliance_result, standard_params = analyze_compliance(parameters, retrieved_chunks or [{}], api_key)
+        return _finalize(compliance_result, standard_params)
+    except Exception as e:
+        logger.error(f"Error processing chunk: {e}")
+        return {"compliance": _failed_compliance(f"Error processing chunk: {str(e)}"), "standard_params": {}}
+
+async def _analyze_chunk_async(parameters: List[Dict[str, Any]], retrieved_chunks: List[Dict[str, Any]], api_key: str) -> dict:
+    """Async counterpart of _analyze_chunk."""
+    try:
+        if not parameters:
+            logger.warning("Failed to extract parameters")
+            return {"compliance": _failed_compliance("No parameters extracted from input chunk"), "standard_params": {}}
+        _check_retrieved(retrieved_chunks)
+        compliance_result, standard_params = await analyze_compliance_async(parameters, retrieved_chunks or [{}], api_key)
+        return _finalize(compliance_result, standard_params)
+    except Exception as e:
+        logger.error(f"Error processing chunk: {e}")
+        return {"compliance": _failed_compliance(f"Error processing chunk: {str(e)}"), "standard_params": {}}
+
+def _analyze_pack(pack: List[int], all_parameters: List[List[Dict[str, Any]]], all_retrieved: List[List[Dict[str, Any]]],
+                  api_key: str) -> Dict[int, dict]:
+    """Run the compliance checks of a pack of chunks in shared requests. Returns each chunk's result by index."""
+    try:
+        for i in pack:
+            _check_retrieved(all_retrieved[i])
+        analyses = analyze_compliance_batch([(i, all_parameters[i], all_retrieved[i] or [{}]) for i in pack], api_key)
+        return {i: _finalize(*analyses[i]) for i in pack}
+    except Exception as e:
+        logger.error(f"Error processing chunks {pack}: {e}")
+        return {i: {"compliance": _failed_compliance(f"Error processing chunk: {str(e)}"), "standard_params": {}} for i in pack}
+
+async def _analyze_pack_async(pack: List[int], all_parameters: List[List[Dict[str, Any]]], all_retrieved: List[List[Dict[str, Any]]],
+                              api_key: str) -> Dict[int, dict]:
+    """Async counterpart of _analyze_pack."""
+    try:
+        for i in pack:
+            _check_retrieved(all_retrieved[i])
+        analyses = await analyze_compliance_batch_async([(i, all_parameters[i], all_retrieved[i] or [{}]) for i in pack], api_key)
+        return {i: _finalize(*analyses[i]) for i in pack}
+    except Exception as e:
+        logger.error(f"Error processing chunks {pack}: {e}")
+        return {i: {"compliance": _failed_compliance(f"Error processing chunk: {str(e)}"), "standard_params": {}} for i in pack}
+
+def _unpacked_results(all_parameters: List[List[Dict[str, Any]]], failed: Dict[int, dict]) -> Dict[int, dict]:
+    """Results of the chunks left out of every pack: the failed ones, and those no parameters were extracted from."""
+    results = dict(failed)
+    for i, parameters in enumerate(all_parameters):
+        if not parameters and i not in failed:
+            logger.warning("Failed to extract parameters")
+            results[i] = {"compliance": _failed_compliance("No parameters extracted from input chunk"), "standard_params": {}}
+    return results
+
+def _keyed(i: int, fn: Callable[..., dict], *args) -> Dict[int, dict]:
+    return {i: fn(*args)}
+
+def _report(chunk_results: List[dict], results: Dict[int, dict], on_chunk: Optional[Callable[[int, dict], None]]):
+    for i, result in results.items():
+        chunk_results[i] = result
+        if on_chunk:
+            on_chunk(i, result)
+
+def _process_fused_chunk(chunk: str, retrieved_chunks: List[Dict[str, Any]], api_key: str) -> dict:
+    """Run the fused extraction and compliance check for one chunk whose master chunks are already known."""
+    try:
+        _check_retrieved(retrieved_chunks)
+        parameters, compliance_result, standard_params = analyze_chunk_fused(chunk, retrieved_chunks or [{}], api_key)
+        if not parameters:
+            logger.warning("Failed to extract parameters")
+            return {"compliance": _failed_compliance("No parameters extracted from input chunk"), "standard_params": {}}
+        return _finalize(compliance_result, standard_params)
+    except Exception as e:
+        logger.error(f"Error processing chunk: {e}")
+        return {"compliance": _failed_compliance(f"Error processing chunk: {str(e)}"), "standard_params": {}}
+
+async def _process_fused_chunk_async(chunk: str, retrieved_chunks: List[Dict[str, Any]], api_key: str) -> dict:
+    """Async counterpart of _process_fused_chunk."""
+    try:
+        _check_retrieved(retrieved_chunks)
+        parameters, compliance_result, standard_params = await analyze_chunk_fused_async(chunk, retrieved_chunks or [{}], api_key)
+        if not parameters:
+            logger.warning("Failed to extract parameters")
+            return {"compliance": _failed_compliance("No parameters extracted from input chunk"), "standard_params": {}}
+        return _finalize(compliance_result, standard_params)
+    except Exception as e:
+        logger.error(f"Error processing chunk: {e}")
+        return {"compliance": _failed_compliance(f"Error processing chunk: {str(e)}"), "standard_params": {}}
+
+def _chunk_fields(chunk: str) -> List[Dict[str, Any]]:
+    """Read a cleaned chunk's "key: value" lines as name/value pairs, so a document can be routed before any extraction."""
+    fields = []
+    for line in chunk.splitlines():
+        match = KEY_VALUE_LINE.match(line)
+        if match:
+            fields.append({"name": match.group("key"), "value": match.group("value")})
+    return fields
+
+def _fused_queries(chunks: List[str]) -> List[str]:
+    return [chunk[:FUSED_QUERY_MAX_CHARS] for chunk in chunks]
+
+def _check_mode(mode: str):
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown pipeline mode {mode!r}; expected one of {PIPELINE_MODES}")
+
+def _collect_results(futures: list, chunk_results: List[dict], on_chunk: Optional[Callable[[int, dict], None]]) -> List[dict]:
+    """Wait for futures that each return results by chunk index, reporting every chunk as it completes."""
+    for future in as_completed(futures):
+        _report(chunk_results, future.result(), on_chunk)
+    return chunk_results
+
+def _route_master(all_parameters: List[List[Dict[str, Any]]]) -> Tuple[MasterIndex, str]:
+    """Pick the master index for a document from its extracted product name."""
+    product_name = detect_product_name(all_parameters)
+    master = registry.route(product_name)
+    return master, product_name or master.product
+
+def process_chunks(chunks: List[str], api_key: str, max_workers: int = MAX_WORKERS,
+                   on_chunk: Optional[Callable[[int, dict], None]] = None,
+                   mode: str = PIPELINE_MODE) -> Tuple[List[Dict[str, Any]], Dict[str, str], str]:
+    """Process chunks concurrently on a bounded worker pool and merge the results in chunk order.
+
+    Parameters are extracted for all chunks first so the document can be routed to
+    its product's master index and all retrieval queries embedded in one batched
+    request before the compliance checks fan out again, with small chunks packed
+    into shared requests (see pack_compliance_requests). on_chunk, if given, is
+    called with (chunk_index, result) as soon as each chunk's compliance check
+    finishes, in completion order. Returns the results, the standard parameters
+    and the product name. A chunk the model is unavailable for gets a failed
+    result; the rest of the document is still audited.
+
+    In "fused" mode the document is routed and retrieved for from the raw chunk
+    text instead, and each chunk then needs a single model call (see PIPELINE_MODES).
+    """
+    _check_mode(mode)
+    if mode == "fused":
+        return _process_chunks_fused(chunks, api_key, max_workers, on_chunk)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        logger.info(f"Extracting parameters from {len(chunks)} chunks")
+        all_parameters, failed = _split_extracted(list(executor.map(lambda chunk: _extract_for_chunk(chunk, api_key), chunks)))
+
+        master, product_name = _route_master(all_parameters)
+        try:
+            all_retrieved = _retrieve_for_chunks(all_parameters, api_key, master)
+        except LLMUnavailableError as e:
+            all_retrieved = _fail_all(all_parameters, failed, e)
+
+        packs = pack_compliance_requests([[] if i in failed else p for i, p in enumerate(all_parameters)], all_retrieved)
+        logger.info(f"Analyzing compliance for {len(chunks)} chunks in {len(packs)} packs")
+        chunk_results = [None] * len(chunks)
+        _report(chunk_results, _unpacked_results(all_parameters, failed), on_chunk)
+        futures = [executor.submit(_analyze_pack, pack, all_parameters, all_retrieved, api_key) for pack in packs]
+        _collect_results(futures, chunk_results, on_chunk)
+
+    return _merge_results(chunk_results) + (product_name,)
+
+def _process_chunks_fused(chunks: List[str], api_key: str, max_workers: int,
+                          on_chunk: Optional[Callable[[int, dict], None]]) -> Tuple[List[Dict[str, Any]], Dict[str, str], str]:
+    """Fused mode of process_chunks: one batched retrieval from the chunk texts, then one model call per chunk."""
+    master, product_name = _route_master([_chunk_fields(chunk) for chunk in chunks])
+    try:
+        all_retrieved = retrieve_batch_from_knowledge_base(_fused_queries(chunks), api_key, k=5, master=master)
+    except LLMUnavailableError as e:
+        chunk_results = [None] * len(chunks)
+        _report(chunk_results, {i: _failed_chunk(e) for i in range(len(chunks))}, on_chunk)
+        return _merge_results(chunk_results) + (product_name,)
+
+    logger.info(f"Extracting and analyzing {len(chunks)} chunks (fused)")
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [executor.submit(_keyed, i, _process_fused_chunk, chunk, retrieved, api_key)
+                   for i, (chunk, retrieved) in enumerate(zip(chunks, all_retrieved))]
+        chunk_results = _collect_results(futures, [None] * len(chunks), on_chunk)
+
+    return _merge_results(chunk_results) + (product_name,)
+
+async def process_chunks_async(chunks: List[str], api_key: str,
+                               on_chunk: Optional[Callable[[int, dict], None]] = None,
+                               mode: str = PIPELINE_MODE) -> Tuple[List[Dict[str, Any]], Dict[str, str], str]:
+    """Process all chunks of a document concurrently on the running event loop."""
+    _check_mode(mode)
+    if mode == "fused":
+        return await _process_chunks_fused_async(chunks, api_key, on_chunk)
+
+    all_parameters, failed = _split_extracted(await asyncio.gather(*(_extract_for_chunk_async(chunk, api_key) for chunk in chunks)))
+    master, product_name = _route_master(all_parameters)
+    try:
+        all_retrieved = await _retrieve_for_chunks_async(all_parameters, api_key, master)
+    except LLMUnavailableError as e:
+        all_retrieved = _fail_all(all_parameters, failed, e)
+
+    chunk_results = [None] * len(chunks)
+    _report(chunk_results, _unpacked_results(all_parameters, failed), on_chunk)
+
+    async def analyze(pack):
+        _report(chunk_results, await _analyze_pack_async(pack, all_parameters, all_retrieved, api_key), on_chunk)
+
+    packs = pack_compliance_requests([[] if i in failed else p for i, p in enumerate(all_parameters)], all_retrieved)
+    await asyncio.gather(*(analyze(pack) for pack in packs))
+    return _merge_results(chunk_results) + (product_name,)
+
+async def _process_chunks_fused_async(chunks: List[str], api_key: str,
+                                      on_chunk: Optional[Callable[[int, dict], None]]) -> Tuple[List[Dict[str, Any]], Dict[str, str], str]:
+    """Async counterpart of _process_chunks_fused."""
+    master, product_name = _route_master([_chunk_fields(chunk) for chunk in chunks])
+    try:
+        all_retrieved = await retrieve_batch_from_knowledge_base_async(_fused_queries(chunks), api_key, k=5, master=master)
+    except LLMUnavailableError as e:
+        chunk_results = [None] * len(chunks)
+        _report(chunk_results, {i: _failed_chunk(e) for i in range(len(chunks))}, on_chunk)
+        return _merge_results(chunk_results) + (product_name,)
+
+    async def analyze(i, chunk, retrieved):
+        result = await _process_fused_chunk_async(chunk, retrieved, api_key)
+        if on_chunk:
+            on_chunk(i, result)
+        return result
+
+    chunk_results = await asyncio.gather(*(analyze(i, chunk, retrieved)
+                                           for i, (chunk, retrieved) in enumerate(zip(chunks, all_retrieved))))
+    return _merge_results(chunk_results) + (product_name,)
+
+async def process_documents_async(documents: List[List[str]], api_key: str) -> List[Tuple[List[Dict[str, Any]], Dict[str, str], str]]:
+    """Audit several chunked documents at once, sharing one event loop and client."""
+    return await asyncio.gather(*(process_chunks_async(chunks, api_key) for chunks in documents))
+
+def _merge_results(chunk_results: List[dict]) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """Merge per-chunk results and standard parameters in chunk order."""
+    results = []
+    all_standard_params = {}
+    for i, result in enumerate(chunk_results):
+        all_standard_params.update(result["standard_params"])
+        results.append({"chunk_index": i, "compliance": result["compliance"]})
+    return results, all_standard_params
@@ -0,0 +1,256 @@
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+import numpy as np
+import faiss
+from ann_index import set_search_params
+from metadata_store import MetadataStore, InMemoryMetadata
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MAX_L2_DISTANCE = 0.8  # Retrieved chunks at or beyond this L2 distance are discarded
+MIN_NAME_SIMILARITY = 0.5  # Minimum token overlap for a fuzzy product-name match
+PRODUCT_NAME_KEYS = ("product name", "name of product", "name of the product", "product")
+
+def _path_size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+class MasterIndex:
+    """A loaded master BMR: FAISS index plus a columnar metadata store for vectorized lookups."""
+
+    def __init__(self, index, metadata, product: str = None, nbytes: int = 0):
+        self.index = index
+        # Accept a MetadataStore or, for callers that build metadata in memory, a list of dicts
+        self.metadata = InMemoryMetadata(metadata) if isinstance(metadata, list) else metadata
+        self.product = product
+        self.nbytes = nbytes
+        ids = self.metadata.vector_ids
+        if ids is not None:
+            ids = np.asarray(ids, dtype='int64')
+            self.vector_id_rows = np.argsort(ids)
+            self.sorted_vector_ids = ids[self.vector_id_rows]
+        else:
+            # Legacy indexes return row positions directly
+            self.sorted_vector_ids = self.vector_id_rows = None
+
+    @classmethod
+    def load(cls, index_path: str, metadata_path: str, product: str = None, search_params: Dict[str, int] = None):
+        """Load a master index and memory-map its metadata store."""
+        if metadata_path.endswith(".pkl"):
+            raise ValueError(f"Pickled metadata is no longer loaded; convert it with: "
+                             f"python metadata_store.py {metadata_path} <store_dir>")
+        index = faiss.read_index(index_path)
+        if search_params:
+            set_search_params(index, nprobe=search_params.get("nprobe"), ef_search=search_params.get("ef_search"))
+        metadata = MetadataStore(metadata_path)
+        nbytes = _path_size(index_path) + _path_size(metadata_path)
+        logger.info(f"Loaded master index for '{product}' ({index.ntotal} vectors, {nbytes / 1e6:.1f} MB)")
+        return cls(index, metadata, product=product, nbytes=nbytes)
+
+    def rows_for_ids(self, ids: np.ndarray) -> np.ndarray:
+        """Map FAISS result ids to metadata rows; unknown ids and -1 padding map to -1."""
+        if self.sorted_vector_ids is None:
+            return ids
+        positions = np.clip(np.searchsorted(self.sorted_vector_ids, ids), 0, len(self.sorted_vector_ids) - 1)
+        found = (ids != -1) & (self.sorted_vector_ids[positions] == ids)
+        return np.where(found, self.vector_id_rows[positions], -1)
+
+    def search(self, query_vectors: np.ndarray, k: int = 5, max_distance: float = MAX_L2_DISTANCE) -> List[List[Dict[str, Any]]]:
+        """Search the FAISS index for all query vectors at once.
+
+        query_vectors is an (n_queries x dim) matrix. One index.search call covers every
+        query; the -1 padding and distance filter are applied as array masks and the
+        metadata rows of all hits are gathered in one pass. Returns one list of chunks per query.
+        """
+        query_vectors = np.ascontiguousarray(query_vectors, dtype='float32')
+        if query_vectors.ndim == 1:
+            query_vectors = query_vectors.reshape(1, -1)
+        distances, indices = self.index.search(query_vectors, k)
+
+        row_ids = self.rows_for_ids(indices)
+        valid = row_ids != -1
+        keep = valid & (distances < max_distance)
+        rows, cols = np.nonzero(keep)
+        hit_rows = row_ids[rows, cols]
+        hit_distances = distances[rows, cols].tolist()
+        hits = self.metadata.take(hit_rows)
+        for chunk, distance in zip(hits, hit_distances):
+            chunk['similarity_score'] = distance
+
+        # Split the flat hit list back into one slice per query
+        bounds = np.concatenate(([0], np.cumsum(keep.sum(axis=1)))).tolist()
+        results = [hits[bounds[q]:bounds[q + 1]] for q in range(len(query_vectors))]
+
+        logger.info(f"Searched {len(query_vectors)} queries against '{self.product}': {int(valid.sum())} candidate chunks, "
+                    f"{len(hit_rows)} within L2 distance {max_distance}")
+        return results
+
+def normalize_product_name(name: str) -> str:
+    """Lowercase a product name, split numbers from units and collapse punctuation and whitespace for matching."""
+    name = re.sub(r"(\d)([a-z])", r"\1 \2", name.lower())
+    return " ".join(re.sub(r"[^a-z0-9.%]+", " ", name).split())
+
+def _name_similarity(a: str, b: str) -> float:
+    tokens_a, tokens_b = set(a.split()), set(b.split())
+    if not tokens_a or not tokens_b:
+        return 0.0
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+
+def detect_product_name(all_parameters: List[List[Dict[str, Any]]]) -> Optional[str]:
+    """Find the product name among the parameters extracted from a document's chunks."""
+    for parameters in all_parameters:
+        for param in parameters or []:
+            name = normalize_product_name(param.get("name", ""))
+            if name in PRODUCT_NAME_KEYS and param.get("value", "").strip():
+                return param["value"].strip()
+    return None
+
+class MasterRegistry:
+    """Registry of master indexes keyed by product, loaded lazily under a memory budget.
+
+    Products are listed in a JSON file mapping each product name to its index and
+    metadata paths (plus optional aliases and search parameters). The file is
+    re-read when it changes, so masters can be added or removed without
+    restarting the app; products registered in code without persist are kept
+    across reloads. Loaded masters are kept in LRU order and the least recently used ones
+    are dropped once their combined on-disk size exceeds memory_budget_bytes.
+    """
+
+    def __init__(self, registry_path: str, memory_budget_bytes: int = 2 * 1024 ** 3, default_product: str = None):
+        self.registry_path = registry_path
+        self.memory_budget_bytes = memory_budget_bytes
+        self.default_product = default_product
+        self._entries = {}
+        self._file_entries = {}  # Products listed in the registry file
+        self._registered = {}  # Products registered in code and not persisted
+        self._registry_mtime = None
+        self._loaded = OrderedDict()
+        self._loading = {}  # One lock per product, so a master is loaded once however many threads ask for it
+        self._lock = threading.RLock()
+
+    def _reload_if_changed(self):
+        mtime = os.path.getmtime(self.registry_path) if os.path.exists(self.registry_path) else None
+        if mtime == self._registry_mtime:
+            return
+        entries = {}
+        if mtime is not None:
+            with open(self.registry_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        # Drop loaded masters whose file entry changed or was removed
+        for product in set(self._file_entries) | set(entries):
+            if product not in self._registered and entries.get(product) != self._file_entries.get(product):
+                self._loaded.pop(product, None)
+        self._file_entries = entries
+        self._entries = {**entries, **self._registered}
+        self._registry_mtime = mtime
+        logger.info(f"Master registry loaded: {len(self._entries)} products")
+
+    def register(self, product: str, index_path: str, metadata_path: str, aliases: List[str] = None,
+                 search_params: Dict[str, int] = None, persist: bool = False):
+        """Add or replace a product's master index, optionally saving it to the registry file."""
+        with self._lock:
+            self._reload_if_changed()
+            entry = {"index": index_path, "metadata": metadata_path}
+            if aliases:
+                entry["aliases"] = aliases
+            if search_params:
+                entry["search_params"] = search_params
+            if self._entries.get(product) != entry:
+                self._loaded.pop(product, None)
+            if persist:
+                self._registered.pop(product, None)
+                self._file_entries[product] = entry
+                tmp_path = f"{self.registry_path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._file_entries, f, indent=2)
+                os.replace(tmp_path, self.registry_path)
+                self._registry_mtime = os.path.getmtime(self.registry_path)
+            else:
+                self._registered[product] = entry
+            self._entries = {**self._file_entries, **self._registered}
+
+    def products(self) -> List[str]:
+        with self._lock:
+            self._reload_if_changed()
+            return list(self._entries)
+
+    def resolve(self, product_name: Optional[str]) -> Optional[str]:
+        """Return the registered product that best matches product_name, or the default product."""
+        with self._lock:
+            self._reload_if_changed()
+            if product_name:
+                wanted = normalize_product_name(product_name)
+                best, best_score = None, 0.0
+                for product, entry in self._entries.items():
+                    for candidate in [product] + entry.get("aliases", []):
+                        candidate = normalize_product_name(candidate)
+                        if candidate == wanted:
+                            return product
+                        score = _name_similarity(candidate, wanted)
+                        if score > best_score:
+                            best, best_score = product, score
+                if best_score >= MIN_NAME_SIMILARITY:
+                    return best
+                logger.warning(f"No master registered for product '{product_name}', using default '{self.default_product}'")
+            return self.default_product
+
+    def _cached(self, product: str) -> Optional[MasterIndex]:
+        self._reload_if_changed()
+        master = self._loaded.get(product)
+        if master is not None:
+            self._loaded.move_to_end(product)
+        return master
+
+    def get(self, product: str) -> MasterIndex:
+        """Return the loaded master for a registered product, loading it and evicting others if needed.
+
+        A cold load runs outside the registry lock, so routing to other products
+        is not blocked meanwhile; the master is published once loaded, unless its
+        entry changed in the meantime.
+        """
+        with self._lock:
+            master = self._cached(product)
+            if master is not None:
+                return master
+            loading = self._loading.setdefault(product, threading.Lock())
+        with loading:
+            with self._lock:
+                master = self._cached(product)  # Loaded by another thread while this one waited
+                if master is not None:
+                    return master
+                entry = self._entries.get(product)
+                if entry is None:
+                    raise KeyError(f"No master index registered for product '{product}'")
+            master = MasterIndex.load(entry["index"], entry["metadata"], product=product,
+                                      search_params=entry.get("search_params"))
+            with self._lock:
+                if self._entries.get(product) == entry:
+                    self._loaded[product] = master
+                    self._evict(keep=product)
+            return master
+
+    def _evict(self, keep: str):
+        total = sum(master.nbytes for master in self._loaded.values())
+        for product in list(self._loaded):
+            if total <= self.memory_budget_bytes:
+                break
+            if product == keep:
+                continue
+            total -= self._loaded.pop(product).nbytes
+            logger.info(f"Evicted master index for '{product}' to stay within the memory budget")
+
+    def route(self, product_name: Optional[str]) -> MasterIndex:
+        """Resolve a document's product name to a loaded master index."""
+        product = self.resolve(product_name)
+        if product is None:
+            raise KeyError("No master index registered and no default product configured")
+        logger.info(f"Routing product '{product_name}' to master '{product}'")
+        return self.get(product)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+import json
+import logging
+import os
+import shutil
+import sys
+from typing import List, Dict, Any, Iterable
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+CHUNK_ID_WIDTH = 32  # Hex MD5 digest
+
+# A store is a directory of flat files, all memory-mapped on load:
+#   offsets.npy      int64[n + 1]  byte offsets of each chunk's text in text.bin
+#   text.bin         uint8         UTF-8 chunk texts, concatenated
+#   chunk_index.npy  int32[n]
+#   vector_id.npy    int64[n]      FAISS id of each row
+#   chunk_id.npy     S32[n]        MD5 chunk ids
+#   source_idx.npy   int32[n]      index into manifest.json "sources"
+#   manifest.json    row count, version and the small list of source names
+
+def write_metadata_store(metadata: List[Dict[str, Any]], path: str):
+    """Write metadata entries to a columnar store directory, replacing any existing store atomically."""
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    sources = list(dict.fromkeys(entry.get("source", "") for entry in metadata))
+    source_positions = {source: i for i, source in enumerate(sources)}
+    encoded = [entry.get("text", "").encode('utf-8') for entry in metadata]
+    offsets = np.zeros(len(metadata) + 1, dtype='int64')
+    np.cumsum([len(text) for text in encoded], out=offsets[1:])
+
+    with open(os.path.join(tmp_path, "text.bin"), 'wb') as f:
+        for text in encoded:
+            f.write(text)
+    np.save(os.path.join(tmp_path, "offsets.npy"), offsets)
+    np.save(os.path.join(tmp_path, "chunk_index.npy"),
+            np.array([entry.get("chunk_index", i) for i, entry in enumerate(metadata)], dtype='int32'))
+    np.save(os.path.join(tmp_path, "vector_id.npy"),
+            np.array([entry.get("vector_id", i) for i, entry in enumerate(metadata)], dtype='int64'))
+    np.save(os.path.join(tmp_path, "chunk_id.npy"),
+            np.array([entry.get("chunk_id", "") for entry in metadata], dtype=f'S{CHUNK_ID_WIDTH}'))
+    np.save(os.path.join(tmp_path, "source_idx.npy"),
+            np.array([source_positions[entry.get("source", "")] for entry in metadata], dtype='int32'))
+    with open(os.path.join(tmp_path, "manifest.json"), 'w', encoding='utf-8') as f:
+        json.dump({"version": STORE_VERSION, "count": len(metadata), "sources": sources}, f)
+
+    # Swap the new directory into place
+    old_path = f"{path}.old"
+    if os.path.exists(old_path):
+        shutil.rmtree(old_path)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    if os.path.exists(old_path):
+        shutil.rmtree(old_path)
+    logger.info(f"Metadata store with {len(metadata)} rows written to {path}")
+
+class MetadataStore:
+    """Read-only, memory-mapped view of a metadata store written by write_metadata_store.
+
+    Opening a store only maps its files, so startup time and resident memory do
+    not grow with the number of chunks. Rows are fetched by position without
+    copying the columns.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported metadata store version {manifest.get('version')} in {path}")
+        self.sources = manifest["sources"]
+        self.count = manifest["count"]
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode='r')
+        self.chunk_index = np.load(os.path.join(path, "chunk_index.npy"), mmap_mode='r')
+        self.vector_ids = np.load(os.path.join(path, "vector_id.npy"), mmap_mode='r')
+        self.chunk_ids = np.load(os.path.join(path, "chunk_id.npy"), mmap_mode='r')
+        self.source_idx = np.load(os.path.join(path, "source_idx.npy"), mmap_mode='r')
+        text_path = os.path.join(path, "text.bin")
+        # np.memmap cannot map an empty file
+        self.text_blob = np.memmap(text_path, dtype='uint8', mode='r') if os.path.getsize(text_path) else np.zeros(0, dtype='uint8')
+
+    def __len__(self) -> int:
+        return self.count
+
+    def text_bytes(self, row: int) -> memoryview:
+        """Zero-copy view of a row's UTF-8 text."""
+        return memoryview(self.text_blob[self.offsets[row]:self.offsets[row + 1]])
+
+    def text(self, row: int) -> str:
+        return bytes(self.text_bytes(row)).decode('utf-8')
+
+    def take(self, rows: np.ndarray) -> List[Dict[str, Any]]:
+        """Return metadata dicts for the given rows, gathering the fixed-width columns in one step each."""
+        rows = np.asarray(rows, dtype='int64')
+        chunk_index = self.chunk_index[rows].tolist()
+        vector_ids = self.vector_ids[rows].tolist()
+        chunk_ids = self.chunk_ids[rows]
+        sources = self.source_idx[rows].tolist()
+        return [{
+            "source": self.sources[source],
+            "chunk_id": chunk_id.decode('ascii'),
+            "vector_id": vector_id,
+            "chunk_index": index,
+            "text": self.text(row),
+        } for row, index, vector_id, chunk_id, source in zip(rows.tolist(), chunk_index, vector_ids, chunk_ids, sources)]
+
+    def __getitem__(self, row: int) -> Dict[str, Any]:
+        return self.take([row])[0]
+
+    def __iter__(self) -> Iterable[Dict[str, Any]]:
+        for start in range(0, self.count, 1024):
+            yield from self.take(np.arange(start, min(start + 1024, self.count)))
+
+class InMemoryMetadata:
+    """Same interface as MetadataStore over an in-memory list of metadata dicts."""
+
+    def __init__(self, metadata: List[Dict[str, Any]]):
+        self.count = len(metadata)
+        keys = list(dict.fromkeys(key for entry in metadata for key in entry))
+        self.columns = {key: np.array([entry.get(key) for entry in metadata], dtype=object) for key in keys}
+        self.vector_ids = self.columns["vector_id"].astype('int64') if "vector_id" in self.columns else None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def take(self, rows: np.ndarray) -> List[Dict[str, Any]]:
+        gathered = {key: column[rows] for key, column in self.columns.items()}
+        keys = list(gathered)
+        if not keys:
+            return [{} for _ in range(len(rows))]
+        return [dict(zip(keys, values)) for values in zip(*(gathered[key] for key in keys))]
+
+    def __getitem__(self, row: int) -> Dict[str, Any]:
+        return self.take([row])[0]
+
+def convert_pickle(pickle_path: str, store_path: str):
+    """One-time migration of a legacy pickled metadata list to a metadata store (only for trusted files)."""
+    import pickle
+    with open(pickle_path, 'rb') as f:
+        metadata = pickle.load(f)
+    write_metadata_store(metadata, store_path)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python metadata_store.py <metadata.pkl> <output_store_dir>")
+        sys.exit(1)
+    convert_pickle(sys.argv[1], sys.argv[2])
@@ -0,0 +1,84 @@
+import logging
+import re
+from typing import List, Dict, Any, Tuple
+from rule_engine import parse_quantity, parse_spec
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CONFIDENCE_THRESHOLD = 0.8  # Results classified with less confidence are sent to the model
+
+# The criteria of STANDARD_PARAMS_SYSTEM_PROMPT, as name patterns on normalized parameter names
+STANDARD_NAME_PATTERNS = [
+    re.compile(r"\b(?:reference|ref)\s*(?:no|number)\b"),    # 'MFR Reference No', 'BMR Ref. No.'
+    re.compile(r"\bbatch\s*(?:no|number)\b"),                # 'Batch Number', 'Batch No.'
+    re.compile(r"\b(?:product name|name of (?:the )?product)\b"),
+    re.compile(r"\bdate\b"),                                 # 'Date', 'Mfg. Date', 'Date of Expiry'
+]
+# Measurable data is never standard, whatever its value looks like
+MEASURABLE_NAME_PATTERN = re.compile(
+    r"\b(?:temp|temperature|humidity|rh|weight|wt|qty|quantity|yield|speed|pressure|hardness|thickness|"
+    r"diameter|volume|size|time|duration|friability|disintegration|moisture|lod|ph|assay)\b")
+# Names that look like identifiers but are not covered by the criteria: left to the model
+IDENTIFIER_NAME_PATTERN = re.compile(r"\b(?:no|number|code|id|ref|reference|lot)\b")
+
+DATE_PATTERNS = [
+    re.compile(r"^\d{1,2}[/.-]\d{1,2}[/.-](?:\d{4}|\d{2})$"),          # DD/MM/YYYY, DD-MM-YY, DD.MM.YYYY
+    re.compile(r"^\d{4}[/.-]\d{1,2}[/.-]\d{1,2}$"),                     # YYYY-MM-DD
+    re.compile(r"^\d{1,2}(?:st|nd|rd|th)?[\s-]*[a-z]{3,9}\.?[\s,-]*\d{2,4}$"),  # 12 Jan 2023, 12-Jan-23
+    re.compile(r"^[a-z]{3,9}\.?\s+\d{1,2},?\s+\d{4}$"),                 # January 12, 2023
+]
+# Month/year only (e.g. expiry "05/2025", "Jan 2025"): probably a date but not one of the listed formats
+PARTIAL_DATE_PATTERN = re.compile(r"^(?:\d{1,2}[/.-]\d{4}|[a-z]{3,9}\.?[\s-]*\d{4})$")
+MONTHS = ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec")
+
+def _normalize_name(name: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", name.lower()).split())
+
+def _month_ok(value: str) -> bool:
+    words = re.findall(r"[a-z]+", value)
+    return all(word in ("st", "nd", "rd", "th") or word[:3] in MONTHS for word in words)
+
+def is_date(value: str) -> bool:
+    """True if the value is a date in one of the common formats named by the standard-parameter criteria."""
+    value = " ".join(value.strip().lower().split())
+    return any(pattern.match(value) for pattern in DATE_PATTERNS) and _month_ok(value)
+
+def classify(result: Dict[str, Any]) -> Tuple[bool, float]:
+    """Classify one compliance result as a standard parameter or not, with a confidence in [0, 1]."""
+    name = _normalize_name(result.get("parameter", ""))
+    value = str(result.get("actual_value", "")).strip()
+
+    if MEASURABLE_NAME_PATTERN.search(name) and not re.search(r"\bdate\b", name):
+        return False, 0.95
+    if any(pattern.search(name) for pattern in STANDARD_NAME_PATTERNS):
+        return True, 0.95
+    if is_date(value):
+        return True, 0.9
+    if parse_quantity(value) is not None or parse_spec(value) is not None:
+        return False, 0.9
+    if PARTIAL_DATE_PATTERN.match(value.lower()) and _month_ok(value.lower()):
+        return True, 0.6
+    if IDENTIFIER_NAME_PATTERN.search(name):
+        return False, 0.5
+    return False, 0.85
+
+def classify_standard_params(results: List[Dict[str, Any]],
+                             threshold: float = CONFIDENCE_THRESHOLD) -> Tuple[Dict[str, str], List[Dict[str, Any]]]:
+    """Find the standard parameters among compliance results locally.
+
+    Returns the confidently identified standard parameters (name -> actual value)
+    and the results whose classification fell below threshold, for the model to decide.
+    """
+    standard_params = {}
+    uncertain = []
+    for result in results:
+        is_standard, confidence = classify(result)
+        if confidence < threshold:
+            uncertain.append(result)
+        elif is_standard:
+            standard_params[result["parameter"]] = str(result.get("actual_value", ""))
+    logger.info(f"Standard-parameter classifier: {len(standard_params)} standard, "
+                f"{len(results) - len(standard_params) - len(uncertain)} not standard, {len(uncertain)} uncertain")
+    return standard_params, uncertain
@@ -14,7 +14,11 @@ def wrap_text(text, max_width, style):
     """Wrap text to fit within a maximum width for a table cell."""
     return Paragraph(text, style)
 
-def generate_pdf(json_path, pdf_output="compliance_report.pdf", product_name="Cefixime Tablets USP 400 mg", standard_params=None):
+def report_heading(title, product_name):
+    """Heading line for a report, naming the product when it is known."""
+    return f"{title} for {product_name}" if product_name else title
+
+def generate_pdf(json_path, pdf_output="compliance_report.pdf", product_name=None, standard_params=None):
     """Generate a PDF compliance report from JSON data using reportlab."""
     # Load JSON data
     with open(json_path, 'r', encoding='utf-8') as json_file:
@@ -47,7 +51,7 @@ def generate_pdf(json_path, pdf_output="compliance_report.pdf", product_name="Ce
     # Add title and introduction
     elements.append(Paragraph("Compliance Report", title_style))
     elements.append(Spacer(1, 0.2*inch))
-    elements.append(Paragraph(f"Batch Compliance Report for {product_name}", heading_style))
+    elements.append(Paragraph(report_heading("Batch Compliance Report", product_name), heading_style))
     elements.append(Spacer(1, 0.1*inch))
 
     # Add standard parameters section if provided
@@ -133,7 +137,7 @@ def generate_pdf(json_path, pdf_output="compliance_report.pdf", product_name="Ce
     logger.info(f"PDF generated successfully: {pdf_output}")
     
 
-def generate_non_compliant_pdf(json_path, pdf_output="non_compliance_report.pdf", product_name="Cefixime Tablets USP 400 mg", standard_params=None):
+def generate_non_compliant_pdf(json_path, pdf_output="non_compliance_report.pdf", product_name=None, standard_params=None):
     """Generate a PDF compliance report from JSON data showing only non-compliant entries using reportlab."""
     # Load JSON data
     with open(json_path, 'r', encoding='utf-8') as json_file:
@@ -170,7 +174,7 @@ def generate_non_compliant_pdf(json_path, pdf_output="non_compliance_report.pdf"
     # Add title and introduction
     elements.append(Paragraph("Compliance Report Summary", title_style))
     elements.append(Spacer(1, 0.2*inch))
-    elements.append(Paragraph(f"Batch Compliance Report Summary for {product_name}", heading_style))
+    elements.append(Paragraph(report_heading("Batch Compliance Report Summary", product_name), heading_style))
     elements.append(Spacer(1, 0.1*inch))
 
     # Add standard parameters section if provided
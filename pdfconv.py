@@ -1,9 +1,16 @@
 #!/usr/bin/env python3
 import sys
 import re
+import hashlib
 import logging
+import multiprocessing
+import threading
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import pdfplumber
+from pdfminer.pdftypes import PDFStream, resolve1
+from pdfminer.psparser import literal_name
+from result_cache import ResultCache, make_key
 
 # Configure Logging
 logging.basicConfig(
@@ -12,6 +19,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+PAGES_PER_TASK = 8  # Pages handed to a worker process at a time
+# Workers are spawned rather than forked: the pool is used from the threaded job server
+POOL_START_METHOD = "spawn"
+
+# Formatted output of each page is cached by a fingerprint of the page's content,
+# so re-uploaded or revised documents only re-extract the pages that changed
+PAGE_CACHE_PATH = "cache/page_cache.sqlite"
+EXTRACTION_VERSION = 2  # Bump when table detection or formatting changes, to invalidate cached pages
+TABLE_SETTINGS = [
+    {"vertical_strategy":"lines_strict","horizontal_strategy":"lines_strict"},
+    {"vertical_strategy":"lines","horizontal_strategy":"text"}
+]
+STRICT, FALLBACK = 0, 1  # Positions in TABLE_SETTINGS
+# When True, a page is not given the lines_strict pass if the previous page only had
+# tables under the fallback strategy. This saves a pass on runs of such pages but can
+# miss a ruled table that lines_strict would have found, so it is off by default.
+USE_PREVIOUS_STRATEGY = False
+
+page_cache = ResultCache(PAGE_CACHE_PATH)
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
 # Utility Functions
 def clean_text(txt):
     if not txt:
@@ -86,24 +117,119 @@ def format_irregular(table):
     return bullets
 
 # Extraction Logic
-def extract_with_pdfplumber(page):
-    settings = [
-        {"vertical_strategy":"lines_strict","horizontal_strategy":"lines_strict"},
-        {"vertical_strategy":"lines","horizontal_strategy":"text"}
-    ]
-    for s in settings:
+class TableStrategySelector:
+    """Picks which of TABLE_SETTINGS to run on each page of a document, in order.
+
+    Decisions use the page's edge counts, which pdfplumber computes anyway for table
+    finding: lines_strict only uses edges of line objects, so it cannot find a table
+    without at least two vertical and two horizontal line edges, and the fallback
+    takes its vertical edges from lines, rects and curves, so it needs at least two
+    of those. Skipping a strategy that cannot succeed never changes the output. With
+    use_previous, the strategy that worked on the previous page is also taken into
+    account (see USE_PREVIOUS_STRATEGY). Counts of passes and first-choice hits are
+    kept for logging.
+    """
+
+    def __init__(self, use_previous=USE_PREVIOUS_STRATEGY):
+        self.use_previous = use_previous
+        self.previous = None
+        self.stats = {"pages": 0, "passes": 0, "hits": 0, "skipped_passes": 0}
+
+    def candidates(self, page):
+        v_line = h_line = v_any = 0
+        for edge in page.edges:
+            if edge["orientation"] == "v":
+                v_any += 1
+                v_line += edge["object_type"] == "line"
+            elif edge["object_type"] == "line":
+                h_line += 1
+        order = []
+        if v_line >= 2 and h_line >= 2:
+            order.append(STRICT)
+        if v_any >= 2:
+            order.append(FALLBACK)
+        if self.use_previous and self.previous == FALLBACK and order == [STRICT, FALLBACK]:
+            order = [FALLBACK]
+        return order
+
+    def extract_tables(self, page):
+        order = self.candidates(page)
+        self.stats["pages"] += 1
+        self.stats["skipped_passes"] += len(TABLE_SETTINGS) - len(order)
+        for attempt, i in enumerate(order):
+            self.stats["passes"] += 1
+            tbls = page.extract_tables(table_settings=TABLE_SETTINGS[i])
+            if tbls:
+                self.stats["hits"] += attempt == 0
+                self.previous = i
+                return tbls
+        # A page predicted to have no tables at all counts as a hit
+        self.stats["hits"] += not order
+        self.previous = None
+        return []
+
+def merge_strategy_stats(total, stats):
+    for key, value in stats.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+def log_strategy_stats(stats, pdf_path):
+    pages = stats.get("pages", 0)
+    if not pages:
+        return
+    logger.info(f"Table strategy for {pdf_path}: {stats['passes']} passes over {pages} extracted pages "
+                f"({stats['passes'] / pages:.2f} per page, {stats['skipped_passes']} skipped), "
+                f"first-choice hit rate {stats['hits'] / pages:.0%}")
+
+def extract_with_pdfplumber(page, selector=None):
+    if selector is not None:
+        return selector.extract_tables(page)
+    for s in TABLE_SETTINGS:
         tbls = page.extract_tables(table_settings=s)
         if tbls:
             return tbls
     return []
 
-def process_page(pdf_path, page, page_no, output):
-    tables = extract_with_pdfplumber(page)
-    output.append(f"Page {page_no}:")
+def _hash_stream(digest, obj):
+    obj = resolve1(obj)
+    if isinstance(obj, PDFStream):
+        digest.update(obj.get_data())
+
+def page_fingerprint(page):
+    """Hash of everything on a page that table extraction depends on, or None if it cannot be read.
+
+    Covers the page geometry, its raw content streams, the names and ToUnicode maps
+    of its fonts and the content of its form XObjects (images are skipped). Pages
+    that hash equal produce the same extracted text.
+    """
+    try:
+        page_obj = page.page_obj
+        digest = hashlib.sha256(repr((page.bbox, page.rotation)).encode("utf-8"))
+        for stream in page_obj.contents or []:
+            _hash_stream(digest, stream)
+        resources = resolve1(page_obj.resources) or {}
+        for name, font in sorted((resolve1(resources.get("Font")) or {}).items()):
+            font = resolve1(font) or {}
+            digest.update(f"{name}={font.get('BaseFont')}".encode("utf-8"))
+            _hash_stream(digest, font.get("ToUnicode"))
+        for name, xobject in sorted((resolve1(resources.get("XObject")) or {}).items()):
+            xobject = resolve1(xobject)
+            if isinstance(xobject, PDFStream) and literal_name(xobject.get("Subtype")) != "Image":
+                digest.update(name.encode("utf-8"))
+                digest.update(xobject.get_data())
+        return digest.hexdigest()
+    except Exception as e:
+        logger.warning(f"Could not fingerprint page {page.page_number}: {e}")
+        return None
+
+def format_page(page, selector=None):
+    """Extract a page's tables and format them as bullet lines."""
+    tables = extract_with_pdfplumber(page, selector)
+    output = []
     if not tables:
         output.append("- (No tables found)")
         output.append("")
-        return
+        return output
     for tbl in tables:
         table = [r for r in tbl if any(r)]
         if is_key_value(table):
@@ -115,25 +241,120 @@ def process_page(pdf_path, page, page_no, output):
         else:
             output += format_irregular(table)
     output.append("")
+    return output
 
-def extract_pdf_to_text(pdf_path, out_path=None):
-    """Extract text from PDF and return it, optionally saving to out_path."""
+def process_page(pdf_path, page, page_no, output, cache=None, selector=None):
+    """Append a page's formatted lines to output; returns True if they came from the cache.
+
+    With use_previous the strategies tried on a page depend on the one that worked
+    on the previous page, so that strategy is part of the cache key, and a cached
+    page restores the strategy it ended with for the next page.
+    """
+    output.append(f"Page {page_no}:")
+    key = None
+    use_previous = selector is not None and selector.use_previous
+    if cache is not None:
+        fingerprint = page_fingerprint(page)
+        if fingerprint is not None:
+            previous = selector.previous if use_previous else None
+            key = make_key("page", EXTRACTION_VERSION, TABLE_SETTINGS, use_previous, previous, fingerprint)
+            cached = cache.get(key)
+            if cached is not None:
+                if use_previous:
+                    selector.previous = cached["strategy"]
+                output += cached["lines"]
+                return True
+    lines = format_page(page, selector)
+    if key is not None:
+        cache.set(key, {"lines": lines, "strategy": selector.previous if selector is not None else None})
+    output += lines
+    return False
+
+def release_page(page):
+    """Drop a page's cached layout objects once it has been processed, keeping memory bounded."""
+    if hasattr(page, "close"):
+        page.close()
+    else:  # pdfplumber < 0.10
+        page.flush_cache()
+
+def extract_page_range(pdf_path, start, end, use_cache=True):
+    """Extract pages start..end-1 (0-based) of a PDF; runs in a worker process.
+
+    Returns the lines of the pages, how many of them came from the page cache and
+    the table strategy statistics of the range.
+    """
     output = []
+    cached_pages = 0
+    selector = TableStrategySelector()
     with pdfplumber.open(pdf_path) as pdf:
-        for i, page in enumerate(pdf.pages, start=1):
-            process_page(pdf_path, page, i, output)
-    text_content = "\n".join(output)
+        for i in range(start, end):
+            page = pdf.pages[i]
+            cached_pages += process_page(pdf_path, page, i + 1, output, cache=page_cache if use_cache else None,
+                                         selector=selector)
+            release_page(page)
+    return output, cached_pages, selector.stats
+
+def _get_pool(workers):
+    """Return the shared extraction process pool, recreating it if the worker count changed."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(POOL_START_METHOD))
+            _pool_workers = workers
+        return _pool
+
+def iter_pdf_lines(pdf_path, workers=1, use_cache=True):
+    """Yield the extracted text of a PDF line by line, in page order.
+
+    With workers > 1, page ranges of PAGES_PER_TASK pages are extracted in parallel
+    by a pool of worker processes, each opening the PDF itself, and their output is
+    yielded in page order as it becomes available. Pages whose content is already
+    in the page cache are not re-extracted unless use_cache is False.
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+        pages_per_task = max(1, min(PAGES_PER_TASK, -(-page_count // max(1, workers))))
+        cached_pages = 0
+        strategy_stats = {}
+        if workers > 1 and page_count > pages_per_task:
+            starts = range(0, page_count, pages_per_task)
+            ends = [min(start + pages_per_task, page_count) for start in starts]
+            logger.info(f"Extracting {page_count} pages in {len(starts)} ranges on {workers} worker processes")
+            results = _get_pool(workers).map(extract_page_range, [pdf_path] * len(starts), starts, ends,
+                                             [use_cache] * len(starts))
+            for output, cached, stats in results:
+                cached_pages += cached
+                merge_strategy_stats(strategy_stats, stats)
+                yield from output
+        else:
+            selector = TableStrategySelector()
+            strategy_stats = selector.stats
+            for i, page in enumerate(pdf.pages, start=1):
+                output = []
+                cached_pages += process_page(pdf_path, page, i, output, cache=page_cache if use_cache else None,
+                                             selector=selector)
+                release_page(page)
+                yield from output
+    log_strategy_stats(strategy_stats, pdf_path)
+    if use_cache:
+        logger.info(f"Page cache: reused {cached_pages} of {page_count} pages of {pdf_path}")
+
+def extract_pdf_to_text(pdf_path, out_path=None, workers=1, use_cache=True):
+    """Extract text from PDF and return it, optionally saving to out_path."""
+    text_content = "\n".join(iter_pdf_lines(pdf_path, workers=workers, use_cache=use_cache))
     if out_path:
         with open(out_path, "w", encoding="utf-8") as f:
             f.write(text_content)
         logger.info(f"Extraction complete. Saved to {out_path}")
     return text_content
 
-def main(pdf_path, out_path):
-    extract_pdf_to_text(pdf_path, out_path)
+def main(pdf_path, out_path, workers=1):
+    extract_pdf_to_text(pdf_path, out_path, workers=workers)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python pdfconv.py <input.pdf> <output.txt>")
+    if len(sys.argv) not in (3, 4):
+        print("Usage: python pdfconv.py <input.pdf> <output.txt> [workers]")
         sys.exit(1)
-    main(sys.argv[1], sys.argv[2])
\ No newline at end of file
+    main(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else 1)
\ No newline at end of file
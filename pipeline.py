@@ -0,0 +1,79 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+from main import process_chunks, API_KEY
+from pdfconv import iter_pdf_lines
+from cleantxt import iter_clean_lines
+from chunking import iter_token_chunks, chunk_size_report, format_chunk_report
+from pdf_gen import generate_pdf
+from workspace import Workspace
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CHUNK_TOKEN_BUDGET = 2000  # Estimated tokens of cleaned records packed into each chunk
+EXTRACTION_WORKERS = os.cpu_count() or 1  # Processes used to extract pages of large PDFs in parallel
+
+# Events passed to the emit callback of run_audit:
+#   "stage"      {"stage"}                                   a stage has started
+#   "stage_done" {"stage", "seconds"}                        a stage has finished
+#   "chunks"     {"total", "sizes"}                          number of chunks and their size distribution
+#   "chunk"      {"chunk_index", "compliance", "standard_params"}  one chunk's findings
+
+@contextmanager
+def _stage(name: str, emit: Callable[[str, dict], None]):
+    """Emit the start of a stage and, once it finishes, its duration."""
+    emit("stage", {"stage": name})
+    start = time.perf_counter()
+    yield
+    seconds = round(time.perf_counter() - start, 3)
+    logger.info(f"Stage '{name}' took {seconds:.2f}s")
+    emit("stage_done", {"stage": name, "seconds": seconds})
+
+def run_audit(workspace: Workspace, emit: Optional[Callable[[str, dict], None]] = None) -> dict:
+    """Run the full audit of the BMR PDF uploaded to a workspace: extract, clean, chunk, check compliance and render the report.
+
+    Extraction, cleaning and chunking are chained generators, so lines stream from
+    each PDF page into the chunker without intermediate files. Outputs are written
+    inside the workspace, so audits can run concurrently. emit, if given, is called as emit(event, data) with stage
+    timings and with each chunk's compliance rows as soon as that chunk is analyzed
+    (see the event list above). Returns the per-chunk results, the standard
+    parameters, the product name and the paths of the generated JSON and PDF files.
+    """
+    emit = emit or (lambda event, data: None)
+    try:
+        with _stage("extracting", emit):
+            logger.info(f"Starting PDF processing for {workspace.upload}")
+            lines = iter_clean_lines(iter_pdf_lines(workspace.upload, workers=EXTRACTION_WORKERS))
+            chunks = list(iter_token_chunks(lines, token_budget=CHUNK_TOKEN_BUDGET))
+            chunk_report = chunk_size_report(chunks, token_budget=CHUNK_TOKEN_BUDGET)
+            logger.info(f"Created {format_chunk_report(chunk_report)} from {workspace.upload}")
+
+        with _stage("analyzing", emit):
+            emit("chunks", {"total": len(chunks), "sizes": chunk_report})
+            results, all_standard_params, product_name = process_chunks(
+                chunks, API_KEY,
+                on_chunk=lambda i, result: emit("chunk", {"chunk_index": i, **result}))
+
+            with open(workspace.results_json, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            logger.info(f"Results saved to {workspace.results_json}")
+
+        with _stage("reporting", emit):
+            generate_pdf(workspace.results_json, workspace.report_pdf, product_name=product_name, standard_params=all_standard_params)
+            logger.info(f"Final PDF report generated: {workspace.report_pdf}")
+
+        return {
+            "results": results,
+            "standard_params": all_standard_params,
+            "product_name": product_name,
+            "results_json": workspace.results_json,
+            "report_pdf": workspace.report_pdf,
+        }
+    finally:
+        workspace.remove_upload()
+        logger.info("Uploaded file cleaned up.")
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket used to pace calls to the Gemini API.
+
+    Tokens refill continuously at `rate` per second up to `capacity`, so short
+    bursts are allowed while the sustained request rate stays at `rate`.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take `tokens` from the bucket and return how long the caller must wait before using them."""
+        if tokens > self.capacity:
+            raise ValueError("Cannot reserve more tokens than the bucket capacity")
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take `tokens` only if they are available right now; return whether they were taken."""
+        with self._lock:
+            self._refill()
+            if self._tokens < tokens:
+                return False
+            self._tokens -= tokens
+            return True
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until `tokens` are available."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0):
+        """Wait without blocking the event loop until `tokens` are available."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def configure(self, rate: float = None, capacity: float = None):
+        """Change the refill rate and/or burst capacity at runtime."""
+        with self._lock:
+            self._refill()
+            if rate is not None:
+                if rate <= 0:
+                    raise ValueError("rate must be positive")
+                self.rate = float(rate)
+            if capacity is not None:
+                if capacity <= 0:
+                    raise ValueError("capacity must be positive")
+                self.capacity = float(capacity)
+                self._tokens = min(self._tokens, self.capacity)
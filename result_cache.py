@@ -0,0 +1,236 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ACCESS_FLUSH_BATCH = 256  # Hits whose access times are buffered before they are written without a set
+EXPIRY_SWEEP_SECONDS = 60.0  # Minimum time between scans for expired entries (which also resync the totals)
+
+def make_key(*parts: Any) -> str:
+    """Build a content-addressed cache key from JSON-serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ResultCache:
+    """Persistent SQLite key/value cache with size- and age-based eviction.
+
+    Values are stored as JSON. Entries older than `max_age_seconds` are treated
+    as misses, and once the cache holds more than `max_entries` entries or
+    `max_bytes` bytes the least recently used entries are evicted.
+
+    The entry count and byte total are kept in memory, and the access times of
+    hits are buffered and written with the next eviction pass, so reads do not
+    open write transactions.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000, max_bytes: int = 512 * 1024 * 1024,
+                 max_age_seconds: Optional[float] = 30 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._count = 0
+        self._bytes = 0
+        self._accessed = {}  # key -> last access time not yet written
+        self._last_sweep = 0.0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+            conn.commit()
+            self._conn = conn
+            self._load_totals(conn)
+        return self._conn
+
+    def _load_totals(self, conn: sqlite3.Connection):
+        self._count, self._bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+
+    def _flush_accessed(self, conn: sqlite3.Connection):
+        """Write the buffered access times of cache hits (the caller commits)."""
+        if self._accessed:
+            conn.executemany("UPDATE entries SET accessed = ? WHERE key = ?",
+                             [(accessed, key) for key, accessed in self._accessed.items()])
+            self._accessed.clear()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.max_age_seconds is not None and now - created > self.max_age_seconds
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute("SELECT value, created, size FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None or self._expired(row[1], now):
+                    if row is not None:
+                        conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                        conn.commit()
+                        self._count -= 1
+                        self._bytes -= row[2]
+                        self._accessed.pop(key, None)
+                    self.misses += 1
+                    return None
+                self._accessed[key] = now
+                if len(self._accessed) >= ACCESS_FLUSH_BATCH:
+                    self._flush_accessed(conn)
+                    conn.commit()
+                self.hits += 1
+                return json.loads(row[0])
+            except sqlite3.Error as e:
+                logger.error(f"Cache read failed for {self.path}: {e}")
+                self.misses += 1
+                return None
+
+    def set(self, key: str, value: Any):
+        """Store `value` under `key` and evict old entries if the cache is over budget."""
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                size = len(payload.encode('utf-8'))
+                previous = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, payload, size, now, now)
+                )
+                self._accessed.pop(key, None)
+                if previous is None:
+                    self._count += 1
+                    self._bytes += size
+                else:
+                    self._bytes += size - previous[0]
+                self._evict(conn, now)
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Cache write failed for {self.path}: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        if now - self._last_sweep >= EXPIRY_SWEEP_SECONDS:
+            self._last_sweep = now
+            if self.max_age_seconds is not None:
+                cursor = conn.execute("DELETE FROM entries WHERE created < ?", (now - self.max_age_seconds,))
+                self.evictions += max(cursor.rowcount, 0)
+            self._load_totals(conn)  # Also picks up writes by other processes sharing the file
+        count, total = self._count, self._bytes
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Walk entries from least to most recently used until back under budget
+        self._flush_accessed(conn)
+        to_delete = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", to_delete)
+        self.evictions += len(to_delete)
+        self._count, self._bytes = count, total
+        for (key,) in to_delete:
+            self._accessed.pop(key, None)
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM entries")
+            conn.commit()
+            self._count = self._bytes = 0
+            self._accessed.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size of the cache."""
+        with self._lock:
+            try:
+                self._connect()
+                count, total = self._count, self._bytes
+            except sqlite3.Error:
+                count, total = 0, 0
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": count,
+            "bytes": total,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._flush_accessed(self._conn)
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Cache access-time flush failed for {self.path}: {e}")
+                self._conn.close()
+                self._conn = None
+
+class TieredCache:
+    """In-process LRU cache in front of a persistent ResultCache.
+
+    Hot keys are served from memory; misses fall through to disk and are
+    promoted into the LRU on the way back.
+    """
+
+    def __init__(self, disk_cache: ResultCache, max_items: int = 4096):
+        self.disk_cache = disk_cache
+        self.max_items = max_items
+        self.memory_hits = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str, value: Any):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.memory_hits += 1
+                return self._items[key]
+        value = self.disk_cache.get(key)
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: Any):
+        self._remember(key, value)
+        self.disk_cache.set(key, value)
+
+    def stats(self) -> dict:
+        stats = self.disk_cache.stats()
+        stats["memory_hits"] = self.memory_hits
+        stats["memory_entries"] = len(self._items)
+        return stats
@@ -0,0 +1,219 @@
+import logging
+import re
+from collections import namedtuple
+from typing import List, Dict, Any, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Known units: alias -> (dimension, factor to the dimension's base unit).
+# Values with any other unit are left to the model.
+UNITS = {
+    "°c": ("temperature", 1), "ºc": ("temperature", 1), "deg c": ("temperature", 1), "degc": ("temperature", 1),
+    "%": ("percent", 1), "% rh": ("percent", 1), "%rh": ("percent", 1),
+    "mcg": ("mass", 0.001), "µg": ("mass", 0.001), "mg": ("mass", 1), "g": ("mass", 1000), "gm": ("mass", 1000),
+    "gms": ("mass", 1000), "kg": ("mass", 1000000),
+    "ml": ("volume", 1), "l": ("volume", 1000), "lt": ("volume", 1000), "ltr": ("volume", 1000),
+    "mm": ("length", 1), "cm": ("length", 10),
+    "sec": ("time", 1 / 60), "secs": ("time", 1 / 60), "seconds": ("time", 1 / 60),
+    "min": ("time", 1), "mins": ("time", 1), "minutes": ("time", 1),
+    "hr": ("time", 60), "hrs": ("time", 60), "hour": ("time", 60), "hours": ("time", 60),
+    "day": ("time", 1440), "days": ("time", 1440),
+    "rpm": ("speed", 1), "kp": ("hardness", 1), "n": ("force", 1),
+    "tablets": ("count", 1), "tabs": ("count", 1), "nos": ("count", 1),
+    "lac tablets": ("count", 100000), "lakh tablets": ("count", 100000),
+}
+
+NUMBER = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d*\.?\d+"
+UNIT = r"[%°ºµa-z][%a-z ]*?"
+QUANTITY_PATTERN = re.compile(rf"^(?P<num>-?(?:{NUMBER}))\s*(?P<unit>{UNIT})?$")
+RANGE_PATTERN = re.compile(
+    rf"^(?P<low>-?(?:{NUMBER}))\s*(?P<low_unit>{UNIT})?\s*(?:-|to)\s*(?P<high>-?(?:{NUMBER}))\s*(?P<unit>{UNIT})?$")
+BOUND_PATTERN = re.compile(
+    rf"^(?P<op><=|>=|<|>|nmt|nlt|not more than|not less than|max\.?|min\.?|maximum|minimum|up to)\s*"
+    rf"(?P<num>-?(?:{NUMBER}))\s*(?P<unit>{UNIT})?$")
+TOLERANCE_PATTERN = re.compile(
+    rf"^(?P<num>-?(?:{NUMBER}))\s*(?P<unit>{UNIT})?\s*(?:±|\+/-|\+-)\s*(?P<tol>{NUMBER})\s*(?P<tol_unit>{UNIT})?$")
+KEY_VALUE_LINE = re.compile(r"^\s*(?P<key>[^:]{1,80}?)\s*:\s*(?P<value>.+?)\s*$")
+
+UPPER_OPS = {"<=": True, "<": False, "nmt": True, "not more than": True, "max": True, "max.": True,
+             "maximum": True, "up to": True}
+LOWER_OPS = {">=": True, ">": False, "nlt": True, "not less than": True, "min": True, "min.": True,
+             "minimum": True}
+
+# An acceptance range in base units; a bound of None is open. factor converts a number in the
+# requirement's own unit to base units (None if the requirement mixes units of different scale).
+Spec = namedtuple("Spec", "low high low_inclusive high_inclusive dimension factor")
+
+def _normalize_text(text: str) -> str:
+    text = text.strip().lower()
+    text = text.replace("≤", "<=").replace("≥", ">=").replace("–", "-").replace("—", "-").replace("−", "-")
+    return " ".join(text.split())
+
+def _number(text: str) -> float:
+    return float(text.replace(",", ""))
+
+def _unit(text: Optional[str]) -> Optional[Tuple[str, float]]:
+    """Return (dimension, factor) for a unit alias; (None, 1) when there is no unit; None if unknown."""
+    if not text:
+        return None, 1
+    return UNITS.get(text.strip())
+
+def _pair_units(first: Optional[str], second: Optional[str]) -> Optional[Tuple[Tuple[str, float], Tuple[str, float]]]:
+    """Resolve the units written on either side of a range or tolerance.
+
+    A side without a unit takes the other side's; both sides must be known units of
+    the same dimension. Returns the (dimension, factor) of each side, or None.
+    """
+    first_unit, second_unit = _unit(first or second), _unit(second or first)
+    if first_unit is None or second_unit is None or first_unit[0] != second_unit[0]:
+        return None
+    return first_unit, second_unit
+
+def _quantity(text: str) -> Optional[Tuple[float, Tuple[Optional[str], float]]]:
+    """Parse a single measured value into its number as written and its unit's (dimension, factor)."""
+    match = QUANTITY_PATTERN.match(_normalize_text(text))
+    if not match:
+        return None
+    unit = _unit(match.group("unit"))
+    if unit is None:
+        return None
+    return _number(match.group("num")), unit
+
+def parse_quantity(text: str) -> Optional[Tuple[float, Optional[str]]]:
+    """Parse a single measured value such as "27 °C" or "25,000 tablets" into (base value, dimension)."""
+    quantity = _quantity(text)
+    if quantity is None:
+        return None
+    number, (dimension, factor) = quantity
+    return number * factor, dimension
+
+def parse_spec(text: str) -> Optional[Spec]:
+    """Parse a master requirement into a Spec: a range ("25-30 °C"), a bound ("≤ 2%", "NMT 5 min"),
+    a tolerance ("400 mg ± 5%") or an exact value ("25,000 tablets"). Returns None for anything else."""
+    text = _normalize_text(text)
+
+    match = RANGE_PATTERN.match(text)
+    if match:
+        units = _pair_units(match.group("low_unit"), match.group("unit"))
+        if units is None:
+            return None
+        (dimension, low_factor), (_, high_factor) = units
+        low, high = _number(match.group("low")) * low_factor, _number(match.group("high")) * high_factor
+        factor = high_factor if low_factor == high_factor else None
+        return Spec(min(low, high), max(low, high), True, True, dimension, factor) if low != high else None
+
+    match = BOUND_PATTERN.match(text)
+    if match:
+        unit = _unit(match.group("unit"))
+        if unit is None:
+            return None
+        dimension, factor = unit
+        value = _number(match.group("num")) * factor
+        op = match.group("op")
+        if op in UPPER_OPS:
+            return Spec(None, value, True, UPPER_OPS[op], dimension, factor)
+        return Spec(value, None, LOWER_OPS[op], True, dimension, factor)
+
+    match = TOLERANCE_PATTERN.match(text)
+    if match:
+        tolerance = _number(match.group("tol"))
+        if match.group("tol_unit") == "%" and match.group("unit") != "%":
+            unit = _unit(match.group("unit"))
+            if unit is None:
+                return None
+            dimension, factor = unit
+            value = _number(match.group("num")) * factor
+            tolerance = abs(value) * tolerance / 100  # Relative tolerance
+        else:
+            units = _pair_units(match.group("unit"), match.group("tol_unit"))
+            if units is None:
+                return None
+            (dimension, factor), (_, tol_factor) = units
+            value = _number(match.group("num")) * factor
+            tolerance *= tol_factor
+        return Spec(value - tolerance, value + tolerance, True, True, dimension, factor)
+
+    quantity = _quantity(text)
+    if quantity is not None:
+        number, (dimension, factor) = quantity
+        return Spec(number * factor, number * factor, True, True, dimension, factor)
+    return None
+
+def normalize_key(name: str) -> str:
+    """Normalize a parameter name for matching against master "key: value" lines."""
+    return " ".join(re.sub(r"[^a-z0-9%]+", " ", name.lower()).split())
+
+def master_requirements(master_chunks: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Collect the values of "key: value" lines in the master chunks, by normalized key."""
+    requirements = {}
+    for chunk in master_chunks:
+        for line in (chunk.get("text") or "").splitlines():
+            match = KEY_VALUE_LINE.match(line)
+            if match:
+                values = requirements.setdefault(normalize_key(match.group("key")), [])
+                if match.group("value") not in values:
+                    values.append(match.group("value"))
+    return requirements
+
+def _within(value: float, spec: Spec) -> bool:
+    if spec.low is not None and (value < spec.low or (value == spec.low and not spec.low_inclusive)):
+        return False
+    if spec.high is not None and (value > spec.high or (value == spec.high and not spec.high_inclusive)):
+        return False
+    return True
+
+def check_parameter(param: Dict[str, Any], requirements: Dict[str, List[str]]) -> Optional[Dict[str, Any]]:
+    """Decide a parameter's compliance locally, or return None when the rules cannot decide it.
+
+    The parameter's name must match exactly one master requirement (or several that
+    parse to the same Spec), the requirement must parse as a Spec and the actual
+    value as a single quantity in a compatible unit. A value without a unit is
+    read in the requirement's unit, and vice versa.
+    """
+    expected_values = requirements.get(normalize_key(param["name"]))
+    if not expected_values:
+        return None
+    specs = {parse_spec(value) for value in expected_values}
+    if len(specs) != 1 or None in specs:
+        return None
+    spec = specs.pop()
+    quantity = _quantity(param["value"])
+    if quantity is None:
+        return None
+    number, (dimension, factor) = quantity
+    if dimension is None and spec.dimension is not None:
+        if spec.factor is None:
+            return None
+        value = number * spec.factor  # "100" against "100 kg": read in kg
+    elif dimension is not None and spec.dimension is None:
+        value = number  # "27 °C" against "25-30": the requirement is in the value's unit
+    elif dimension != spec.dimension:
+        return None
+    else:
+        value = number * factor
+
+    expected = expected_values[0]
+    compliant = _within(value, spec)
+    verdict = "meets" if compliant else "does not meet"
+    return {
+        "parameter": param["name"],
+        "actual_value": param["value"],
+        "expected_value": expected,
+        "is_compliant": compliant,
+        "explanation": f"Rule check: {param['value']} {verdict} the master requirement {expected}.",
+    }
+
+def evaluate(parameters: List[Dict[str, Any]], master_chunks: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Split parameters into those decided by the rules (returned as compliance results) and those left for the model."""
+    requirements = master_requirements(master_chunks)
+    decided, remaining = [], []
+    for param in parameters:
+        result = check_parameter(param, requirements)
+        if result is None:
+            remaining.append(param)
+        else:
+            decided.append(result)
+    logger.info(f"Rule engine decided {len(decided)} of {len(parameters)} parameters; {len(remaining)} left for the model")
+    return decided, remaining
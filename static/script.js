@@ -6,6 +6,7 @@ document.addEventListener('DOMContentLoaded', () => {
     initializeFileUpload();
     initializeTableFeatures();
     initializeSearchAndFilter();
+    initializeLiveResults();
     
     if (loading) {
         // Hide loading animation after page load if not processing
@@ -161,6 +162,91 @@ function initializeFileUpload() {
     }
 }
 
+function initializeLiveResults() {
+    const live = document.getElementById('live-results');
+    if (!live || !window.EventSource) return;
+
+    const tbody = document.getElementById('live-rows');
+    const liveProgress = document.getElementById('live-progress');
+    const loadingText = document.getElementById('loading-text');
+    const stageTimings = document.getElementById('stage-timings');
+    const timings = [];
+    let totalChunks = 0;
+    let doneChunks = 0;
+
+    const source = new EventSource(live.dataset.eventsUrl);
+
+    source.addEventListener('stage', (e) => {
+        const data = JSON.parse(e.data);
+        if (loadingText) loadingText.textContent = `Processing your PDF (${data.stage})...`;
+    });
+
+    source.addEventListener('stage_done', (e) => {
+        const data = JSON.parse(e.data);
+        timings.push(`${data.stage}: ${data.seconds.toFixed(1)}s`);
+        if (stageTimings) stageTimings.textContent = timings.join(' · ');
+    });
+
+    source.addEventListener('chunks', (e) => {
+        totalChunks = JSON.parse(e.data).total;
+        liveProgress.textContent = `0 / ${totalChunks} chunks analyzed`;
+    });
+
+    source.addEventListener('chunk', (e) => {
+        const data = JSON.parse(e.data);
+        data.compliance.forEach(entry => tbody.appendChild(buildComplianceRow(entry)));
+        doneChunks += 1;
+        liveProgress.textContent = `${doneChunks} / ${totalChunks} chunks analyzed`;
+        live.classList.remove('hidden');
+    });
+
+    // Once the audit is finished, load the full results page (stats, report downloads)
+    ['done', 'failed'].forEach(name => source.addEventListener(name, () => {
+        source.close();
+        window.location.href = live.dataset.doneUrl;
+    }));
+}
+
+function buildComplianceRow(entry) {
+    const row = document.createElement('tr');
+    row.className = 'border-b border-gray-600 hover:bg-gray-600 transition-colors';
+
+    const cell = (text, className) => {
+        const td = document.createElement('td');
+        td.className = className;
+        td.textContent = text;
+        return td;
+    };
+
+    let badge;
+    if (String(entry.expected_value).toLowerCase() === 'non stated') {
+        badge = ['bg-gray-600 text-gray-300', 'fa-minus', 'N/A'];
+    } else if (entry.is_compliant) {
+        badge = ['bg-green-600 text-green-100', 'fa-check', 'Compliant'];
+    } else {
+        badge = ['bg-red-600 text-red-100', 'fa-times', 'Non-Compliant'];
+    }
+    const status = document.createElement('td');
+    status.className = 'p-4';
+    const span = document.createElement('span');
+    span.className = `inline-flex items-center px-2 py-1 rounded-full text-xs font-medium ${badge[0]}`;
+    span.innerHTML = `<i class="fas ${badge[1]} mr-1"></i>`;
+    span.appendChild(document.createTextNode(badge[2]));
+    status.appendChild(span);
+
+    const explanation = document.createElement('td');
+    explanation.className = 'p-4 text-gray-300';
+    const div = document.createElement('div');
+    div.className = 'max-w-xs truncate';
+    div.title = entry.explanation;
+    div.textContent = entry.explanation;
+    explanation.appendChild(div);
+
+    row.append(cell(entry.parameter, 'p-4 font-medium'), cell(entry.actual_value, 'p-4'),
+               cell(entry.expected_value, 'p-4'), status, explanation);
+    return row;
+}
+
 function initializeTableFeatures() {
     // Table sorting and event listeners are implemented in main function
 }
@@ -0,0 +1,52 @@
+import numpy as np
+import faiss
+from ann_index import build_index, supports_removal
+
+
+def _vectors(n, dimension=32, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dimension)).astype('float32')
+
+
+def test_ivf_pq_on_a_small_corpus_falls_back_and_searches():
+    vectors = _vectors(100)
+    index = build_index(vectors, index_type="ivf_pq")
+    assert index.ntotal == 100
+    assert not isinstance(faiss.downcast_index(index), faiss.IndexIVFPQ)
+    _, found = index.search(vectors[:5], 1)
+    assert found.ravel().tolist() == [0, 1, 2, 3, 4]
+
+
+def test_ivf_on_fewer_vectors_than_a_list_uses_flat():
+    vectors = _vectors(20)
+    index = build_index(vectors, index_type="ivf_flat", nlist=8)
+    assert isinstance(faiss.downcast_index(index), faiss.IndexFlat)
+    assert index.ntotal == 20
+
+
+def _assert_removal_keeps_survivors(index_type, n=2000):
+    vectors = _vectors(n)
+    ids = np.arange(n, dtype='int64') * 7 + 3
+    removed = n // 4
+    index = build_index(vectors, index_type=index_type, ids=ids)
+    assert supports_removal(index)
+    assert index.remove_ids(ids[:removed]) == removed
+    _, found = index.search(vectors[-10:], 1)
+    assert found.ravel().tolist() == ids[-10:].tolist()
+    _, found = index.search(vectors[:5], 1)
+    assert not set(found.ravel().tolist()) & set(ids[:removed].tolist())
+
+
+def test_flat_removal_keeps_survivors():
+    _assert_removal_keeps_survivors("flat")
+
+
+def test_ivf_flat_removal_keeps_survivors():
+    _assert_removal_keeps_survivors("ivf_flat")
+
+
+def test_id_mapped_ivf_needs_a_rebuild():
+    vectors = _vectors(2000)
+    ivf = faiss.index_factory(32, "IVF8,Flat")
+    ivf.train(vectors)
+    assert not supports_removal(faiss.IndexIDMap2(ivf))
+    assert not supports_removal(build_index(vectors, index_type="hnsw", ids=np.arange(2000, dtype='int64')))
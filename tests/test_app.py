@@ -0,0 +1,73 @@
+import pytest
+from result_cache import ResultCache, TieredCache
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    """The Flask app with its job store, workspaces and caches under a temporary directory."""
+    monkeypatch.chdir(tmp_path)
+    import app
+    from jobs import JobStore
+    monkeypatch.setattr(app, "job_store", JobStore(str(tmp_path / "jobs.sqlite")))
+    monkeypatch.setattr(app, "llm_cache", ResultCache(str(tmp_path / "llm.sqlite")))
+    monkeypatch.setattr(app, "query_embedding_cache", TieredCache(ResultCache(str(tmp_path / "embeddings.sqlite")), max_items=4))
+    return app
+
+
+def test_metrics_expose_cache_hits_and_misses(app):
+    app.llm_cache.set("key", {"results": []})
+    app.llm_cache.get("key")
+    app.llm_cache.get("other")
+    cache = app.app.test_client().get("/metrics").get_json()["cache"]
+    assert cache["llm"]["hits"] == 1
+    assert cache["llm"]["misses"] == 1
+    assert cache["query_embeddings"]["entries"] == 0
+
+
+def _events(response):
+    """The (id, event) pairs of a Server-Sent Events response."""
+    events = []
+    for message in response.get_data(as_text=True).strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in message.splitlines() if not line.startswith(":"))
+        events.append((fields.get("id"), fields.get("event")))
+    return events
+
+
+def test_events_resume_after_last_event_id(app):
+    job_id = app.job_store.create("bmr.pdf", "bmr.pdf")
+    first = app.job_store.add_event(job_id, "stage", {"stage": "extract"})
+    chunk = app.job_store.add_event(job_id, "chunk", {"chunk_index": 0, "compliance": []})
+    done = app.job_store.add_event(job_id, "done", {})
+    app.job_store.update(job_id, status="done")
+    client = app.app.test_client()
+    assert _events(client.get(f"/jobs/{job_id}/events")) == [(str(first), "stage"), (str(chunk), "chunk"), (str(done), "done")]
+    resumed = client.get(f"/jobs/{job_id}/events", headers={"Last-Event-ID": str(first)})
+    assert _events(resumed) == [(str(chunk), "chunk"), (str(done), "done")]
+    assert _events(client.get(f"/jobs/{job_id}/events?after={chunk}")) == [(str(done), "done")]
+    assert client.get(f"/jobs/{job_id}/events", headers={"Last-Event-ID": "abc"}).status_code == 400
+
+
+def test_events_stream_fails_when_the_job_disappears(app, monkeypatch):
+    job_id = app.job_store.create("bmr.pdf", "bmr.pdf")
+    get = app.job_store.get
+    lookups = []
+
+    def get_once(job_id):
+        lookups.append(job_id)
+        return get(job_id) if len(lookups) == 1 else None
+
+    monkeypatch.setattr(app.job_store, "get", get_once)
+    assert _events(app.app.test_client().get(f"/jobs/{job_id}/events")) == [(None, "failed")]
+
+
+def test_artifacts_are_served_by_job_id(app):
+    from workspace import Workspace
+    job_id = app.job_store.create("bmr.pdf", "bmr.pdf")
+    workspace = Workspace(job_id).create()
+    with open(workspace.results_json, "w") as f:
+        f.write("[]")
+    client = app.app.test_client()
+    assert client.get(f"/jobs/{job_id}/artifacts/results").get_data() == b"[]"
+    assert client.get(f"/jobs/{job_id}/artifacts/report").status_code == 404
+    assert client.get(f"/jobs/{job_id}/artifacts/secrets").status_code == 404
+    assert client.get("/jobs/unknown/artifacts/results").status_code == 404
@@ -0,0 +1,40 @@
+from chunking import iter_token_chunks, iter_chunks, chunk_bmr, chunk_size_report, format_chunk_report, estimate_tokens
+
+
+def _records(count, lines_per_record=3, width=20):
+    lines = []
+    for record in range(count):
+        lines += [f"Key {line}: {str(record) * width}"[:width] for line in range(lines_per_record)]
+        lines.append("")
+    return lines
+
+
+def test_chunks_hold_whole_records_within_the_budget():
+    lines = _records(50)
+    chunks = list(iter_token_chunks(lines, token_budget=60))
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 60 for chunk in chunks)
+    records = [record for chunk in chunks for record in chunk.split("\n\n")]
+    assert records == ["\n".join(lines[i:i + 3]) for i in range(0, len(lines), 4)]
+
+
+def test_oversized_record_is_split_at_line_boundaries():
+    big = [f"Line {i}: {'x' * 30}" for i in range(10)]
+    chunks = list(iter_token_chunks(["Small: 1", ""] + big + ["", "Tail: 2"], token_budget=30))
+    assert chunks[0] == "Small: 1"
+    assert "\n".join(chunks[1:-1] + [chunks[-1].split("\n\n")[0]]).split("\n") == big
+    assert chunks[-1].endswith("\n\nTail: 2")
+    assert all(estimate_tokens(chunk) <= 30 for chunk in chunks)
+
+
+def test_iter_chunks_matches_chunk_bmr():
+    lines = [f"line {i}" for i in range(1203)] + [""]
+    assert list(iter_chunks(lines, lines_per_chunk=500)) == chunk_bmr("\n".join(lines), lines_per_chunk=500)
+
+
+def test_chunk_size_report():
+    report = chunk_size_report(["a" * 40, "b" * 80, "c" * 400], token_budget=50)
+    assert report == {"chunks": 3, "total_tokens": 130, "min": 10, "median": 20, "p90": 100, "max": 100,
+                      "mean_fill": 0.867, "over_budget": 1}
+    assert format_chunk_report(report).startswith("3 chunks, 130 tokens")
+    assert format_chunk_report(chunk_size_report([])) == "0 chunks"
@@ -0,0 +1,23 @@
+import pytest
+from bench_cleantxt import synthetic_extraction, legacy_clean_lines
+from cleantxt import iter_clean_lines, clean_text_file
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_compiled_parser_matches_the_legacy_parser(seed):
+    lines = synthetic_extraction(5000, seed=seed)
+    assert list(iter_clean_lines(lines)) == legacy_clean_lines(lines)
+
+
+def test_edge_cases_match_the_legacy_parser():
+    lines = ["", "   ", "- 1:", "- 2:", "• Key:", "•Key: value: with colon", "  - Name  ", "noise", "- 3:x"]
+    assert list(iter_clean_lines(lines)) == legacy_clean_lines(lines)
+    assert list(iter_clean_lines([])) == legacy_clean_lines([]) == []
+
+
+def test_clean_text_file_writes_the_joined_lines(tmp_path):
+    lines = synthetic_extraction(500)
+    input_path, output_path = tmp_path / "extracted.txt", tmp_path / "cleaned.txt"
+    input_path.write_text("\n".join(lines), encoding="utf-8")
+    clean_text_file(str(input_path), str(output_path))
+    assert output_path.read_text(encoding="utf-8") == "\n".join(legacy_clean_lines(lines))
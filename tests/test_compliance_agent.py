@@ -0,0 +1,131 @@
+import asyncio
+import json
+import pytest
+import compliance_agent
+from result_cache import ResultCache, TieredCache
+
+
+PARAMETERS = [{"name": "Color", "value": "white"}, {"name": "Shape", "value": "round"}]
+MASTER = [{"text": "Color: white. Shape: round."}]
+
+
+def _analysis(name, value):
+    return {"parameter": name, "actual_value": value, "expected_value": value, "is_compliant": True, "explanation": ""}
+
+
+COMPLETE = json.dumps([_analysis("Color", "white"), _analysis("Shape", "round")])
+TRUNCATED = COMPLETE[:COMPLETE.index('"Shape"') + 3]
+
+
+@pytest.fixture
+def model(monkeypatch, tmp_path):
+    """Answer generation requests with the queued responses in turn; standard-parameter requests get {}."""
+    responses = []
+
+    def generate(model, contents, schema=None):
+        return responses.pop(0) if schema is not None else "{}"
+
+    async def generate_async(model, contents, schema=None):
+        return generate(model, contents, schema)
+
+    monkeypatch.setattr(compliance_agent, "llm_cache", ResultCache(str(tmp_path / "cache.sqlite")))
+    monkeypatch.setattr(compliance_agent, "get_model", lambda api_key: None)
+    monkeypatch.setattr(compliance_agent, "_generate", generate)
+    monkeypatch.setattr(compliance_agent, "_generate_async", generate_async)
+    return responses
+
+
+def _cached_entries():
+    return compliance_agent.llm_cache.stats()["entries"]
+
+
+def test_analysis_still_damaged_after_its_retry_is_not_cached(model):
+    model.extend([TRUNCATED, "[{\"parameter\": \"Sha"])
+    results, _ = compliance_agent.analyze_compliance(PARAMETERS, MASTER, "key")
+    assert [result["parameter"] for result in results] == ["Color"]
+    assert _cached_entries() == 0
+
+
+def test_analysis_completed_by_its_retry_is_cached(model):
+    model.extend([TRUNCATED, json.dumps([_analysis("Shape", "round")])])
+    results, _ = compliance_agent.analyze_compliance(PARAMETERS, MASTER, "key")
+    assert sorted(result["parameter"] for result in results) == ["Color", "Shape"]
+    assert _cached_entries() == 1
+
+
+def test_fused_analysis_with_damaged_parameters_is_not_cached(model):
+    parameters = json.dumps({"parameters": [{"name": "Color", "value": "white", "context": ""}], "analyses": []})
+    model.extend([parameters[:-20], COMPLETE])
+    compliance_agent.analyze_chunk_fused("Color: white\nShape: round", MASTER, "key")
+    assert _cached_entries() == 0
+
+
+def test_async_extraction_matches_sync_and_shares_the_cache(model):
+    extracted = json.dumps([{"name": "Color", "value": "white", "context": "Description"}])
+    model.extend([extracted, extracted])
+    chunk = "Color: white"
+    sync = compliance_agent.extract_parameters_to_verify(chunk, "key")
+    compliance_agent.llm_cache.clear()
+    assert asyncio.run(compliance_agent.extract_parameters_to_verify_async(chunk, "key")) == sync
+    assert asyncio.run(compliance_agent.extract_parameters_to_verify_async(chunk, "key")) == sync  # From the cache
+    assert not model
+
+
+def test_async_semaphore_is_per_event_loop():
+    async def semaphores():
+        return compliance_agent._get_async_semaphore(), compliance_agent._get_async_semaphore()
+
+    first, same = asyncio.run(semaphores())
+    other, _ = asyncio.run(semaphores())
+    assert first is same
+    assert first is not other
+
+
+def test_query_embeddings_are_batched_deduplicated_and_cached(model, monkeypatch, tmp_path):
+    batches = []
+
+    def embed(batch):
+        batches.append(list(batch))
+        return [[float(ord(query))] for query in batch]
+
+    monkeypatch.setattr(compliance_agent, "query_embedding_cache", TieredCache(ResultCache(str(tmp_path / "q.sqlite"))))
+    monkeypatch.setattr(compliance_agent, "EMBED_BATCH_SIZE", 2)
+    monkeypatch.setattr(compliance_agent, "_embed", embed)
+    assert compliance_agent.embed_queries(["a", "b", "a", "c"], "key") == [[97.0], [98.0], [97.0], [99.0]]
+    assert batches == [["a", "b"], ["c"]]
+    assert compliance_agent.embed_queries(["c", "a"], "key") == [[99.0], [97.0]]
+    assert len(batches) == 2
+
+
+def test_fused_analysis_takes_one_call_and_uses_the_model_standard_flags(model):
+    fused = json.dumps({
+        "parameters": [{"name": "Color", "value": "white", "context": ""},
+                       {"name": "Equipment ID", "value": "EQ-17", "context": ""}],
+        "analyses": [dict(_analysis("Color", "white"), is_standard_parameter=False),
+                     dict(_analysis("Equipment ID", "EQ-17"), is_standard_parameter=True)]})
+    model.append(fused)
+    chunk = "Color: white\nEquipment ID: EQ-17"
+    parameters, results, standard_params = compliance_agent.analyze_chunk_fused(chunk, MASTER, "key")
+    assert [param["name"] for param in parameters] == ["Color", "Equipment ID"]
+    assert [result["parameter"] for result in results] == ["Color"]
+    assert standard_params == {"Equipment ID": "EQ-17"}
+    assert not model
+    assert compliance_agent.analyze_chunk_fused(chunk, MASTER, "key") == (parameters, results, standard_params)
+    assert asyncio.run(compliance_agent.analyze_chunk_fused_async(chunk, MASTER, "key")) == (parameters, results, standard_params)
+
+
+def test_compliance_requests_are_packed_in_order_within_the_budget():
+    parameters = [[{"name": f"P{i}", "value": "x" * 200}] if i != 2 else [] for i in range(6)]
+    retrieved = [MASTER] * 6
+    assert compliance_agent.pack_compliance_requests(parameters, retrieved, token_budget=10 ** 6, max_chunks=2) == [[0, 1], [3, 4], [5]]
+    assert compliance_agent.pack_compliance_requests(parameters, retrieved, token_budget=1) == [[0], [1], [3], [4], [5]]
+
+
+def test_packed_compliance_is_split_back_by_chunk_and_left_out_chunks_fall_back(model):
+    packed = [dict(_analysis("Color", "white"), chunk_index=0), dict(_analysis("Shape", "round"), chunk_index=3)]
+    model.extend([json.dumps(packed), json.dumps([_analysis("Size", "10 mm")])])
+    items = [(0, PARAMETERS[:1], MASTER), (3, PARAMETERS[1:], MASTER), (4, [{"name": "Size", "value": "10 mm"}], MASTER)]
+    done = compliance_agent.analyze_compliance_batch(items, "key")
+    assert {i: [result["parameter"] for result in results] for i, (results, _) in done.items()} == {
+        0: ["Color"], 3: ["Shape"], 4: ["Size"]}
+    assert not model
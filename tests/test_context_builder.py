@@ -0,0 +1,48 @@
+import pytest
+import context_builder
+from context_builder import assemble_context, build_context, context_metrics
+from chunking import estimate_tokens
+
+TEXT = "Granulation: mix the API with lactose for 10 minutes at 25 rpm. Dry at 60 C until LOD is below 2 percent."
+
+
+def _chunk(index, text, score, source="master.pdf"):
+    return {"chunk_id": f"{source}:{index}", "source": source, "chunk_index": index, "text": text, "similarity_score": score}
+
+
+@pytest.fixture(autouse=True)
+def metrics():
+    context_builder.reset_context_metrics()
+    yield
+    context_builder.reset_context_metrics()
+
+
+def test_duplicates_and_contained_spans_are_dropped():
+    chunks = [_chunk(0, TEXT, 0.1), _chunk(0, TEXT, 0.1), _chunk(1, TEXT[10:40], 0.2)]
+    context, stats = assemble_context(chunks)
+    assert context == TEXT
+    assert stats["duplicate_chunks"] == 1 and stats["spans_removed"] == 1 and stats["chunks_kept"] == 2
+
+
+def test_neighbour_overlap_is_merged_in_document_order():
+    first, second = TEXT[:70], TEXT[40:]
+    context, stats = assemble_context([_chunk(1, second, 0.1), _chunk(0, first, 0.3)])
+    assert context == TEXT
+    assert stats["overlaps_merged"] == 1 and stats["overlap_chars_removed"] == 30
+
+
+def test_furthest_chunks_are_dropped_to_fit_the_budget():
+    chunks = [_chunk(i, f"Step {i}: " + "x" * 80, 0.1 * (5 - i)) for i in range(5)]
+    context, stats = assemble_context(chunks, token_budget=50)
+    assert estimate_tokens(context) <= 50
+    assert context.split("\n") == [chunks[3]["text"], chunks[4]["text"]]
+    assert stats["chunks_over_budget"] == 3
+    context, _ = assemble_context(chunks, token_budget=1)
+    assert context == chunks[4]["text"]  # The closest chunk is always kept
+
+
+def test_build_context_records_metrics():
+    build_context([_chunk(0, TEXT, 0.1), _chunk(0, TEXT, 0.1)])
+    metrics = context_metrics()
+    assert metrics["builds"] == 1 and metrics["duplicate_chunks"] == 1
+    assert metrics["token_reduction"] == pytest.approx(0.5, abs=0.01)
@@ -0,0 +1,71 @@
+import threading
+import pytest
+from jobs import JobStore, JobQueue, RUNNING, DONE, FAILED
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite"))
+
+
+def test_job_runs_in_the_background_and_records_progress(store):
+    def runner(job_id, filepath, emit):
+        emit("stage", {"stage": "extract"})
+        emit("chunk", {"chunk_index": 0})
+        return {"filepath": filepath}
+
+    queue = JobQueue(store, runner)
+    job_id = queue.submit("bmr.pdf", "uploads/bmr.pdf")
+    queue.shutdown(wait=True)
+    job = store.get(job_id)
+    assert (job["status"], job["stage"], job["result"]) == (DONE, None, {"filepath": "uploads/bmr.pdf"})
+    assert [event for _, event, _ in store.events(job_id)] == ["stage", "chunk", DONE]
+    first_id = store.events(job_id)[0][0]
+    assert [event for _, event, _ in store.events(job_id, after_id=first_id)] == ["chunk", DONE]
+
+
+def test_failed_job_keeps_its_error(store):
+    def runner(job_id, filepath, emit):
+        raise RuntimeError("no tables found")
+
+    queue = JobQueue(store, runner)
+    job_id = queue.submit("bmr.pdf", "bmr.pdf")
+    queue.shutdown(wait=True)
+    job = store.get(job_id)
+    assert (job["status"], job["error"]) == (FAILED, "no tables found")
+    assert store.events(job_id)[-1][1:] == (FAILED, {"error": "no tables found"})
+
+
+def test_recover_requeues_unfinished_jobs(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    store = JobStore(path)
+    running = store.create("a.pdf", "a.pdf")
+    store.update(running, status=RUNNING, stage="extract")
+    store.add_event(running, "stage", {"stage": "extract"})
+    queued = store.create("b.pdf", "b.pdf")
+    finished = store.create("c.pdf", "c.pdf")
+    store.update(finished, status=DONE)
+
+    # A new process opens the same store and picks the unfinished jobs up again
+    reopened = JobStore(path)
+    ran = []
+    lock = threading.Lock()
+
+    def runner(job_id, filepath, emit):
+        with lock:
+            ran.append(filepath)
+        return {}
+
+    assert reopened.unfinished() == [running, queued]
+    queue = JobQueue(reopened, runner)
+    queue.recover()
+    queue.shutdown(wait=True)
+    assert sorted(ran) == ["a.pdf", "b.pdf"]
+    assert reopened.unfinished() == []
+    assert [event for _, event, _ in reopened.events(running)] == [DONE]  # The stale progress was cleared
+    assert reopened.get(finished)["status"] == DONE
+
+
+def test_unknown_job(store):
+    assert store.get("nope") is None
+    assert store.events("nope") == []
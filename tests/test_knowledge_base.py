@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain.text_splitter")
+import knowledge_base
+
+
+def _fake_embeddings(texts):
+    """Deterministic 16-dimensional embeddings, one per text."""
+    return np.array([np.random.default_rng(sum(map(ord, text))).random(16) for text in texts], dtype='float32')
+
+
+@pytest.fixture
+def database(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / "master.txt"
+    monkeypatch.setattr(knowledge_base, "INPUT_FILE_PATH", str(source))
+    monkeypatch.setattr(knowledge_base, "CHUNK_SIZE", 5)
+    monkeypatch.setattr(knowledge_base, "CHUNK_OVERLAP", 0)
+    monkeypatch.setattr(knowledge_base, "embed_chunks", _fake_embeddings)
+    return source
+
+
+def _words(start, stop):
+    return " ".join(f"word{i}" for i in range(start, stop))
+
+
+def test_rerun_after_interrupted_update_does_not_duplicate_vectors(database, monkeypatch):
+    database.write_text(_words(0, 20))
+    knowledge_base.create_database()
+    database.write_text(_words(0, 30))
+
+    def crash(metadata, metadata_dir):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(knowledge_base, "write_metadata_store", crash)
+        with pytest.raises(OSError):
+            knowledge_base.update_database()
+
+    knowledge_base.update_database()
+    index, metadata = knowledge_base.load_database(*knowledge_base.output_paths(str(database)))
+    assert index.ntotal == len(metadata.chunk_ids) == 6
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from google.api_core import exceptions as api_exceptions
+from llm_client import LLMClient, CircuitBreaker, CircuitOpenError, OPEN, HALF_OPEN, CLOSED
+from rate_limiter import TokenBucket
+
+
+def _flaky(errors):
+    """A request function that raises the given errors in turn, then succeeds."""
+    errors = list(errors)
+    lock = threading.Lock()
+
+    def fn(timeout):
+        with lock:
+            error = errors.pop(0) if errors else None
+        if error is not None:
+            raise error
+        return "ok"
+    return fn
+
+
+def test_throttling_does_not_open_the_circuit():
+    client = LLMClient(base_delay=0.01, breaker=CircuitBreaker(failure_threshold=5, reset_timeout=30))
+    calls = [_flaky([api_exceptions.TooManyRequests("slow down")] * 2) for _ in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert list(executor.map(client.call, calls)) == ["ok"] * 4
+    stats = client.stats()
+    assert stats["throttled"] == 8
+    assert stats["circuit"] == CLOSED
+    assert "circuit_rejections" not in stats
+
+
+def test_retry_waits_for_the_circuit_to_half_open():
+    client = LLMClient(base_delay=0.01, deadline=5, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=0.2))
+    fn = _flaky([api_exceptions.ServiceUnavailable("down")] * 2)
+    assert client.call(fn) == "ok"
+    stats = client.stats()
+    assert stats["circuit_waits"] >= 1
+    assert stats["circuit"] == CLOSED
+
+
+def test_new_calls_fail_fast_while_the_circuit_is_open():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    client = LLMClient(breaker=breaker)
+    with pytest.raises(CircuitOpenError):
+        client.call(_flaky([]))
+
+
+def test_circuit_wait_longer_than_the_deadline_gives_up():
+    client = LLMClient(base_delay=0.01, deadline=0.5, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=30))
+    with pytest.raises(CircuitOpenError):
+        client.call(_flaky([api_exceptions.ServiceUnavailable("down")]))
+
+
+
+def test_rate_limit_queueing_is_not_charged_to_the_attempt():
+    # 30 calls at 50 requests/s queue for up to 0.6s, longer than both the attempt timeout and the deadline
+    client = LLMClient(attempt_timeout=0.2, deadline=0.4, rate_limiter=TokenBucket(rate=50, capacity=1),
+                       breaker=CircuitBreaker(failure_threshold=2, reset_timeout=30))
+
+    async def request(timeout):
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    async def main():
+        return await asyncio.gather(*(client.call_async(request) for _ in range(30)))
+
+    assert asyncio.run(main()) == ["ok"] * 30
+    stats = client.stats()
+    assert stats["rate_limit_waits"] >= 29
+    assert "failures" not in stats
+    assert stats["circuit"] == CLOSED
+
+
+def test_hedge_needs_a_free_token():
+    limiter = TokenBucket(rate=0.01, capacity=1)
+    client = LLMClient(hedge_after=0.05, rate_limiter=limiter)
+
+    def slow(timeout):
+        time.sleep(0.2)
+        return "ok"
+
+    assert client.call(slow) == "ok"
+    assert "hedges" not in client.stats()
+
+
+def test_local_errors_do_not_close_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    client = LLMClient(breaker=breaker)
+
+    def broken(timeout):
+        raise KeyError("text")
+
+    with pytest.raises(KeyError):
+        client.call(broken)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()  # The probe slot was released
+
+
+def test_rejected_request_closes_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    client = LLMClient(breaker=breaker)
+    with pytest.raises(api_exceptions.InvalidArgument):
+        client.call(_flaky([api_exceptions.InvalidArgument("bad schema")]))
+    assert breaker.state == CLOSED
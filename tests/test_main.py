@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+import main
+from llm_client import LLMUnavailableError
+
+
+ROW = {"parameter": "pH", "actual_value": "7", "expected_value": "6-8", "is_compliant": True, "explanation": ""}
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Stub the model-backed steps of the staged pipeline; chunk "down" cannot reach the model."""
+    def extract(chunk, api_key):
+        if chunk == "down":
+            raise LLMUnavailableError("circuit open")
+        return [{"name": "pH", "value": chunk}]
+
+    async def extract_async(chunk, api_key):
+        return extract(chunk, api_key)
+
+    def analyze(requests, api_key):
+        return {i: ([dict(ROW)], {}) for i, _, _ in requests}
+
+    async def analyze_async(requests, api_key):
+        return analyze(requests, api_key)
+
+    monkeypatch.setattr(main, "_route_master", lambda all_parameters: (None, "Product"))
+    monkeypatch.setattr(main, "extract_parameters_to_verify", extract)
+    monkeypatch.setattr(main, "extract_parameters_to_verify_async", extract_async)
+    monkeypatch.setattr(main, "retrieve_batch_from_knowledge_base", lambda queries, *a, **kw: [[{}] for _ in queries])
+    monkeypatch.setattr(main, "analyze_compliance_batch", analyze)
+    monkeypatch.setattr(main, "analyze_compliance_batch_async", analyze_async)
+    return monkeypatch
+
+
+def _failed(result):
+    return result["compliance"][0]["parameter"] == "non stated" and "circuit open" in result["compliance"][0]["explanation"]
+
+
+def test_extraction_outage_fails_only_its_chunk(pipeline):
+    reported = {}
+    results, _, product = main.process_chunks(["7", "down", "6"], "key", on_chunk=reported.__setitem__)
+    assert product == "Product"
+    assert [_failed(result) for result in results] == [False, True, False]
+    assert sorted(reported) == [0, 1, 2]
+
+
+def test_retrieval_outage_fails_the_chunks_instead_of_the_audit(pipeline):
+    def unavailable(*args, **kwargs):
+        raise LLMUnavailableError("circuit open")
+
+    pipeline.setattr(main, "retrieve_batch_from_knowledge_base", unavailable)
+    results, _, _ = main.process_chunks(["7", "down"], "key")
+    assert all(_failed(result) for result in results)
+    results, _, _ = main.process_chunks(["7", "6"], "key", mode="fused")
+    assert all(_failed(result) for result in results)
+
+
+def test_async_outage_fails_chunks(pipeline):
+    async def unavailable(*args, **kwargs):
+        raise LLMUnavailableError("circuit open")
+
+    pipeline.setattr(main, "retrieve_batch_from_knowledge_base_async", unavailable)
+    results, _, _ = asyncio.run(main.process_chunks_async(["7", "down"], "key"))
+    assert all(_failed(result) for result in results)
@@ -0,0 +1,96 @@
+import json
+import threading
+from types import SimpleNamespace
+import faiss
+import numpy as np
+import pytest
+import master_registry
+from master_registry import MasterIndex, MasterRegistry, detect_product_name
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Replace index loading with a stub recording the products loaded."""
+    loaded = []
+
+    def load(index_path, metadata_path, product=None, search_params=None):
+        loaded.append(product)
+        return SimpleNamespace(product=product, nbytes=1)
+
+    monkeypatch.setattr(master_registry.MasterIndex, "load", load)
+    return loaded
+
+
+@pytest.fixture
+def registry(tmp_path, loads):
+    path = tmp_path / "masters.json"
+    path.write_text(json.dumps({
+        "Cefixime Tablets USP 400 mg": {"index": "cefixime.index", "metadata": "cefixime_meta"},
+        "Amoxicillin Capsules 500 mg": {"index": "amox.index", "metadata": "amox_meta", "aliases": ["Amoxil 500"]},
+    }))
+    return MasterRegistry(str(path), default_product="Cefixime Tablets USP 400 mg")
+
+
+def test_route_matches_exact_alias_and_fuzzy_names(registry):
+    assert registry.resolve("amoxicillin capsules 500mg") == "Amoxicillin Capsules 500 mg"
+    assert registry.resolve("AMOXIL 500") == "Amoxicillin Capsules 500 mg"
+    assert registry.resolve("Cefixime Tablets 400 mg") == "Cefixime Tablets USP 400 mg"
+    assert registry.resolve("Paracetamol Syrup") == "Cefixime Tablets USP 400 mg"
+    assert registry.resolve(None) == "Cefixime Tablets USP 400 mg"
+    assert registry.route("Amoxil 500").product == "Amoxicillin Capsules 500 mg"
+
+
+def test_detect_product_name():
+    assert detect_product_name([[{"name": "Batch No", "value": "B1"}], [{"name": "Product Name:", "value": " Amoxil "}]]) == "Amoxil"
+    assert detect_product_name([[{"name": "Product", "value": ""}]]) is None
+
+
+def test_loaded_masters_are_reused_and_evicted_over_budget(registry, loads):
+    registry.memory_budget_bytes = 1
+    first = registry.get("Amoxicillin Capsules 500 mg")
+    assert registry.get("Amoxicillin Capsules 500 mg") is first
+    registry.get("Cefixime Tablets USP 400 mg")
+    registry.get("Amoxicillin Capsules 500 mg")
+    assert loads == ["Amoxicillin Capsules 500 mg", "Cefixime Tablets USP 400 mg", "Amoxicillin Capsules 500 mg"]
+
+
+def test_cold_load_does_not_block_other_products(registry, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    load = master_registry.MasterIndex.load
+    loads = []
+
+    def slow_load(index_path, metadata_path, product=None, search_params=None):
+        loads.append(product)
+        if product.startswith("Amoxicillin"):
+            started.set()
+            assert release.wait(5)
+        return load(index_path, metadata_path, product=product, search_params=search_params)
+
+    monkeypatch.setattr(master_registry.MasterIndex, "load", slow_load)
+    waiters = [threading.Thread(target=registry.get, args=("Amoxicillin Capsules 500 mg",)) for _ in range(2)]
+    for thread in waiters:
+        thread.start()
+    assert started.wait(5)
+    other = threading.Thread(target=registry.get, args=("Cefixime Tablets USP 400 mg",))
+    other.start()
+    other.join(2)
+    blocked = other.is_alive()
+    release.set()
+    for thread in waiters:
+        thread.join(5)
+    other.join(5)
+    assert not blocked
+    assert loads.count("Amoxicillin Capsules 500 mg") == 1
+
+
+def test_batched_search_splits_hits_per_query():
+    vectors = np.eye(4, dtype='float32')
+    index = faiss.IndexIDMap2(faiss.IndexFlatL2(4))
+    index.add_with_ids(vectors, np.array([40, 10, 30, 20], dtype='int64'))
+    # Metadata rows are in a different order from the index ids
+    metadata = [{"vector_id": vector_id, "text": f"chunk {vector_id}"} for vector_id in (10, 20, 30, 40)]
+    master = MasterIndex(index, metadata, product="P")
+    queries = np.array([[1, 0, 0, 0], [0, 0.9, 0, 0], [5, 5, 5, 5]], dtype='float32')
+    results = master.search(queries, k=6, max_distance=0.5)
+    assert [[chunk["text"] for chunk in chunks] for chunks in results] == [["chunk 40"], ["chunk 10"], []]
+    assert results[1][0]["similarity_score"] == pytest.approx(0.01)
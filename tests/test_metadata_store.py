@@ -0,0 +1,58 @@
+import hashlib
+import pickle
+import numpy as np
+import pytest
+from metadata_store import MetadataStore, InMemoryMetadata, write_metadata_store, convert_pickle
+from master_registry import MasterIndex
+
+
+def _metadata(texts, source="Master_BMR_2.txt"):
+    return [{"source": source, "chunk_id": hashlib.md5(text.encode("utf-8")).hexdigest(), "vector_id": 100 + i,
+             "chunk_index": i, "text": text} for i, text in enumerate(texts)]
+
+
+def test_store_round_trip(tmp_path):
+    metadata = _metadata(["Batch size: 100 kg", "Température: 25 °C", ""])
+    metadata[1]["source"] = "other.txt"
+    write_metadata_store(metadata, str(tmp_path / "store"))
+    store = MetadataStore(str(tmp_path / "store"))
+    assert len(store) == 3
+    assert list(store) == metadata
+    assert store.take(np.array([2, 0])) == [metadata[2], metadata[0]]
+    assert store[1]["text"] == "Température: 25 °C"
+    assert store.vector_ids.tolist() == [100, 101, 102]
+
+
+def test_rewrite_replaces_the_store(tmp_path):
+    path = str(tmp_path / "store")
+    write_metadata_store(_metadata(["a", "b"]), path)
+    write_metadata_store(_metadata(["c"]), path)
+    assert [row["text"] for row in MetadataStore(path)] == ["c"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["store"]
+
+
+def test_empty_store(tmp_path):
+    write_metadata_store([], str(tmp_path / "store"))
+    store = MetadataStore(str(tmp_path / "store"))
+    assert len(store) == 0
+    assert list(store) == []
+
+
+def test_convert_pickle(tmp_path):
+    metadata = _metadata(["Yield: 98%", "pH: 6.5"])
+    with open(tmp_path / "meta.pkl", "wb") as f:
+        pickle.dump(metadata, f)
+    convert_pickle(str(tmp_path / "meta.pkl"), str(tmp_path / "store"))
+    assert list(MetadataStore(str(tmp_path / "store"))) == metadata
+
+
+def test_in_memory_metadata_matches_the_store(tmp_path):
+    metadata = _metadata(["x", "y", "z"])
+    write_metadata_store(metadata, str(tmp_path / "store"))
+    rows = np.array([2, 1])
+    assert InMemoryMetadata(metadata).take(rows) == MetadataStore(str(tmp_path / "store")).take(rows)
+
+
+def test_pickled_metadata_is_refused(tmp_path):
+    with pytest.raises(ValueError, match="convert it"):
+        MasterIndex.load(str(tmp_path / "master.index"), str(tmp_path / "master_metadata.pkl"))
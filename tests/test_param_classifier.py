@@ -0,0 +1,41 @@
+import pytest
+from param_classifier import classify, classify_standard_params, is_date
+
+
+def _result(parameter, actual_value):
+    return {"parameter": parameter, "actual_value": actual_value}
+
+
+@pytest.mark.parametrize("value", ["12/01/2023", "2023-01-12", "12 Jan 2023", "12th-January-23", "January 12, 2023"])
+def test_common_date_formats(value):
+    assert is_date(value)
+
+
+@pytest.mark.parametrize("value", ["12/2023", "12 Foo 2023", "25.4 kg", "B2301"])
+def test_non_dates(value):
+    assert not is_date(value)
+
+
+@pytest.mark.parametrize("parameter, value, expected", [
+    ("Batch No.", "B2301", True),
+    ("MFR Reference No", "MFR/001", True),
+    ("Name of the Product", "Cefixime Tablets", True),
+    ("Mfg. Date", "01/2023", True),
+    ("Checked On", "12-Jan-23", True),
+    ("Temperature", "12/01/2023", False),  # Measurable names win over date-like values
+    ("Std Qty / batch", "12.5 kg", False),
+    ("Hardness", "NLT 5 kp", False),
+])
+def test_confident_classifications(parameter, value, expected):
+    is_standard, confidence = classify(_result(parameter, value))
+    assert is_standard == expected and confidence >= 0.8
+
+
+def test_uncertain_results_are_left_to_the_model():
+    results = [_result("Batch Number", "B1"), _result("Yield", "98 %"), _result("Expiry", "05/2025"),
+               _result("Equipment ID", "EQ-17")]
+    standard_params, uncertain = classify_standard_params(results)
+    assert standard_params == {"Batch Number": "B1"}
+    assert [result["parameter"] for result in uncertain] == ["Expiry", "Equipment ID"]
+    standard_params, uncertain = classify_standard_params(results, threshold=0.5)
+    assert standard_params == {"Batch Number": "B1", "Expiry": "05/2025"} and uncertain == []
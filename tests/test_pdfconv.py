@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, PageBreak
+import pytest
+import pdfconv
+from pdfconv import TableStrategySelector, STRICT, FALLBACK, TABLE_SETTINGS
+from result_cache import ResultCache
+
+
+def _edges(v_line, h_line, v_rect=0):
+    return ([{"orientation": "v", "object_type": "line"}] * v_line + [{"orientation": "h", "object_type": "line"}] * h_line
+            + [{"orientation": "v", "object_type": "rect"}] * v_rect)
+
+
+def _page(name, edges, tables):
+    """A page whose tables depend on the strategy used: tables maps a TABLE_SETTINGS position to its rows."""
+    return SimpleNamespace(name=name, edges=edges,
+                           extract_tables=lambda table_settings: tables.get(TABLE_SETTINGS.index(table_settings), []))
+
+
+RULED = _page("ruled", _edges(2, 2), {STRICT: [[["Batch", "B1"]]], FALLBACK: [[["Batch B1", ""]]]})
+UNRULED = _page("unruled", _edges(0, 0, v_rect=2), {FALLBACK: [[["Yield", "98%"]]]})
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(pdfconv, "page_fingerprint", lambda page: page.name)
+    return ResultCache(str(tmp_path / "pages.sqlite"))
+
+
+def _extract(pages, cache, use_previous):
+    selector = TableStrategySelector(use_previous=use_previous)
+    output = []
+    hits = [pdfconv.process_page("doc.pdf", page, i, output, cache=cache, selector=selector) for i, page in enumerate(pages, 1)]
+    return output, hits
+
+
+def test_selector_skips_strategies_that_cannot_find_tables():
+    selector = TableStrategySelector()
+    assert selector.candidates(RULED) == [STRICT, FALLBACK]
+    assert selector.candidates(UNRULED) == [FALLBACK]
+    assert selector.candidates(_page("blank", _edges(0, 1), {})) == []
+
+
+def test_cached_page_replays_the_strategy_of_its_context(cache):
+    alone, _ = _extract([RULED], cache, use_previous=True)
+    after_unruled, hits = _extract([UNRULED, RULED], cache, use_previous=True)
+    assert hits == [False, False]
+    assert after_unruled[-2] == "- Batch B1"  # Only the fallback ran, after a page that needed it
+    assert alone[-2] == "- Batch: B1"
+    again, hits = _extract([UNRULED, RULED], cache, use_previous=True)
+    assert hits == [True, True]
+    assert again == after_unruled
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = str(tmp_path / "bmr.pdf")
+    story = []
+    for page in range(1, 6):
+        story.append(Table([["Batch", f"B{page}"], ["Yield", f"{90 + page}%"]],
+                           style=TableStyle([("GRID", (0, 0), (-1, -1), 0.5, "black")])))
+        story.append(PageBreak())
+    SimpleDocTemplate(path, pagesize=A4).build(story[:-1])
+    return path
+
+
+def test_parallel_extraction_matches_serial_page_order(monkeypatch, pdf_path):
+    monkeypatch.setattr(pdfconv, "PAGES_PER_TASK", 2)
+    serial = list(pdfconv.iter_pdf_lines(pdf_path, workers=1, use_cache=False))
+    try:
+        parallel = list(pdfconv.iter_pdf_lines(pdf_path, workers=2, use_cache=False))
+    finally:
+        pdfconv._get_pool(2).shutdown()
+        pdfconv._pool = None
+    assert [line for line in serial if line.startswith("Page ")] == [f"Page {i}:" for i in range(1, 6)]
+    assert "- Batch: B3" in serial
+    assert parallel == serial
+
+
+def test_selector_counts_passes_and_first_choice_hits():
+    selector = TableStrategySelector()
+    for page in (RULED, UNRULED, _page("blank", _edges(0, 0), {}), _page("miss", _edges(2, 2), {FALLBACK: [[["a", "b"]]]})):
+        selector.extract_tables(page)
+    assert selector.stats == {"pages": 4, "passes": 4, "hits": 3, "skipped_passes": 3}
+
+
+def test_previous_fallback_page_skips_the_strict_pass_only_with_use_previous():
+    for use_previous, expected in ((False, [["Batch", "B1"]]), (True, [["Batch B1", ""]])):
+        selector = TableStrategySelector(use_previous=use_previous)
+        selector.extract_tables(UNRULED)
+        assert selector.extract_tables(RULED) == [expected]
@@ -0,0 +1,65 @@
+import json
+import os
+import pytest
+import pipeline
+from workspace import Workspace
+
+EXTRACTED = [
+    "Page 1:",
+    "- 1:",
+    "    • Ingredient: Hypromellose",
+    "    • Std Qty / batch: 12.50",
+    "- 2:",
+    "    • Ingredient: Lactose",
+    "    • Std Qty / batch: 40.00",
+]
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    workspace = Workspace("job1", root=str(tmp_path)).create()
+    with open(workspace.upload, "wb") as f:
+        f.write(b"%PDF-1.4")
+    return workspace
+
+
+def test_audit_streams_pages_into_chunks_without_intermediate_files(monkeypatch, workspace):
+    seen = {}
+
+    def fake_process_chunks(chunks, api_key, on_chunk=None):
+        seen["chunks"] = chunks
+        for i, _ in enumerate(chunks):
+            on_chunk(i, {"compliance": [], "standard_params": {}})
+        return [{"chunk_index": i} for i in range(len(chunks))], {}, "Product"
+
+    def fake_generate_pdf(results_json, report_pdf, product_name=None, standard_params=None):
+        with open(report_pdf, "wb") as f:
+            f.write(b"%PDF-1.4")
+
+    monkeypatch.setattr(pipeline, "iter_pdf_lines", lambda path, workers=1: iter(EXTRACTED))
+    monkeypatch.setattr(pipeline, "process_chunks", fake_process_chunks)
+    monkeypatch.setattr(pipeline, "generate_pdf", fake_generate_pdf)
+    events = []
+    result = pipeline.run_audit(workspace, lambda event, data: events.append((event, data)))
+
+    assert seen["chunks"] == ["Ingredient: Hypromellose\nStd Qty / batch: 12.50\n\n"
+                              "Ingredient: Lactose\nStd Qty / batch: 40.00"]
+    assert [event for event, _ in events] == [
+        "stage", "stage_done", "stage", "chunks", "chunk", "stage_done", "stage", "stage_done"]
+    assert [data["stage"] for event, data in events if event == "stage"] == ["extracting", "analyzing", "reporting"]
+    assert result["product_name"] == "Product"
+    with open(workspace.results_json) as f:
+        assert json.load(f) == result["results"]
+    assert sorted(os.listdir(workspace.path)) == sorted(
+        os.path.basename(path) for path in (workspace.results_json, workspace.report_pdf))
+
+
+def test_upload_is_removed_when_the_audit_fails(monkeypatch, workspace):
+    def failing_process_chunks(chunks, api_key, on_chunk=None):
+        raise RuntimeError("backend down")
+
+    monkeypatch.setattr(pipeline, "iter_pdf_lines", lambda path, workers=1: iter(EXTRACTED))
+    monkeypatch.setattr(pipeline, "process_chunks", failing_process_chunks)
+    with pytest.raises(RuntimeError):
+        pipeline.run_audit(workspace)
+    assert not os.path.exists(workspace.upload)
@@ -0,0 +1,48 @@
+import asyncio
+import time
+import pytest
+from rate_limiter import TokenBucket
+
+
+def test_burst_then_sustained_rate():
+    bucket = TokenBucket(rate=10, capacity=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0] * 3
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+
+def test_acquire_paces_calls():
+    bucket = TokenBucket(rate=50, capacity=1)
+    started = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - started >= 0.09
+
+
+def test_acquire_async_waits_without_blocking_the_loop():
+    bucket = TokenBucket(rate=20, capacity=1)
+
+    async def main():
+        started = time.monotonic()
+        await asyncio.gather(*(bucket.acquire_async() for _ in range(3)))
+        return time.monotonic() - started
+
+    assert 0.09 <= asyncio.run(main()) < 0.5
+
+
+def test_try_acquire_only_takes_free_tokens():
+    bucket = TokenBucket(rate=0.01, capacity=1)
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+
+def test_configure_and_validation():
+    bucket = TokenBucket(rate=1, capacity=4)
+    bucket.configure(rate=2, capacity=2)
+    assert (bucket.rate, bucket.capacity) == (2.0, 2.0)
+    with pytest.raises(ValueError):
+        bucket.reserve(3)
+    with pytest.raises(ValueError):
+        bucket.configure(rate=0)
+    with pytest.raises(ValueError):
+        TokenBucket(rate=1, capacity=0)
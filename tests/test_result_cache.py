@@ -0,0 +1,82 @@
+import pytest
+import result_cache
+from result_cache import ResultCache, TieredCache, make_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Drive the cache's wall clock by hand."""
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_make_key_is_content_addressed():
+    assert make_key("a", {"x": 1, "y": 2}) == make_key("a", {"y": 2, "x": 1})
+    assert make_key("a", [1, 2]) != make_key("a", [2, 1])
+
+
+def test_values_round_trip_and_persist(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite"))
+    cache.set("k", {"results": [1, "é"]})
+    assert cache.get("k") == {"results": [1, "é"]}
+    assert cache.get("missing") is None
+    cache.close()
+    reopened = ResultCache(str(tmp_path / "cache.sqlite"))
+    assert reopened.get("k") == {"results": [1, "é"]}
+    stats = reopened.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 0)
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    cache = ResultCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.set("a", 1)
+    clock[0] += 1
+    cache.set("b", 2)
+    clock[0] += 1
+    assert cache.get("a") == 1  # Now more recently used than b
+    clock[0] += 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget_evicts(tmp_path, clock):
+    cache = ResultCache(str(tmp_path / "cache.sqlite"), max_bytes=25)
+    for key in "abc":
+        clock[0] += 1
+        cache.set(key, "x" * 10)
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] <= 25
+    assert cache.get("a") is None
+
+
+def test_expired_entries_are_misses(tmp_path, clock):
+    cache = ResultCache(str(tmp_path / "cache.sqlite"), max_age_seconds=10)
+    cache.set("old", 1)
+    clock[0] += 11
+    assert cache.get("old") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_replacing_a_value_keeps_totals_right(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite"))
+    cache.set("k", "short")
+    cache.set("k", "a longer value")
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["bytes"] == len('"a longer value"')
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+
+
+def test_tiered_cache_serves_hot_keys_from_memory(tmp_path):
+    cache = TieredCache(ResultCache(str(tmp_path / "cache.sqlite")), max_items=1)
+    cache.set("a", [0.1, 0.2])
+    cache.set("b", [0.3])
+    assert cache.get("b") == [0.3]
+    assert cache.get("a") == [0.1, 0.2]  # Fell out of memory, read back from disk
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["hits"], stats["memory_entries"]) == (1, 1, 1)
@@ -0,0 +1,32 @@
+from rule_engine import check_parameter, master_requirements
+
+
+def _verdict(name, value, requirement):
+    requirements = master_requirements([{"text": f"{name}: {requirement}"}])
+    result = check_parameter({"name": name, "value": value}, requirements)
+    return None if result is None else result["is_compliant"]
+
+
+def test_unitless_value_is_read_in_the_requirement_unit():
+    assert _verdict("Batch Size", "100", "100 kg") is True
+    assert _verdict("Drying Time", "3", "2 to 4 hours") is True
+    assert _verdict("Drying Time", "5", "2 to 4 hours") is False
+    assert _verdict("LOD", "1.5", "NMT 2 %") is True
+    assert _verdict("Weight", "421", "400 mg ± 5%") is False
+
+
+def test_unitless_requirement_is_read_in_the_value_unit():
+    assert _verdict("Batch Size", "100 kg", "100") is True
+    assert _verdict("Drying Time", "3 hours", "2 to 4") is True
+    assert _verdict("Drying Time", "3 hours", "4 to 6") is False
+
+
+def test_values_with_units_are_compared_in_base_units():
+    assert _verdict("Batch Size", "100000 g", "100 kg") is True
+    assert _verdict("Drying Time", "150 min", "2 to 4 hours") is True
+    assert _verdict("Temperature", "27 °C", "NMT 2 %") is None
+
+
+def test_requirement_mixing_unit_scales_leaves_unitless_values_to_the_model():
+    assert _verdict("Fill Weight", "1.2", "1 kg - 1500 g") is None
+    assert _verdict("Fill Weight", "1200 g", "1 kg - 1500 g") is True
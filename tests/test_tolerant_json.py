@@ -0,0 +1,38 @@
+import pytest
+from tolerant_json import parse_json_array, parse_json_object, damaged, describe, repair_json_text
+
+
+def test_well_formed_array():
+    parsed = parse_json_array('Here you go: [{"a": 1}, {"b": "x]"}] trailing text')
+    assert parsed.items == [{"a": 1}, {"b": "x]"}]
+    assert not damaged(parsed)
+    assert describe(parsed) == "2 elements recovered"
+
+
+def test_malformed_element_is_repaired_or_reported():
+    parsed = parse_json_array('[{"a": 1,}, {"b": "line\none"}, {"c": oops}, {"d": 4}]')
+    assert parsed.items == [{"a": 1}, {"b": "line one"}, {"d": 4}]
+    assert parsed.broken == ['{"c": oops}']
+    assert parsed.complete and damaged(parsed)
+    assert describe(parsed) == "3 elements recovered (1 malformed elements)"
+
+
+def test_truncated_array_keeps_the_elements_before_the_cut():
+    parsed = parse_json_array('[{"a": 1}, {"b": 2}, {"c": "cut off')
+    assert parsed.items == [{"a": 1}, {"b": 2}]
+    assert parsed.broken == ['{"c": "cut off']
+    assert not parsed.complete
+    assert describe(parsed) == "2 elements recovered (1 malformed elements, no closing bracket)"
+
+
+def test_missing_array_and_start_position():
+    assert parse_json_array("no json here") == ([], ["no json here"], False)
+    text = '{"parameters": [1, 2], "analyses": [3]}'
+    assert parse_json_array(text, text.find('"analyses"')).items == [3]
+
+
+def test_parse_json_object():
+    assert parse_json_object('Result: {"a": {"b": [1, 2,]},} done') == {"a": {"b": [1, 2]}}
+    with pytest.raises(ValueError):
+        parse_json_object("[1, 2]")
+    assert repair_json_text('{"a": [1,\n 2,\n],\n}') == '{"a": [1,  2]}'
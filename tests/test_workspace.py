@@ -0,0 +1,40 @@
+import os
+import time
+import pytest
+from workspace import Workspace, WorkspaceJanitor, cleanup_expired
+
+
+def test_workspaces_are_private_per_job(tmp_path):
+    first = Workspace("job1", root=str(tmp_path)).create()
+    second = Workspace("job2", root=str(tmp_path)).create()
+    assert first.exists() and second.exists()
+    assert os.path.dirname(first.upload) != os.path.dirname(second.upload)
+    assert first.report_pdf.startswith(first.path)
+
+
+@pytest.mark.parametrize("job_id", ["../etc", "a/b", "", ".."])
+def test_job_ids_cannot_escape_the_root(job_id, tmp_path):
+    with pytest.raises(ValueError):
+        Workspace(job_id, root=str(tmp_path))
+
+
+def test_artifacts_are_found_only_once_written(tmp_path):
+    workspace = Workspace("job1", root=str(tmp_path)).create()
+    assert workspace.artifact("results") is None
+    with open(workspace.results_json, "w") as f:
+        f.write("[]")
+    assert workspace.artifact("results") == workspace.results_json
+    assert workspace.artifact("upload") is None
+
+
+def test_expired_workspaces_are_removed_unless_kept(tmp_path):
+    root = str(tmp_path)
+    old = time.time() - 3600
+    for job_id in ("old", "active", "fresh"):
+        Workspace(job_id, root=root).create()
+    for job_id in ("old", "active"):
+        os.utime(os.path.join(root, job_id), (old, old))
+    janitor = WorkspaceJanitor(root=root, ttl_seconds=60, active=lambda: ["active"])
+    assert janitor.run_once() == ["old"]
+    assert sorted(os.listdir(root)) == ["active", "fresh"]
+    assert cleanup_expired(str(tmp_path / "missing")) == []
@@ -0,0 +1,111 @@
+import json
+import re
+from collections import namedtuple
+from typing import Any
+
+# The values recovered from a JSON array, the raw text of the elements that could
+# not be parsed, and whether the array's closing bracket was reached
+ParsedArray = namedtuple("ParsedArray", "items broken complete")
+
+_decoder = json.JSONDecoder()
+_SEPARATORS = re.compile(r"[\s,]*")
+_NEXT_ELEMENT = re.compile(r"[,\]{]")
+
+def _value_end(text: str, pos: int) -> int:
+    """Index just past the object or array starting at pos, honouring strings; -1 if it never closes."""
+    depth = 0
+    in_string = escaped = False
+    for i in range(pos, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return -1
+
+def repair_json_text(json_text: str) -> str:
+    """Fix the usual defects of model-written JSON: raw newlines inside strings and trailing commas."""
+    json_text = json_text.replace('\n', ' ').replace('\r', '')
+    json_text = re.sub(r',\s*}', '}', json_text)
+    json_text = re.sub(r',\s*]', ']', json_text)
+    return json_text
+
+def _loads_repaired(span: str) -> Any:
+    try:
+        return json.loads(span)
+    except ValueError:
+        return json.loads(repair_json_text(span))
+
+def parse_json_array(text: str, start: int = 0) -> ParsedArray:
+    """Parse the first JSON array at or after start, element by element.
+
+    Well-formed elements are decoded in place; an element that fails is cut out
+    by bracket matching, repaired if possible, and otherwise reported in broken
+    so the caller can retry just that part. A response cut off mid-array keeps
+    every element before the cut (complete is then False).
+    """
+    begin = text.find("[", start)
+    if begin < 0:
+        rest = text[start:].strip()
+        return ParsedArray([], [rest] if rest else [], False)
+
+    items, broken = [], []
+    pos = begin + 1
+    while True:
+        pos = _SEPARATORS.match(text, pos).end()
+        if pos >= len(text):
+            return ParsedArray(items, broken, False)
+        if text[pos] == "]":
+            return ParsedArray(items, broken, True)
+        try:
+            value, pos = _decoder.raw_decode(text, pos)
+            items.append(value)
+            continue
+        except ValueError:
+            pass
+
+        if text[pos] in "{[":
+            end = _value_end(text, pos)
+        else:
+            match = _NEXT_ELEMENT.search(text, pos + 1)
+            end = match.start() if match else len(text)
+        if end < 0:
+            broken.append(text[pos:].strip())
+            return ParsedArray(items, broken, False)
+        span = text[pos:end]
+        try:
+            items.append(_loads_repaired(span))
+        except ValueError:
+            broken.append(span.strip())
+        pos = end
+
+def parse_json_object(text: str) -> Any:
+    """Parse the outermost JSON object in text, repairing it if needed; raises ValueError if there is none."""
+    begin = text.find("{")
+    if begin < 0:
+        raise ValueError("No JSON object found in response")
+    end = _value_end(text, begin)
+    return _loads_repaired(text[begin:end] if end > 0 else text[begin:])
+
+def damaged(parsed: ParsedArray) -> bool:
+    """True if some of the array could not be recovered."""
+    return bool(parsed.broken) or not parsed.complete
+
+def describe(parsed: ParsedArray) -> str:
+    problems = []
+    if parsed.broken:
+        problems.append(f"{len(parsed.broken)} malformed elements")
+    if not parsed.complete:
+        problems.append("no closing bracket")
+    return f"{len(parsed.items)} elements recovered" + (f" ({', '.join(problems)})" if problems else "")
@@ -0,0 +1,144 @@
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Callable, Iterable, List, Optional
+from main import OUTPUT_JSON_PATH, OUTPUT_PDF_PATH, NON_COMPLIANT_PDF_PATH
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+WORKSPACE_ROOT = "workspaces"
+WORKSPACE_TTL_SECONDS = 24 * 3600  # Workspaces untouched for this long are deleted
+CLEANUP_INTERVAL_SECONDS = 600
+UPLOAD_FILENAME = "upload.pdf"
+
+# Downloadable artifacts of a finished audit, by public name
+ARTIFACTS = {
+    "report": OUTPUT_PDF_PATH,
+    "results": OUTPUT_JSON_PATH,
+    "non_compliant_report": NON_COMPLIANT_PDF_PATH,
+}
+
+_JOB_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+class Workspace:
+    """A job's private directory holding its upload and reports.
+
+    Every audit works only inside its own workspace, so concurrent audits never
+    share file paths.
+    """
+
+    def __init__(self, job_id: str, root: str = WORKSPACE_ROOT):
+        # Job ids become directory names, so reject anything that could escape the root
+        if not _JOB_ID_PATTERN.match(job_id):
+            raise ValueError(f"Invalid job id: {job_id!r}")
+        self.job_id = job_id
+        self.root = root
+        self.path = os.path.join(root, job_id)
+
+    def create(self) -> "Workspace":
+        os.makedirs(self.path, exist_ok=True)
+        return self
+
+    def exists(self) -> bool:
+        return os.path.isdir(self.path)
+
+    def file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @property
+    def upload(self) -> str:
+        return self.file(UPLOAD_FILENAME)
+
+    @property
+    def results_json(self) -> str:
+        return self.file(OUTPUT_JSON_PATH)
+
+    @property
+    def report_pdf(self) -> str:
+        return self.file(OUTPUT_PDF_PATH)
+
+    @property
+    def non_compliant_pdf(self) -> str:
+        return self.file(NON_COMPLIANT_PDF_PATH)
+
+    def artifact(self, name: str) -> Optional[str]:
+        """Return the path of a named artifact if it exists in this workspace, else None."""
+        filename = ARTIFACTS.get(name)
+        if filename is None:
+            return None
+        path = self.file(filename)
+        return path if os.path.isfile(path) else None
+
+    def touch(self):
+        """Mark the workspace as recently used, postponing its expiry."""
+        if self.exists():
+            os.utime(self.path)
+
+    def remove_upload(self):
+        if os.path.exists(self.upload):
+            os.remove(self.upload)
+
+    def remove(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+def cleanup_expired(root: str = WORKSPACE_ROOT, ttl_seconds: float = WORKSPACE_TTL_SECONDS,
+                    keep: Iterable[str] = ()) -> List[str]:
+    """Delete workspaces not modified within ttl_seconds, except those in keep. Returns the removed job ids."""
+    if not os.path.isdir(root):
+        return []
+    keep = set(keep)
+    cutoff = time.time() - ttl_seconds
+    removed = []
+    for job_id in os.listdir(root):
+        path = os.path.join(root, job_id)
+        if job_id in keep or not os.path.isdir(path):
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path)
+                removed.append(job_id)
+        except OSError as e:
+            logger.warning(f"Could not remove expired workspace {path}: {e}")
+    if removed:
+        logger.info(f"Removed {len(removed)} expired workspaces from {root}")
+    return removed
+
+class WorkspaceJanitor:
+    """Background thread that periodically deletes expired workspaces.
+
+    active, if given, returns the job ids whose workspaces must be kept
+    regardless of age (e.g. jobs still queued or running).
+    """
+
+    def __init__(self, root: str = WORKSPACE_ROOT, ttl_seconds: float = WORKSPACE_TTL_SECONDS,
+                 interval_seconds: float = CLEANUP_INTERVAL_SECONDS, active: Callable[[], Iterable[str]] = None):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.interval_seconds = interval_seconds
+        self.active = active or (lambda: ())
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self) -> List[str]:
+        return cleanup_expired(self.root, self.ttl_seconds, keep=self.active())
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Workspace cleanup failed: {e}")
+            self._stop.wait(self.interval_seconds)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="workspace-janitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()